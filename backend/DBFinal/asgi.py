@@ -3,6 +3,11 @@ ASGI config for DBFinal project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+``/api/events/``, the live change feed, is a long-lived Server-Sent Events
+stream and is served by ``garage.events.event_stream`` directly; every other
+request goes to Django. The lifespan shutdown closes the change feed's
+database listener.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -13,4 +18,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DBFinal.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from garage.events import change_feed, event_stream  # noqa: E402  (needs the app registry)
+
+EVENTS_PATH = '/api/events/'
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await change_feed.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,52 @@
+"""
+Liveness and readiness probes for the application server.
+
+``/healthz/`` only proves the worker is serving requests and never touches
+the database, so a slow Postgres does not get healthy workers restarted.
+``/readyz/`` checks every configured database and the API cache and answers
+503 until they respond, so the load balancer holds traffic back from a
+worker that cannot serve it.
+"""
+import logging
+
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from garage.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+
+@never_cache
+@require_GET
+def healthz(request):
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_GET
+def readyz(request):
+    checks = {}
+    for alias in connections:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            checks[f'database:{alias}'] = 'ok'
+        except DatabaseError:
+            logger.exception('Readiness check failed for database %r', alias)
+            checks[f'database:{alias}'] = 'unavailable'
+
+    try:
+        get_cache().get('readyz')
+        checks['cache'] = 'ok'
+    except Exception:
+        logger.exception('Readiness check failed for the API cache')
+        checks['cache'] = 'unavailable'
+
+    ready = all(result == 'ok' for result in checks.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    )
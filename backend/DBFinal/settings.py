@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'django_filters',
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'garage.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'garage.db_router.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'DBFinal.urls'
@@ -81,6 +85,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'DBFinal.wsgi.application'
 
+TEST_RUNNER = 'garage.test_runner.GarageTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -93,7 +99,78 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# With DB_POOL=True each worker process keeps a psycopg 3 connection pool and
+# requests borrow from it; the total connection count against Postgres is
+# bounded by workers * DB_POOL_MAX_SIZE. Without the pool each request opens
+# its own connection: under ASGI, persistent connections (DB_CONN_MAX_AGE)
+# would be left open in every executor thread that ever touched the
+# database, so only raise it when serving WSGI.
+# ASYNC_READ_WORKERS threads per process run the independent reads of
+# garage.async_views.gather_reads concurrently on pooled connections; without
+# the pool each would open a connection of its own, so the reads run one
+# after another on the request's connection instead.
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '4')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        },
     }
+    ASYNC_READ_WORKERS = int(os.getenv('ASYNC_READ_WORKERS', os.getenv('DB_POOL_MAX_SIZE', '4')))
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '0'))
+    ASYNC_READ_WORKERS = 0
+
+# Read replicas: DB_REPLICA_HOSTS="host[:port],..." adds one database alias
+# per host (replica_1, replica_2, ...) with the primary's settings, pool
+# included, and credentials unless DB_REPLICA_USER / DB_REPLICA_PASSWORD are
+# set. garage.db_router decides per request which one serves the reads.
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['garage.db_router.ReplicaRouter']
+# Seconds a client that wrote keeps reading from the primary.
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The API response cache is per process with LocMemCache; point
+# API_CACHE_BACKEND at FileBasedCache to share it between workers. Entries
+# are keyed on the table generations kept in the database (garage.cache), so
+# a per-process cache never serves data another process has changed.
+
+API_CACHE_ALIAS = 'api'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    API_CACHE_ALIAS: {
+        'BACKEND': os.getenv('API_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('API_CACHE_LOCATION', 'garage-api'),
+        'TIMEOUT': int(os.getenv('API_CACHE_TIMEOUT', '300')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('API_CACHE_MAX_ENTRIES', '1000')),
+        },
+    },
 }
 
 
@@ -148,12 +225,15 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'X-Cache']
 CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL', 'False') == 'True'
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'garage.renderers.FastJSONRenderer',
+        'garage.renderers.ColumnarJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
@@ -167,3 +247,43 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
+
+# Garage settings
+LIFECYCLE_WARNING_THRESHOLD = float(os.getenv('LIFECYCLE_WARNING_THRESHOLD', '80'))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', '10'))
+# Days a car session holds its garage bay, counted from the session date.
+BAY_BOOKING_DAYS = int(os.getenv('BAY_BOOKING_DAYS', '1'))
+# Open work orders a technician may hold, by certification_level, highest
+# level first ("A:5,B:3,C:2"); other levels get the default.
+WORK_QUEUE_CAPACITY = {
+    level.strip(): int(limit)
+    for level, _, limit in (item.partition(':') for item in os.getenv('WORK_QUEUE_CAPACITY', 'A:5,B:3,C:2').split(','))
+}
+WORK_QUEUE_DEFAULT_CAPACITY = int(os.getenv('WORK_QUEUE_DEFAULT_CAPACITY', '1'))
+
+# Live change feed at /api/events/ (garage.events). A subscriber more than
+# CHANGE_FEED_QUEUE_SIZE events behind is disconnected and resumes from the
+# change_event table, which prune_change_events trims to the retention.
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv('CHANGE_FEED_QUEUE_SIZE', '1000'))
+CHANGE_FEED_REPLAY_PAGE = int(os.getenv('CHANGE_FEED_REPLAY_PAGE', '500'))
+CHANGE_FEED_HEARTBEAT = float(os.getenv('CHANGE_FEED_HEARTBEAT', '15'))
+CHANGE_FEED_RETENTION_HOURS = float(os.getenv('CHANGE_FEED_RETENTION_HOURS', '24'))
+
+# Raw telemetry files; TelemetrySession.data_location is resolved under this.
+TELEMETRY_ROOT = os.getenv('TELEMETRY_ROOT', str(BASE_DIR / 'telemetry'))
+TELEMETRY_MAX_BUCKETS = int(os.getenv('TELEMETRY_MAX_BUCKETS', '5000'))
+TELEMETRY_CHUNK_SAMPLES = int(os.getenv('TELEMETRY_CHUNK_SAMPLES', '1000000'))
+TELEMETRY_STORE_ROOT = os.getenv('TELEMETRY_STORE_ROOT', str(BASE_DIR / 'telemetry_store'))
+TELEMETRY_STORE_CHUNK_SAMPLES = int(os.getenv('TELEMETRY_STORE_CHUNK_SAMPLES', '65536'))
+TELEMETRY_PYRAMID_FACTOR = int(os.getenv('TELEMETRY_PYRAMID_FACTOR', '16'))
+# Channel integrated by accrue_mileage, in km/h.
+TELEMETRY_SPEED_CHANNEL = os.getenv('TELEMETRY_SPEED_CHANNEL', 'speed')
+# Sessions still without an end_time this long after they started are taken
+# as abandoned (a crashed logger) and passed over by accrue_mileage.
+TELEMETRY_OPEN_SESSION_HOURS = float(os.getenv('TELEMETRY_OPEN_SESSION_HOURS', '24'))
+
+# Request profiling (garage.profiling.ProfilingMiddleware); 0 disables it.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', '2000'))
+PROFILING_SLOWEST_QUERIES = int(os.getenv('PROFILING_SLOWEST_QUERIES', '5'))
@@ -9,5 +9,8 @@ echo "PostgreSQL started"
 echo "Running migrations..."
 python manage.py migrate --noinput
 
+echo "Rebuilding part wear summary..."
+python manage.py rebuild_part_wear
+
 echo "Starting server..."
 exec "$@"
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Q
 from .models import (
-    Team, Person, Garage, GarageBay, Car, Part, CarPart,
-    Session, CarSession, TelemetrySession, WorkOrder, WorkAssignment
+    Team, Person, Garage, GarageBay, Car, Part, CarPart, PartWear,
+    Session, CarSession, TelemetrySession, TelemetryArtifact, WorkOrder, WorkAssignment,
+    Technician
 )
+from .scheduling import allocate_bays
 
 
 @admin.register(Team)
@@ -66,12 +70,47 @@ class CarPartAdmin(admin.ModelAdmin):
     date_hierarchy = 'installed_at'
 
 
+class NeedsReplacementFilter(admin.SimpleListFilter):
+    title = 'needs replacement'
+    parameter_name = 'needs_replacement'
+
+    def lookups(self, request, model_admin):
+        return [('1', 'Yes'), ('0', 'No')]
+
+    def queryset(self, request, queryset):
+        due = Q(lifecycle_percentage__gte=settings.LIFECYCLE_WARNING_THRESHOLD)
+        if self.value() == '1':
+            return queryset.filter(due)
+        if self.value() == '0':
+            return queryset.exclude(due)
+        return queryset
+
+
+@admin.register(PartWear)
+class PartWearAdmin(admin.ModelAdmin):
+    list_display = ['part', 'current_car', 'cumulative_mileage', 'lifecycle_percentage', 'due', 'refreshed_at']
+    search_fields = ['part__serial_number', 'part__part_type']
+    list_filter = [NeedsReplacementFilter]
+    raw_id_fields = ['part', 'current_car_part', 'current_car']
+    readonly_fields = ['refreshed_at']
+
+    @admin.display(boolean=True, description='needs replacement', ordering='lifecycle_percentage')
+    def due(self, obj):
+        return obj.due_for_replacement()
+
+
 @admin.register(Session)
 class SessionAdmin(admin.ModelAdmin):
     list_display = ['race_name', 'session_type', 'session_date']
     search_fields = ['race_name']
     list_filter = ['session_type', 'session_date']
     date_hierarchy = 'session_date'
+    actions = ['allocate_bays']
+
+    @admin.action(description='Allocate garage bays to unassigned entries')
+    def allocate_bays(self, request, queryset):
+        result = allocate_bays(queryset)
+        self.message_user(request, f"Assigned {result['assigned']}, unassigned {len(result['unassigned'])}.")
 
 
 @admin.register(CarSession)
@@ -91,6 +130,14 @@ class TelemetrySessionAdmin(admin.ModelAdmin):
     date_hierarchy = 'start_time'
 
 
+@admin.register(TelemetryArtifact)
+class TelemetryArtifactAdmin(admin.ModelAdmin):
+    list_display = ['telemetry', 'samples', 'pyramid_levels', 'size_bytes', 'ingested_at']
+    search_fields = ['source_location', 'path']
+    raw_id_fields = ['telemetry']
+    readonly_fields = ['ingested_at']
+
+
 class WorkAssignmentInline(admin.TabularInline):
     model = WorkAssignment
     extra = 0
@@ -113,3 +160,10 @@ class WorkAssignmentAdmin(admin.ModelAdmin):
     search_fields = ['person__first_name', 'person__last_name', 'role']
     list_filter = ['role']
     raw_id_fields = ['work_order', 'person']
+
+
+@admin.register(Technician)
+class TechnicianAdmin(admin.ModelAdmin):
+    list_display = ['user', 'person']
+    search_fields = ['user__username', 'person__first_name', 'person__last_name']
+    raw_id_fields = ['user', 'person']
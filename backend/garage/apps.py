@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GarageConfig(AppConfig):
     name = 'garage'
+
+    def ready(self):
+        from . import signals  # noqa: F401
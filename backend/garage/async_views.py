@@ -0,0 +1,153 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Part, CarPart, PartWear
+from .renderers import dumps
+from .views import PartViewSet
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def _isolated(read):
+    def run():
+        close_old_connections()
+        try:
+            return read()
+        finally:
+            close_old_connections()
+    return run
+
+
+@functools.cache
+def _read_executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gather-reads')
+
+
+async def gather_reads(**reads):
+    """
+    Run independent synchronous reads concurrently and return their results
+    by keyword.
+
+    Django's async ORM funnels every query through one shared thread, so
+    awaiting several querysets at once still runs them back to back. Here
+    the reads share the process's ``ASYNC_READ_WORKERS`` threads, each read
+    on a connection borrowed from the pool. Without the pool
+    (``ASYNC_READ_WORKERS`` is 0), and inside an atomic block, where other
+    connections cannot see uncommitted rows, the reads run one after another
+    on the request's connection instead.
+    """
+    if not settings.ASYNC_READ_WORKERS or await sync_to_async(lambda: connection.in_atomic_block)():
+        return {name: await sync_to_async(read)() for name, read in reads.items()}
+    executor = _read_executor(settings.ASYNC_READ_WORKERS)
+    calls = [sync_to_async(_isolated(read), thread_sensitive=False, executor=executor)() for read in reads.values()]
+    return dict(zip(reads, await asyncio.gather(*calls)))
+
+
+class AsyncReadView(View):
+    """
+    Async list and retrieve for a read-only garage viewset, served under
+    ``/api/async/<prefix>/``.
+
+    The viewset still supplies the authentication, permission and throttle
+    classes, queryset, filter backends, serializer and page size; rows are
+    fetched with ``aget`` / ``aiterator`` and serialized once loaded, so the
+    worker's event loop is free while Postgres answers.
+    Lists are always page-number paginated.
+    """
+    viewset = None
+    http_method_names = ['get', 'head']
+
+    async def get(self, request, pk=None):
+        # What DRF's dispatch does before and around the handler, so the
+        # viewset's authentication, permissions and throttles apply here too.
+        action = 'list' if pk is None else 'retrieve'
+        viewset = self.viewset(action_map={'get': action, 'head': action})
+        viewset.args, viewset.kwargs = (), {} if pk is None else {'pk': pk}
+        viewset.format_kwarg = None
+        viewset.request = viewset.initialize_request(request)
+        viewset.headers = viewset.default_response_headers
+        try:
+            await sync_to_async(viewset.initial)(viewset.request)
+            if pk is None:
+                return await self.list(viewset)
+            return await self.retrieve(viewset, pk)
+        except Exception as exc:
+            return viewset.finalize_response(viewset.request, viewset.handle_exception(exc))
+
+    def get_queryset(self, viewset):
+        return viewset.get_queryset()
+
+    async def list(self, viewset):
+        request = viewset.request
+        queryset = await sync_to_async(viewset.filter_queryset)(self.get_queryset(viewset))
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+
+        page_size = viewset.paginator.get_page_size(request)
+        try:
+            page_number = int(request.query_params.get('page', 1))
+            if page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound('Invalid page.')
+
+        count = await queryset.acount()
+        offset = (page_number - 1) * page_size
+        if offset and offset >= count:
+            raise NotFound('Invalid page.')
+
+        objects = [
+            obj async for obj in queryset[offset:offset + page_size].aiterator(chunk_size=page_size)
+        ]
+        url = request.build_absolute_uri()
+        if page_number == 1:
+            previous = None
+        elif page_number == 2:
+            previous = remove_query_param(url, 'page')
+        else:
+            previous = replace_query_param(url, 'page', page_number - 1)
+        return json_response({
+            'count': count,
+            'next': replace_query_param(url, 'page', page_number + 1) if offset + page_size < count else None,
+            'previous': previous,
+            'results': await self.serialize(viewset, objects, many=True),
+        })
+
+    async def retrieve(self, viewset, pk):
+        queryset = await sync_to_async(viewset.filter_queryset)(self.get_queryset(viewset))
+        try:
+            obj = await queryset.aget(pk=pk)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            raise NotFound(f'No {queryset.model._meta.object_name} matches the given query.')
+        await sync_to_async(viewset.check_object_permissions)(viewset.request, obj)
+        return json_response(await self.serialize(viewset, obj))
+
+    async def serialize(self, viewset, data, many=False):
+        instances = data if many else [data]
+        await PartWear.objects.aattach(
+            [obj for obj in instances if isinstance(obj, Part)]
+            + [obj.part for obj in instances if isinstance(obj, CarPart) and CarPart.part.is_cached(obj)]
+        )
+        return viewset.get_serializer(data, many=many).data
+
+
+class AsyncLifecycleWarningsView(AsyncReadView):
+    viewset = PartViewSet
+    replica_actions = ('get',)
+
+    def get_queryset(self, viewset):
+        threshold = viewset.get_threshold(viewset.request)
+        return viewset.get_queryset().lifecycle_warnings(threshold)
+
@@ -0,0 +1,241 @@
+import re
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser
+
+from .cache import get_cache
+from .models import Car, PartWear
+
+# Synthetic dataset sizes, keyed by the number of car_part rows. Every scale
+# has 10 teams with 2 cars each; parts, sessions and work orders grow with it.
+SCALES = {
+    'small': 1_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+}
+
+TEAMS = 10
+CARS_PER_TEAM = 2
+PEOPLE_PER_TEAM = 20
+BAYS_PER_GARAGE = 4
+INSTALLS_PER_PART = 4
+
+# Extra query parameters some routes need to do real work.
+ROUTE_PARAMS = {
+    'search-list': {'q': 'SN-1'},
+}
+
+DATASET_SQL = [
+    """
+    INSERT INTO team (name, country, principal_name)
+    SELECT 'Team ' || g, 'Country ' || (g %% 5), 'Principal ' || g
+    FROM generate_series(1, %(teams)s) g
+    """,
+    """
+    INSERT INTO person (team_id, first_name, last_name, role, certification_level)
+    SELECT t.team_id, 'First' || g, 'Last' || t.team_id || '-' || g,
+           (ARRAY['Mechanic', 'Engineer', 'Technician'])[1 + g %% 3],
+           (ARRAY['A', 'B', 'C'])[1 + g %% 3]
+    FROM team t CROSS JOIN generate_series(1, %(people_per_team)s) g
+    """,
+    """
+    INSERT INTO garage (team_id, location, season_year)
+    SELECT team_id, 'Paddock ' || team_id, %(season)s FROM team
+    """,
+    """
+    INSERT INTO garage_bay (garage_id, bay_number, is_active)
+    SELECT ga.garage_id, g, g < %(bays)s
+    FROM garage ga CROSS JOIN generate_series(1, %(bays)s) g
+    """,
+    """
+    INSERT INTO car (team_id, car_number, chassis_number, status)
+    SELECT t.team_id, t.team_id * 10 + g, 'CH-' || t.team_id || '-' || g, 'active'
+    FROM team t CROSS JOIN generate_series(1, %(cars_per_team)s) g
+    """,
+    """
+    INSERT INTO part (part_type, serial_number, fia_lifecycle_limit, manufacturer)
+    SELECT (ARRAY['Engine', 'Gearbox', 'MGU-K', 'MGU-H', 'Turbocharger'])[1 + g %% 5],
+           'SN-' || g,
+           CASE WHEN g %% 7 = 0 THEN NULL ELSE 2000 + (g %% 4) * 1000 END,
+           (ARRAY['Ferrari', 'Mercedes', 'Honda', 'Renault'])[1 + g %% 4]
+    FROM generate_series(1, %(parts)s) g
+    """,
+    """
+    INSERT INTO car_part (car_id, part_id, installed_at, removed_at, mileage)
+    SELECT c.car_id, p.part_id,
+           %(start)s::timestamptz + ((p.rn * %(installs)s + k) * interval '1 hour'),
+           CASE WHEN k < %(installs)s - 1
+                THEN %(start)s::timestamptz + ((p.rn * %(installs)s + k + 1) * interval '1 hour')
+           END,
+           (p.rn * 37 + k * 101) %% 1500
+    FROM (SELECT part_id, row_number() OVER (ORDER BY part_id) AS rn FROM part) p
+    JOIN (SELECT car_id, row_number() OVER (ORDER BY car_id) - 1 AS idx FROM car) c
+        ON c.idx = p.rn %% %(cars)s
+    CROSS JOIN generate_series(0, %(installs)s - 1) k
+    """,
+    """
+    INSERT INTO session (race_name, session_type, session_date)
+    SELECT 'Grand Prix ' || g, (ARRAY['FP1', 'FP2', 'FP3', 'Q', 'R'])[1 + g %% 5],
+           %(start)s::date + g
+    FROM generate_series(1, %(sessions)s) g
+    """,
+    """
+    INSERT INTO car_session (car_id, session_id, bay_id, status)
+    SELECT c.car_id, s.session_id, NULL, 'completed'
+    FROM car c CROSS JOIN session s
+    """,
+    """
+    INSERT INTO telemetry_session (car_session_id, data_location, start_time, end_time)
+    SELECT cs.car_session_id, '/telemetry/' || cs.car_session_id || '.bin',
+           s.session_date::timestamptz, s.session_date::timestamptz + interval '1 hour'
+    FROM car_session cs JOIN session s ON s.session_id = cs.session_id
+    """,
+    """
+    INSERT INTO work_order (car_id, session_id, description, created_at, completed_at)
+    SELECT cs.car_id, cs.session_id, 'Inspection ' || cs.car_session_id, now(),
+           CASE WHEN cs.car_session_id %% 3 = 0 THEN NULL ELSE now() END
+    FROM car_session cs
+    """,
+    """
+    INSERT INTO work_assignment (work_order_id, person_id, role)
+    SELECT wo.work_order_id,
+           (SELECT min(person_id) FROM person p JOIN car c ON c.team_id = p.team_id
+            WHERE c.car_id = wo.car_id),
+           'Lead'
+    FROM work_order wo
+    """,
+]
+
+
+def generate_dataset(scale):
+    """
+    Fill the garage tables with a deterministic synthetic dataset sized by
+    ``SCALES[scale]`` car_part rows, using set-based INSERT ... SELECT so even
+    the 1M-row scale loads in seconds. Expects empty tables.
+    """
+    car_parts = SCALES[scale]
+    params = {
+        'teams': TEAMS,
+        'people_per_team': PEOPLE_PER_TEAM,
+        'bays': BAYS_PER_GARAGE,
+        'cars_per_team': CARS_PER_TEAM,
+        'cars': TEAMS * CARS_PER_TEAM,
+        'parts': car_parts // INSTALLS_PER_PART,
+        'installs': INSTALLS_PER_PART,
+        'sessions': max(10, car_parts // 1000),
+        'season': timezone.now().year,
+        'start': timezone.now() - timedelta(days=365),
+    }
+    with connection.cursor() as cursor:
+        for sql in DATASET_SQL:
+            cursor.execute(sql, params)
+        cursor.execute('ANALYZE')
+    PartWear.objects.refresh()
+
+
+def discover_routes():
+    """
+    Yield (route name, path) for every GET route the garage router exposes:
+    list, detail and each extra GET action, with URL kwargs filled from the
+    current data. Staff-only viewsets are left out, as the benchmark client
+    is anonymous.
+    """
+    from .urls import router
+
+    kwarg_values = {'car_id': Car.objects.values_list('pk', flat=True).first()}
+    for prefix, viewset, basename in router.registry:
+        if IsAdminUser in viewset.permission_classes:
+            continue
+        yield f'{basename}-list', reverse(f'{basename}-list')
+
+        model = getattr(getattr(viewset, 'queryset', None), 'model', None)
+        if model is not None:
+            pk = model._default_manager.values_list('pk', flat=True).first()
+            if pk is not None:
+                yield f'{basename}-detail', reverse(f'{basename}-detail', kwargs={'pk': pk})
+
+        for extra in viewset.get_extra_actions():
+            if extra.detail or 'get' not in extra.mapping:
+                continue
+            kwargs = {name: kwarg_values[name] for name in re.findall(r'\(\?P<(\w+)>', extra.url_path)}
+            name = f'{basename}-{extra.url_name}'
+            yield name, reverse(name, kwargs=kwargs)
+
+
+def _get(client, path, params):
+    get_cache().clear()
+    response = client.get(path, params)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_route(client, name, path, repeat=10, page_size=None):
+    """
+    Request ``path`` ``repeat`` times with the response cache cleared and
+    return status, query count, p50/p95 latency in ms and peak traced
+    Python memory in KiB.
+    """
+    params = ROUTE_PARAMS.get(name, {})
+    with ExitStack() as stack:
+        if page_size is not None:
+            stack.enter_context(mock.patch.object(PageNumberPagination, 'page_size', page_size))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = _get(client, path, params)
+        # Read now: later requests reset connection.queries.
+        query_count = len(queries)
+
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _get(client, path, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            _get(client, path, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'route': name,
+        'path': path,
+        'status': response.status_code,
+        'queries': query_count,
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(repeat=10, page_sizes=(5, 50)):
+    """
+    Measure every route at each page size. A route whose query count differs
+    between page sizes is issuing per-row queries and is flagged in
+    ``scaling``.
+    """
+    client = Client()
+    results = []
+    scaling = []
+    for name, path in discover_routes():
+        runs = [measure_route(client, name, path, repeat, page_size) for page_size in page_sizes]
+        for page_size, run in zip(page_sizes, runs):
+            results.append({**run, 'page_size': page_size})
+        if len({run['queries'] for run in runs}) > 1:
+            scaling.append(name)
+    return results, scaling
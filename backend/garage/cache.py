@@ -0,0 +1,189 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .db_router import reading_from_replica
+from .models import CacheGeneration
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+GENERATIONS_SQL = """
+    SELECT coalesce(g.token, 0) + count(l.id), max(l.id), greatest(g.changed_at, max(l.changed_at))
+    FROM unnest(%s::text[]) WITH ORDINALITY AS t (table_name, position)
+    LEFT JOIN cache_generation g ON g.table_name = t.table_name
+    LEFT JOIN cache_generation_log l ON l.table_name = t.table_name
+    GROUP BY t.position, g.token, g.changed_at
+    ORDER BY t.position
+"""
+
+# Keeps each table's newest log row, whose id (never reused, even after a
+# rollback) goes into the token alongside the count.
+COMPACT_SQL = """
+    WITH folded AS (
+        DELETE FROM cache_generation_log l
+        WHERE l.id < (SELECT max(newest.id) FROM cache_generation_log newest WHERE newest.table_name = l.table_name)
+        RETURNING l.table_name, l.changed_at
+    ), tokens AS (
+        INSERT INTO cache_generation (table_name, token, changed_at)
+        SELECT table_name, count(*), max(changed_at) FROM folded GROUP BY table_name
+        ON CONFLICT (table_name) DO UPDATE
+            SET token = cache_generation.token + EXCLUDED.token,
+                changed_at = greatest(cache_generation.changed_at, EXCLUDED.changed_at)
+    )
+    SELECT count(*) FROM folded
+"""
+
+
+def _generations(models):
+    """
+    ``(tokens, last_modified)`` of the tables behind ``models``, read from
+    the database that serves the request's reads so they always describe
+    the rows it sees. ``last_modified`` is in seconds since the epoch.
+    """
+    tables = [model._meta.db_table for model in models]
+    with connections[router.db_for_read(CacheGeneration)].cursor() as cursor:
+        cursor.execute(GENERATIONS_SQL, [tables])
+        rows = cursor.fetchall()
+    changed = [changed_at for _, _, changed_at in rows if changed_at is not None]
+    return [f'{token}:{newest}' for token, newest, _ in rows], int(max(changed).timestamp()) if changed else 0
+
+
+def compact_cache_generations():
+    """
+    Fold all but the newest cache_generation_log row of each table into the
+    table's cache_generation token, in one statement so no reader sees a
+    token change. Rows of transactions still in flight stay for the next
+    run. Returns the number of rows folded.
+    """
+    with connections[router.db_for_write(CacheGeneration)].cursor() as cursor:
+        cursor.execute(COMPACT_SQL)
+        return cursor.fetchone()[0]
+
+
+def _record(basename, outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+        _stats[f'{basename}:{outcome}'] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        hits, misses = _stats['hit'], _stats['miss']
+        per_view = {}
+        for key, count in _stats.items():
+            if ':' in key:
+                basename, outcome = key.rsplit(':', 1)
+                per_view.setdefault(basename, {'hit': 0, 'miss': 0, 'not_modified': 0})[outcome] = count
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'not_modified': _stats['not_modified'],
+        'hit_ratio': round(hits / total, 3) if total else None,
+        'views': per_view,
+    }
+
+
+class CachedResponseMixin:
+    """
+    Conditional GET and response caching for ``list``, ``retrieve`` and any
+    action routed through ``cached_response``.
+
+    Validators come from the action, URL kwargs, the normalized query string,
+    the negotiated format and a generation token for every model in
+    ``cache_models``. A trigger logs every write statement on those tables
+    in cache_generation_log and a table's token counts its logged writes, so
+    a write from any worker, command or plain SQL invalidates. Settings the
+    response depends on are listed in ``cache_settings`` and their values
+    enter the validators too. A matching ``If-None-Match`` or
+    ``If-Modified-Since`` is answered with 304 before the queryset is touched.
+    With ``cache_responses`` the response data is also kept in the API cache.
+    Reads from a replica within ``DB_REPLICA_STICKY_SECONDS`` of a write skip
+    all of this, since the replica may still lag behind the write.
+    """
+    cache_models = ()
+    cache_settings = ()
+    cache_responses = True
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_validators(self, request):
+        params = sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        )
+        generations, last_modified = _generations(self.cache_models)
+        parts = [
+            self.basename,
+            self.action,
+            request.get_host(),
+            request.accepted_renderer.format,
+            repr(sorted(self.kwargs.items())),
+            repr(params),
+            repr([getattr(settings, name) for name in self.cache_settings]),
+            *generations,
+        ]
+        digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        return digest, last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return any(
+                candidate.strip().removeprefix('W/') in (etag, '*')
+                for candidate in if_none_match.split(',')
+            )
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    def cached_response(self, request, produce):
+        if not self.cache_models or request.method != 'GET':
+            return produce()
+
+        digest, last_modified = self.get_validators(request)
+        if reading_from_replica() and time.time() - last_modified <= settings.DB_REPLICA_STICKY_SECONDS:
+            return produce()
+        etag = f'"{digest}"'
+        if self.is_not_modified(request, etag, last_modified):
+            _record(self.basename, 'not_modified')
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif not self.cache_responses:
+            response = produce()
+        else:
+            cache = get_cache()
+            key = f'api:{self.basename}:{digest}'
+            data = cache.get(key)
+            if data is not None:
+                _record(self.basename, 'hit')
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+            else:
+                _record(self.basename, 'miss')
+                response = produce()
+                if response.status_code == 200:
+                    cache.set(key, response.data)
+                response['X-Cache'] = 'MISS'
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
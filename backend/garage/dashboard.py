@@ -0,0 +1,126 @@
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.views import View
+
+from .async_views import gather_reads, json_response
+from .models import Team, Car, Part, CarPart, Session, CarSession, WorkOrder
+from .serializers import (
+    TeamSerializer, CarSerializer, PartSerializer, CarPartSerializer,
+    SessionSerializer, CarSessionSerializer, WorkOrderSerializer
+)
+
+
+# Each read issues a fixed number of queries however many rows it returns,
+# so a composite endpoint costs the sum of its reads.
+
+def _teams():
+    return TeamSerializer(Team.objects.order_by('name'), many=True).data
+
+
+def _lifecycle_warnings(limit):
+    parts = Part.objects.lifecycle_warnings(settings.LIFECYCLE_WARNING_THRESHOLD)
+    by_team = {
+        row['team']: row['count']
+        for row in parts.order_by().values(team=F('wear__current_car__team')).annotate(count=Count('pk'))
+    }
+    # Wear is cumulative, so removed parts warn too; they belong to no team.
+    not_installed = by_team.pop(None, 0)
+    return {
+        'count': sum(by_team.values()) + not_installed,
+        'by_team': by_team,
+        'not_installed': not_installed,
+        'results': PartSerializer(parts[:limit], many=True).data,
+    }
+
+
+def _active_car_parts(limit):
+    car_parts = CarPart.objects.select_related('car', 'part').filter(
+        removed_at__isnull=True,
+    ).order_by('-installed_at', '-car_part_id')
+    return CarPartSerializer(car_parts[:limit], many=True).data
+
+
+def _recent_sessions(limit):
+    sessions = Session.objects.order_by('-session_date', '-session_id')
+    return SessionSerializer(sessions[:limit], many=True).data
+
+
+def _open_work_orders(limit, car_id=None):
+    work_orders = WorkOrder.objects.select_related('car', 'session').filter(completed_at__isnull=True)
+    if car_id is not None:
+        work_orders = work_orders.filter(car_id=car_id)
+    latest = work_orders.order_by('-created_at', '-work_order_id')[:limit]
+    return {
+        'count': work_orders.count(),
+        'results': WorkOrderSerializer(latest, many=True).data,
+    }
+
+
+def _car(car_id):
+    car = Car.objects.select_related('team').filter(pk=car_id).first()
+    return CarSerializer(car).data if car is not None else None
+
+
+def _installed_parts(car_id):
+    parts = Part.objects.select_related('wear').filter(wear__current_car=car_id).order_by('part_type', 'part_id')
+    return PartSerializer(parts, many=True).data
+
+
+def _part_history(car_id, limit):
+    car_parts = CarPart.objects.select_related('car', 'part').filter(car_id=car_id).order_by(
+        '-installed_at', '-car_part_id',
+    )
+    return CarPartSerializer(car_parts[:limit], many=True).data
+
+
+def _car_sessions(car_id, limit):
+    car_sessions = CarSession.objects.select_related('car', 'session', 'bay').filter(car_id=car_id).order_by(
+        '-session__session_date', '-car_session_id',
+    )
+    return CarSessionSerializer(car_sessions[:limit], many=True).data
+
+
+class DashboardView(View):
+    """
+    Everything the pit-wall dashboard shows on first paint in one response:
+    teams, lifecycle warnings with per-team counts and the number of warned
+    parts not installed on any car, active car parts, recent sessions and
+    open work orders. The reads run concurrently through ``gather_reads`` and
+    cost seven queries in total.
+    """
+    http_method_names = ['get', 'head']
+
+    async def get(self, request):
+        limit = settings.REST_FRAMEWORK['PAGE_SIZE']
+        return json_response(await gather_reads(
+            teams=_teams,
+            lifecycle_warnings=partial(_lifecycle_warnings, limit),
+            active_car_parts=partial(_active_car_parts, limit),
+            recent_sessions=partial(_recent_sessions, limit),
+            open_work_orders=partial(_open_work_orders, limit),
+        ))
+
+
+class CarOverviewView(View):
+    """
+    One car's page in one response: the car, the parts installed on it with
+    their wear, its part installation history, its recent sessions and its
+    open work orders. Six queries, run through ``gather_reads``.
+    """
+    http_method_names = ['get', 'head']
+
+    async def get(self, request, pk):
+        limit = settings.REST_FRAMEWORK['PAGE_SIZE']
+        data = await gather_reads(
+            car=partial(_car, pk),
+            installed_parts=partial(_installed_parts, pk),
+            part_history=partial(_part_history, pk, limit),
+            recent_sessions=partial(_car_sessions, pk, limit),
+            open_work_orders=partial(_open_work_orders, limit, car_id=pk),
+        )
+        if data['car'] is None:
+            return json_response({'detail': 'No Car matches the given query.'}, status=404)
+        data['warning_count'] = sum(1 for part in data['installed_parts'] if part['needs_replacement'])
+        return json_response(data)
@@ -0,0 +1,109 @@
+"""
+Read replicas for the garage API.
+
+``ReplicaMiddleware`` decides, once per request, where the garage models
+are read from, and ``ReplicaRouter`` applies that decision; every write, and
+every read outside a request, goes to the primary. A request reads from the
+primary when it:
+
+- is not a GET, HEAD or OPTIONS, or is served by the admin;
+- carries the sticky cookie, set for ``DB_REPLICA_STICKY_SECONDS`` on the
+  response to any request that wrote, so a client reads its own writes
+  while the replicas catch up;
+- has already written itself.
+
+Otherwise it reads from one replica of ``DATABASE_REPLICAS``, picked at
+random per request. Cached responses are neither stored nor given
+validators from a replica read while their models changed less than
+``DB_REPLICA_STICKY_SECONDS`` ago, as the replica may not have the change
+yet (see garage.cache). Views list the actions that always read from a replica,
+sticky cookie or not, in ``replica_actions`` (DRF action names, or the
+handler method for plain views), so heavy analytics reads stay off the
+primary. Models of other apps (sessions, auth) always use the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'garage_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('garage_db_routing', default=None)
+
+
+class _Routing:
+    def __init__(self, replica, read_alias):
+        self.replica = replica
+        self.read_alias = read_alias
+        self.wrote = False
+
+
+def reading_from_replica():
+    """Whether the current request reads the garage models from a replica."""
+    routing = _routing.get()
+    return routing is not None and routing.read_alias != DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or model._meta.app_label != 'garage':
+            return None
+        return routing.read_alias
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.read_alias = DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replica = random.choice(settings.DATABASE_REPLICAS)
+        primary = request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES
+        routing = _Routing(replica, DEFAULT_DB_ALIAS if primary else replica)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if routing.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        if routing is None or routing.wrote:
+            return None
+        if request.resolver_match.app_name == 'admin':
+            routing.read_alias = DEFAULT_DB_ALIAS
+        elif request.method in SAFE_METHODS:
+            view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+            method = 'get' if request.method == 'HEAD' else request.method.lower()
+            actions = getattr(view_func, 'actions', None)
+            action = actions.get(method) if actions else method
+            if action in getattr(view_class, 'replica_actions', ()):
+                routing.read_alias = routing.replica
+        return None
@@ -0,0 +1,317 @@
+"""
+Live change feed: Server-Sent Events for rows of car_part, car_session and
+work_order, served at ``/api/events/`` by ``DBFinal.asgi``.
+
+The ``garage_change_event`` trigger (migrations 0009, 0010 and 0015)
+records every change as a ``ChangeEvent`` row and announces it with
+``NOTIFY garage_changes`` carrying the compact event ``{"id", "table",
+"op", "row", "car", "fields"}`` and its horizon. Notifications arrive when
+the writing transaction commits, in commit order, which is not always id
+order.
+
+Each worker process holds one LISTEN connection, opened by the first
+subscriber and kept until shutdown, and copies every notification into the
+queue of each subscriber whose filters match, so the database sees one
+listener per worker however many screens are open. A client that falls too far behind,
+or that was connected while the listener had to reconnect, has its stream
+closed; EventSource reconnects with ``Last-Event-ID`` and the missed events
+are replayed from the change_event table. A stream replays only once LISTEN
+is in effect, so nothing committed while the listener (re)connects is lost.
+
+The SSE id of an event is ``<id>:<horizon>``, the horizon being the oldest
+transaction still running when the event was recorded. Resuming after it
+replays the later ids and every event of a transaction from the horizon on,
+since those may have committed after the client left with lower ids. Some
+of them the client has already seen; it drops repeated ids.
+
+Query parameters: ``car`` (repeatable) and ``table`` (repeatable) filter
+the events; ``last_event_id`` resumes like the ``Last-Event-ID`` header.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+import orjson
+import psycopg
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .async_views import gather_reads
+from .models import ChangeEvent
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'garage_changes'
+TABLES = ('car_part', 'car_session', 'work_order')
+EVENT_FIELDS = ('id', 'table_name', 'op', 'row_id', 'car_id', 'fields', 'horizon')
+
+
+def _event(row):
+    event_id, table, op, row_id, car_id, fields, horizon = row
+    return {
+        'id': event_id, 'table': table, 'op': op, 'row': row_id, 'car': car_id, 'fields': fields, 'horizon': horizon,
+    }
+
+
+def prune_change_events(older_than=None):
+    """Delete events older than ``older_than`` (a timedelta). Returns the count."""
+    if older_than is None:
+        older_than = timedelta(hours=settings.CHANGE_FEED_RETENTION_HOURS)
+    deleted, _ = ChangeEvent.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+class Subscription:
+    def __init__(self, cars=None, tables=None):
+        self.cars = cars
+        self.tables = tables
+        self.queue = asyncio.Queue(maxsize=settings.CHANGE_FEED_QUEUE_SIZE)
+        self.closed = False
+
+    def matches(self, event):
+        return (
+            (not self.cars or event['car'] in self.cars)
+            and (not self.tables or event['table'] in self.tables)
+        )
+
+    def close(self):
+        """Drop whatever is queued and wake the reader with the end marker."""
+        if not self.closed:
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class ChangeFeed:
+    """The worker's single LISTEN connection and its subscribers."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.task = None
+        # Set while LISTEN is in effect on a live connection.
+        self.listening = None
+
+    def subscribe(self, cars=None, tables=None):
+        subscription = Subscription(cars, tables)
+        self.subscribers.add(subscription)
+        if self.task is None or self.task.done():
+            self.listening = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.listen())
+        return subscription
+
+    async def wait_listening(self, timeout):
+        """Whether LISTEN is in effect, waiting up to ``timeout`` seconds for it."""
+        if self.listening is None:
+            return False
+        try:
+            await asyncio.wait_for(self.listening.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, event):
+        for subscription in list(self.subscribers):
+            if subscription.closed or not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.unsubscribe(subscription)
+                subscription.close()
+
+    def close_all(self):
+        for subscription in list(self.subscribers):
+            self.unsubscribe(subscription)
+            subscription.close()
+
+    def conninfo(self):
+        params = connections['default'].get_connection_params()
+        return {key: params[key] for key in ('dbname', 'user', 'password', 'host', 'port') if params.get(key)}
+
+    async def listen(self):
+        """
+        LISTEN until ``stop``. When the connection drops every stream is
+        closed, since notifications sent in the meantime are lost; clients
+        catch up from the table when they reconnect.
+        """
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**self.conninfo(), autocommit=True) as conn:
+                    await conn.execute(f'LISTEN {CHANNEL}')
+                    self.listening.set()
+                    delay = 1
+                    async for notify in conn.notifies():
+                        self.publish(orjson.loads(notify.payload))
+            except psycopg.OperationalError as exc:
+                logger.warning('Change feed listener lost its connection: %s', exc)
+                self.listening.clear()
+                self.close_all()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def stop(self):
+        self.close_all()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.listening = None
+
+
+change_feed = ChangeFeed()
+
+
+def _replay(last_id, horizon, cars, tables, limit, after=None):
+    """
+    The events a client that last saw ``last_id``, recorded with
+    ``horizon``, may have missed, in id order and past ``after`` if given.
+    """
+    missed = Q(id__gt=last_id)
+    if horizon is not None:
+        missed |= Q(xact_id__gte=horizon)
+    events = ChangeEvent.objects.filter(missed).order_by('id')
+    if after is not None:
+        events = events.filter(id__gt=after)
+    if cars:
+        events = events.filter(car_id__in=cars)
+    if tables:
+        events = events.filter(table_name__in=tables)
+    return [_event(row) for row in events.values_list(*EVENT_FIELDS)[:limit]]
+
+
+def _message(event):
+    data = {key: value for key, value in event.items() if key != 'horizon'}
+    event_id = str(event['id']) if event.get('horizon') is None else f"{event['id']}:{event['horizon']}"
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (event_id.encode(), event['table'].encode(), dumps(data))
+
+
+def _parse(scope):
+    """
+    ``(cars, tables, resume, error)`` from the query string and the
+    ``Last-Event-ID`` header; ``resume`` is ``(last_id, horizon)`` or None
+    and ``error`` is the 400 message for bad input.
+    """
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    headers = dict(scope.get('headers', []))
+    try:
+        cars = {int(car) for car in query.get('car', [])}
+        last_id = query.get('last_event_id', [None])[-1] or headers.get(b'last-event-id', b'').decode('latin-1')
+        if last_id:
+            last_id, _, horizon = last_id.partition(':')
+            resume = int(last_id), int(horizon) if horizon else None
+        else:
+            resume = None
+    except ValueError:
+        return None, None, None, 'car must be an integer and last_event_id an event id.'
+    tables = set(query.get('table', []))
+    if tables - set(TABLES):
+        return None, None, None, f"table must be one of {', '.join(TABLES)}."
+    return cars, tables, resume, None
+
+
+def _cors_headers(scope):
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin is None:
+        return []
+    if not settings.CORS_ALLOW_ALL_ORIGINS and origin.decode('latin-1') not in settings.CORS_ALLOWED_ORIGINS:
+        return []
+    headers = [(b'access-control-allow-origin', origin), (b'vary', b'origin')]
+    if settings.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+async def _respond(send, status, body, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': dumps(body)})
+
+
+async def _stream(scope, send, cars, tables, resume):
+    subscription = change_feed.subscribe(cars, tables)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *_cors_headers(scope),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+        # Subscribed, and LISTEN in effect, before replaying, so nothing
+        # committed meanwhile is missed; replayed ids are skipped when they
+        # also arrive live.
+        while not subscription.closed and not await change_feed.wait_listening(settings.CHANGE_FEED_HEARTBEAT):
+            await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+        # Transactions can commit out of id order, hence a set rather than
+        # the highest id.
+        replayed = set()
+        after = None
+        while resume is not None:
+            page = (await gather_reads(
+                page=lambda: _replay(*resume, cars, tables, settings.CHANGE_FEED_REPLAY_PAGE, after),
+            ))['page']
+            for event in page:
+                replayed.add(event['id'])
+                await send({'type': 'http.response.body', 'body': _message(event), 'more_body': True})
+            if len(page) < settings.CHANGE_FEED_REPLAY_PAGE:
+                break
+            after = page[-1]['id']
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.CHANGE_FEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            if event is None:
+                break
+            if event['id'] in replayed:
+                continue
+            await send({'type': 'http.response.body', 'body': _message(event), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app for ``GET /api/events/``; runs until the client disconnects."""
+    if scope['method'] != 'GET':
+        await _respond(send, 405, {'detail': f"Method \"{scope['method']}\" not allowed."}, [(b'allow', b'GET')])
+        return
+    cars, tables, resume, error = _parse(scope)
+    if error:
+        await _respond(send, 400, {'detail': error}, _cors_headers(scope))
+        return
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    streamer = asyncio.ensure_future(_stream(scope, send, cars, tables, resume))
+    done, pending = await asyncio.wait({watcher, streamer}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        task.result()
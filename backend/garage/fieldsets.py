@@ -0,0 +1,134 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def _names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    ``?fields=a,b`` limits a serializer to those fields; ``?expand=x,y``
+    adds nested fields listed in ``Meta.expandable_fields``, which are left
+    out unless asked for. Nested fields outside ``expandable_fields`` are
+    returned by default, and naming them in ``expand`` keeps them alongside
+    a ``fields`` list. Top-level serializers read both from the request in
+    their context; ``fields`` / ``expand`` keyword arguments override it.
+
+    ``Meta.field_dependencies`` maps each SerializerMethodField to the model
+    paths it reads, so ``fieldset_plan`` can derive the queryset it needs.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self._context.get('request')
+        if request is not None and fields is None and expand is None:
+            params = getattr(request, 'query_params', request.GET)
+            fields, expand = params.get('fields'), params.get('expand')
+        self._requested_fields = _names(fields) or None
+        self._expand = _names(expand)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        requested = self._requested_fields
+
+        unknown = (requested or set()) - set(fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        nested = {name for name, field in fields.items() if isinstance(field, serializers.BaseSerializer)}
+        unknown = self._expand - expandable - nested
+        if unknown:
+            raise ValidationError({'expand': f"Cannot expand: {', '.join(sorted(unknown))}."})
+
+        for name in list(fields):
+            if name in self._expand:
+                continue
+            if name in expandable or (requested is not None and name not in requested):
+                del fields[name]
+        return fields
+
+
+def _walk(model, path):
+    """
+    Follow ``path`` (a list of field names) from ``model``; return whether it
+    ends on a relation.
+    """
+    field = None
+    for name in path:
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field is not None and field.is_relation
+
+
+def fieldset_plan(serializer, prefix=''):
+    """
+    Return ``(only, select_related, prefetch_related)`` covering exactly the
+    fields ``serializer`` will output, with every path under ``prefix``.
+    """
+    model = serializer.Meta.model
+    dependencies = getattr(serializer.Meta, 'field_dependencies', {})
+    only = {prefix + model._meta.pk.name}
+    select = set()
+    prefetch = []
+
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.ListSerializer):
+            relation = model._meta.get_field(field.source)
+            child_only, child_select, child_prefetch = fieldset_plan(field.child)
+            child_only.add(relation.field.name)
+            queryset = relation.related_model._default_manager.all()
+            if child_select:
+                queryset = queryset.select_related(*child_select)
+            queryset = queryset.prefetch_related(*child_prefetch).only(*child_only)
+            prefetch.append(Prefetch(prefix + field.source, queryset=queryset))
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            path = prefix + '__'.join(field.source_attrs)
+            select.add(path)
+            nested_only, nested_select, nested_prefetch = fieldset_plan(field, path + '__')
+            only |= nested_only
+            select |= nested_select
+            prefetch += nested_prefetch
+            continue
+
+        if field.source == '*':
+            if name not in dependencies:
+                raise ImproperlyConfigured(
+                    f'{type(serializer).__name__}.Meta.field_dependencies has no entry for {name!r}.'
+                )
+            # Relations a method reads are fetched whole, in the same query.
+            paths = [(dependency.split('__'), True) for dependency in dependencies[name]]
+        else:
+            paths = [(field.source_attrs, False)]
+
+        for parts, select_target in paths:
+            only.add(prefix + '__'.join(parts))
+            for index in range(1, len(parts)):
+                select.add(prefix + '__'.join(parts[:index]))
+            if select_target and _walk(model, parts):
+                select.add(prefix + '__'.join(parts))
+
+    return only, select, prefetch
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset side of sparse fieldsets: after filtering, the queryset is cut
+    down to the columns, joins and prefetches the serializer's fields need
+    (see ``fieldset_plan``). ``cursor_ordering`` columns stay loaded for
+    keyset pagination.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        only, select, prefetch = fieldset_plan(self.get_serializer())
+        for name in getattr(self, 'cursor_ordering', None) or ():
+            only.add(name.lstrip('-'))
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*prefetch).only(*only)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.mileage import accrue_telemetry_mileage
+
+
+class Command(BaseCommand):
+    help = 'Add telemetry distance from finished sessions past the high-water mark to the car parts installed then.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Telemetry sessions applied per transaction.')
+
+    def handle(self, *args, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.monotonic()
+        summary = accrue_telemetry_mileage(batch_size)
+        elapsed = time.monotonic() - started
+
+        for skipped in summary['skipped']:
+            self.stderr.write(f"telemetry {skipped['telemetry_id']}: {skipped['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Accrued {summary['distance']:.1f} km to {summary['car_parts']} car parts from "
+            f"{summary['sessions']} sessions (skipped {len(summary['skipped'])}), "
+            f"now at telemetry {summary['position']} in {elapsed:.3f}s."
+        ))
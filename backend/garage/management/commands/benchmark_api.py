@@ -0,0 +1,55 @@
+import json as _json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.benchmark import SCALES, generate_dataset, run_benchmark
+from garage.test_runner import GarageTestRunner
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every garage API route against a synthetic dataset in a '
+        'throwaway test database. Fails if any route issues per-row queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per route and page size.')
+        parser.add_argument(
+            '--page-size', type=int, action='append', dest='page_sizes',
+            help='Page size to measure (repeatable, default 5 and 50).',
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs.')
+
+    def handle(self, *args, scale, repeat, page_sizes, json, keepdb, **options):
+        page_sizes = page_sizes or [5, 50]
+        runner = GarageTestRunner(verbosity=0, keepdb=keepdb)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            self.stderr.write(f'Generating {scale} dataset ({SCALES[scale]:,} car_part rows)...')
+            generate_dataset(scale)
+            results, scaling = run_benchmark(repeat=repeat, page_sizes=page_sizes)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        if json:
+            self.stdout.write(_json.dumps({'scale': scale, 'results': results, 'scaling': scaling}, indent=2))
+        else:
+            self.write_table(results)
+
+        if scaling:
+            raise CommandError(f"Query count scales with page size on: {', '.join(scaling)}")
+        self.stdout.write(self.style.SUCCESS('No route scales its query count with page size.'))
+
+    def write_table(self, results):
+        header = f"{'route':<32} {'page':>5} {'status':>6} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f"{row['route']:<32} {row['page_size']:>5} {row['status']:>6} {row['queries']:>7} "
+                f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['peak_kib']:>9}"
+            )
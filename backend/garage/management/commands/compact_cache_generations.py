@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from garage.cache import compact_cache_generations
+
+
+class Command(BaseCommand):
+    help = 'Fold logged table writes into the cache generation tokens.'
+
+    def handle(self, *args, **options):
+        folded = compact_cache_generations()
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} logged writes.'))
@@ -0,0 +1,52 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.mileage import apply_mileage_deltas, summarize_outcomes
+
+
+class Command(BaseCommand):
+    help = 'Apply a batch of post-session mileage deltas (JSON or CSV, keyed by car and part serial).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON or CSV file with car, serial_number, delta; '-' reads stdin.")
+        parser.add_argument(
+            '--format', choices=['json', 'csv'],
+            help='Input format. Defaults to the file extension, or JSON for stdin.',
+        )
+
+    def handle(self, *args, path, format=None, **options):
+        if format is None:
+            format = 'csv' if path.lower().endswith('.csv') else 'json'
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            try:
+                rows = list(csv.DictReader(stream)) if format == 'csv' else json.load(stream)
+            except (csv.Error, ValueError) as exc:
+                raise CommandError(f'Could not parse {path}: {exc}')
+
+        if not isinstance(rows, list):
+            raise CommandError('Expected a list of mileage deltas.')
+
+        started = time.monotonic()
+        outcomes = apply_mileage_deltas(rows)
+        elapsed = time.monotonic() - started
+
+        for outcome in outcomes:
+            if outcome['status'] != 'updated':
+                errors = json.dumps(outcome['errors']) if 'errors' in outcome else ''
+                self.stderr.write(f"row {outcome['row']}: {outcome['status']} {errors}".rstrip())
+
+        summary = summarize_outcomes(outcomes)
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {summary['updated']}, not found {summary['not_found']}, "
+            f"invalid {summary['invalid']} in {elapsed:.3f}s."
+        ))
@@ -0,0 +1,107 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from garage.models import TelemetrySession, TelemetryArtifact
+from garage.telemetry import TelemetryError, resolve_location
+from garage.telemetry_store import STORE_VERSION, build_store, store_path
+
+
+class Command(BaseCommand):
+    help = 'Convert raw telemetry files into the columnar store, skipping sessions whose artifact is current.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--session', type=int, action='append', dest='telemetry_ids',
+            help='Only ingest the given telemetry session id (repeatable).',
+        )
+        parser.add_argument('--car', type=int, help='Only ingest sessions of the given car id.')
+        parser.add_argument('--workers', type=int, help='Worker processes. Defaults to one per CPU.')
+        parser.add_argument('--force', action='store_true', help='Rebuild artifacts even when they are current.')
+
+    def handle(self, *args, telemetry_ids=None, car=None, workers=None, force=False, **options):
+        sessions = TelemetrySession.objects.select_related('artifact').order_by('pk')
+        if telemetry_ids:
+            sessions = sessions.filter(pk__in=telemetry_ids)
+        if car is not None:
+            sessions = sessions.filter(car_session__car_id=car)
+
+        chunk = settings.TELEMETRY_STORE_CHUNK_SAMPLES
+        factor = settings.TELEMETRY_PYRAMID_FACTOR
+        pending, unchanged, failed = {}, 0, 0
+        for telemetry in sessions:
+            try:
+                source = resolve_location(telemetry.data_location)
+                stat = source.stat()
+            except (TelemetryError, OSError) as exc:
+                self.stderr.write(f'telemetry {telemetry.pk}: {exc}')
+                failed += 1
+                continue
+            fingerprint = {
+                'source_location': telemetry.data_location,
+                'source_size': stat.st_size,
+                'source_mtime_ns': stat.st_mtime_ns,
+                'format_version': STORE_VERSION,
+                'chunk_samples': max(factor, chunk // factor * factor),
+                'pyramid_factor': factor,
+            }
+            if not force and self.is_current(telemetry, fingerprint):
+                unchanged += 1
+                continue
+            pending[telemetry.pk] = (source, fingerprint)
+
+        started = time.monotonic()
+        ingested = 0
+        if pending:
+            # Workers start from a clean interpreter rather than a fork of
+            # this one, so they never inherit its database connections.
+            context = multiprocessing.get_context('forkserver')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = {
+                    pool.submit(build_store, source, store_path(telemetry_id), chunk, factor): telemetry_id
+                    for telemetry_id, (source, _) in pending.items()
+                }
+                for future in as_completed(futures):
+                    telemetry_id = futures[future]
+                    try:
+                        meta = future.result()
+                    except (TelemetryError, OSError) as exc:
+                        self.stderr.write(f'telemetry {telemetry_id}: {exc}')
+                        failed += 1
+                        continue
+                    self.record(telemetry_id, pending[telemetry_id][1], meta)
+                    ingested += 1
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {ingested}, unchanged {unchanged}, failed {failed} in {elapsed:.3f}s.'
+        ))
+
+    def is_current(self, telemetry, fingerprint):
+        try:
+            artifact = telemetry.artifact
+        except TelemetryArtifact.DoesNotExist:
+            return False
+        return (
+            all(getattr(artifact, name) == value for name, value in fingerprint.items())
+            and (Path(settings.TELEMETRY_STORE_ROOT) / artifact.path).is_file()
+        )
+
+    def record(self, telemetry_id, fingerprint, meta):
+        TelemetryArtifact.objects.update_or_create(
+            telemetry_id=telemetry_id,
+            defaults={
+                **fingerprint,
+                'path': store_path(telemetry_id).name,
+                'pyramid_levels': meta['levels'],
+                'samples': meta['samples'],
+                'channels': meta['channels'],
+                'size_bytes': meta['size_bytes'],
+                'ingested_at': timezone.now(),
+            },
+        )
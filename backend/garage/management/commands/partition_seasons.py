@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.partitioning import TABLES, PartitionError, archive_season, close_season, partition_table, partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Season partitioning of car_part, car_session and telemetry_session: '
+        '"setup" converts the tables in place, "close" moves a finished season out of the default '
+        'partition, "archive" detaches a closed season, "status" lists the partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['status', 'setup', 'close', 'archive'])
+        parser.add_argument('--season', type=int, help='Season (calendar year) to close or archive.')
+        parser.add_argument(
+            '--table', action='append', dest='tables', choices=list(TABLES),
+            help='Only act on the given table (repeatable). Defaults to all three.',
+        )
+        parser.add_argument('--schema', default='archive', help='Schema archived partitions are moved to.')
+        parser.add_argument('--drop', action='store_true', help='Drop archived partitions instead of keeping them.')
+
+    def handle(self, *args, action, season=None, tables=None, schema='archive', drop=False, **options):
+        tables = tables or list(TABLES)
+        if action in ('close', 'archive') and season is None:
+            raise CommandError(f'{action} needs --season.')
+
+        try:
+            for table in tables:
+                if action == 'setup':
+                    done = partition_table(table)
+                    for line in done or [f'{table} is already partitioned']:
+                        self.stdout.write(line)
+                elif action == 'close':
+                    moved = close_season(table, season)
+                    self.stdout.write(f'{table}_{season}: moved {moved} rows out of {table}_default')
+                elif action == 'archive':
+                    self.stdout.write(archive_season(table, season, schema, drop))
+                else:
+                    rows = partitions(table)
+                    if not rows:
+                        self.stdout.write(f'{table}: not partitioned')
+                    for name, bound, estimate, size in rows:
+                        self.stdout.write(f'{table}: {name} {bound} ~{estimate} rows, {size / 2 ** 20:.1f} MiB')
+        except PartitionError as exc:
+            raise CommandError(str(exc))
+
+        if action != 'status':
+            self.stdout.write(self.style.SUCCESS(f"{action.capitalize()} done for {', '.join(tables)}."))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.events import prune_change_events
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed events older than the retention period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=settings.CHANGE_FEED_RETENTION_HOURS,
+            help='Keep events from the last HOURS hours. Defaults to CHANGE_FEED_RETENTION_HOURS.',
+        )
+
+    def handle(self, *args, hours, **options):
+        if hours < 0:
+            raise CommandError('--hours cannot be negative.')
+        deleted = prune_change_events(timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change events.'))
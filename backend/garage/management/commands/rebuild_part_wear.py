@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from garage.models import PartWear
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the part_wear summary table from car_part history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--part', type=int, action='append', dest='part_ids',
+            help='Only refresh the given part id (repeatable).',
+        )
+
+    def handle(self, *args, part_ids=None, **options):
+        written = PartWear.objects.refresh(part_ids)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {written} part wear rows.'))
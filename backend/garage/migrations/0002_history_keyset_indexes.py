@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF to_regclass('car_part') IS NOT NULL THEN
+                        CREATE INDEX IF NOT EXISTS car_part_installed_keyset_idx
+                            ON car_part (installed_at, car_part_id);
+                        CREATE INDEX IF NOT EXISTS car_part_car_installed_keyset_idx
+                            ON car_part (car_id, installed_at, car_part_id);
+                    END IF;
+                    IF to_regclass('car_session') IS NOT NULL THEN
+                        CREATE INDEX IF NOT EXISTS car_session_session_keyset_idx
+                            ON car_session (session_id, car_session_id);
+                    END IF;
+                END $$;
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS car_part_installed_keyset_idx;
+                DROP INDEX IF EXISTS car_part_car_installed_keyset_idx;
+                DROP INDEX IF EXISTS car_session_session_keyset_idx;
+            """,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0002_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartWear',
+            fields=[
+                ('part', models.OneToOneField(db_column='part_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='wear', serialize=False, to='garage.part')),
+                ('installed_at', models.DateTimeField(blank=True, null=True)),
+                ('current_mileage', models.IntegerField(blank=True, null=True)),
+                ('cumulative_mileage', models.BigIntegerField(default=0)),
+                ('lifecycle_percentage', models.FloatField(blank=True, db_index=True, null=True)),
+                ('needs_replacement', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField()),
+                ('current_car', models.ForeignKey(blank=True, db_column='current_car_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='garage.car')),
+                ('current_car_part', models.ForeignKey(blank=True, db_column='current_car_part_id', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='garage.carpart')),
+            ],
+            options={
+                'db_table': 'part_wear',
+            },
+        ),
+    ]
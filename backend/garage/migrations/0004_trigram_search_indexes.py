@@ -0,0 +1,46 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# (table, column) pairs searched with icontains / SearchFilter / /api/search/.
+# Django renders icontains as UPPER(column::text) LIKE UPPER(...), so the
+# indexes are built on that expression for the planner to match.
+TRIGRAM_COLUMNS = [
+    ('part', 'part_type'),
+    ('part', 'manufacturer'),
+    ('part', 'serial_number'),
+    ('car', 'chassis_number'),
+    ('team', 'name'),
+    ('person', 'first_name'),
+    ('person', 'last_name'),
+    ('person', 'role'),
+]
+
+
+def _create_sql():
+    statements = []
+    for table, column in TRIGRAM_COLUMNS:
+        statements.append(f"""
+            IF to_regclass('{table}') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_idx
+                    ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops);
+            END IF;""")
+    return 'DO $$\nBEGIN' + ''.join(statements) + '\nEND $$;'
+
+
+def _drop_sql():
+    return ''.join(
+        f'DROP INDEX IF EXISTS {table}_{column}_trgm_idx;\n'
+        for table, column in TRIGRAM_COLUMNS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0003_part_wear'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(sql=_create_sql(), reverse_sql=_drop_sql()),
+    ]
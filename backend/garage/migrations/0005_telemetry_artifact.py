@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0004_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryArtifact',
+            fields=[
+                ('telemetry', models.OneToOneField(db_column='telemetry_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='artifact', serialize=False, to='garage.telemetrysession')),
+                ('path', models.TextField()),
+                ('source_location', models.TextField()),
+                ('source_size', models.BigIntegerField()),
+                ('source_mtime_ns', models.BigIntegerField()),
+                ('format_version', models.PositiveSmallIntegerField()),
+                ('chunk_samples', models.IntegerField()),
+                ('pyramid_factor', models.PositiveSmallIntegerField()),
+                ('pyramid_levels', models.PositiveSmallIntegerField()),
+                ('samples', models.BigIntegerField()),
+                ('channels', models.JSONField(default=list)),
+                ('size_bytes', models.BigIntegerField()),
+                ('ingested_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'telemetry_artifact',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+# GiST over (car_id | part_id, [installed_at, removed_at)) so point-in-time
+# (@>) and overlap (&&) lookups from CarPartQuerySet.as_of / .during, scoped
+# to one car or one part, are answered from the index. btree_gist supplies
+# the integer operator class. The expression must match garage.models.Period.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0006_job_checkpoint'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF to_regclass('car_part') IS NOT NULL THEN
+                        CREATE INDEX IF NOT EXISTS car_part_car_period_gist
+                            ON car_part USING gist (car_id, tstzrange(installed_at, removed_at));
+                        CREATE INDEX IF NOT EXISTS car_part_part_period_gist
+                            ON car_part USING gist (part_id, tstzrange(installed_at, removed_at));
+                    END IF;
+                END $$;
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS car_part_car_period_gist;
+                DROP INDEX IF EXISTS car_part_part_period_gist;
+            """,
+        ),
+    ]
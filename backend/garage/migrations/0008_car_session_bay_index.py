@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0007_car_part_period_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF to_regclass('car_session') IS NOT NULL THEN
+                        CREATE INDEX IF NOT EXISTS car_session_bay_session_idx
+                            ON car_session (bay_id, session_id) WHERE bay_id IS NOT NULL;
+                    END IF;
+                END $$;
+            """,
+            reverse_sql='DROP INDEX IF EXISTS car_session_bay_session_idx;',
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 6.0 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+CHANGE_EVENT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION garage_change_event() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        changed jsonb;
+        fields jsonb := '[]';
+        event_id bigint;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := to_jsonb(OLD);
+        ELSE
+            changed := to_jsonb(NEW);
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            SELECT coalesce(jsonb_agg(n.key ORDER BY n.key), '[]') INTO fields
+            FROM jsonb_each(changed) n
+            JOIN jsonb_each(to_jsonb(OLD)) o ON o.key = n.key
+            WHERE n.value IS DISTINCT FROM o.value;
+            IF fields = '[]' THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+
+        INSERT INTO change_event (table_name, op, row_id, car_id, fields, created_at)
+        VALUES (
+            TG_TABLE_NAME, lower(TG_OP), (changed ->> TG_ARGV[0])::integer,
+            (changed ->> 'car_id')::integer, fields, now()
+        )
+        RETURNING id INTO event_id;
+
+        PERFORM pg_notify('garage_changes', json_build_object(
+            'id', event_id,
+            'table', TG_TABLE_NAME,
+            'op', lower(TG_OP),
+            'row', (changed ->> TG_ARGV[0])::integer,
+            'car', (changed ->> 'car_id')::integer,
+            'fields', fields
+        )::text);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+CHANGE_EVENT_TRIGGERS = """
+    DO $$
+    DECLARE
+        watched text[][] := ARRAY[
+            ARRAY['car_part', 'car_part_id'],
+            ARRAY['car_session', 'car_session_id'],
+            ARRAY['work_order', 'work_order_id']
+        ];
+    BEGIN
+        FOR i IN 1 .. array_length(watched, 1) LOOP
+            IF to_regclass(watched[i][1]) IS NOT NULL THEN
+                EXECUTE format(
+                    'CREATE OR REPLACE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I '
+                    'FOR EACH ROW EXECUTE FUNCTION garage_change_event(%L)',
+                    watched[i][1] || '_change_event', watched[i][1], watched[i][2]
+                );
+            END IF;
+        END LOOP;
+    END $$;
+"""
+
+DROP_CHANGE_EVENT_TRIGGERS = """
+    DROP TRIGGER IF EXISTS car_part_change_event ON car_part;
+    DROP TRIGGER IF EXISTS car_session_change_event ON car_session;
+    DROP TRIGGER IF EXISTS work_order_change_event ON work_order;
+    DROP FUNCTION IF EXISTS garage_change_event();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0008_car_session_bay_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table_name', models.CharField(max_length=50)),
+                ('op', models.CharField(max_length=6)),
+                ('row_id', models.IntegerField()),
+                ('car_id', models.IntegerField(blank=True, null=True)),
+                ('fields', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'change_event',
+                'indexes': [models.Index(fields=['car_id', 'id'], name='change_event_car_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=CHANGE_EVENT_FUNCTION + CHANGE_EVENT_TRIGGERS,
+            reverse_sql=DROP_CHANGE_EVENT_TRIGGERS,
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 6.0 on 2026-10-18 10:20
+
+from django.db import migrations
+
+# Season partitioning (garage.partitioning) moves the change triggers to the
+# partitioned parents, where PostgreSQL clones them onto every partition and
+# TG_TABLE_NAME names the partition; the table is now passed as the second
+# trigger argument. Rows moved between partitions by the partitioning
+# tooling set garage.change_feed_paused so they are not announced.
+CHANGE_EVENT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION garage_change_event() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        source text := coalesce(TG_ARGV[1], TG_TABLE_NAME);
+        changed jsonb;
+        fields jsonb := '[]';
+        event_id bigint;
+    BEGIN
+        IF current_setting('garage.change_feed_paused', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            changed := to_jsonb(OLD);
+        ELSE
+            changed := to_jsonb(NEW);
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            SELECT coalesce(jsonb_agg(n.key ORDER BY n.key), '[]') INTO fields
+            FROM jsonb_each(changed) n
+            JOIN jsonb_each(to_jsonb(OLD)) o ON o.key = n.key
+            WHERE n.value IS DISTINCT FROM o.value;
+            IF fields = '[]' THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+
+        INSERT INTO change_event (table_name, op, row_id, car_id, fields, created_at)
+        VALUES (
+            source, lower(TG_OP), (changed ->> TG_ARGV[0])::integer,
+            (changed ->> 'car_id')::integer, fields, now()
+        )
+        RETURNING id INTO event_id;
+
+        PERFORM pg_notify('garage_changes', json_build_object(
+            'id', event_id,
+            'table', source,
+            'op', lower(TG_OP),
+            'row', (changed ->> TG_ARGV[0])::integer,
+            'car', (changed ->> 'car_id')::integer,
+            'fields', fields
+        )::text);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+CHANGE_EVENT_TRIGGERS = """
+    DO $$
+    DECLARE
+        watched text[][] := ARRAY[
+            ARRAY['car_part', 'car_part_id'],
+            ARRAY['car_session', 'car_session_id'],
+            ARRAY['work_order', 'work_order_id']
+        ];
+    BEGIN
+        FOR i IN 1 .. array_length(watched, 1) LOOP
+            IF to_regclass(watched[i][1]) IS NOT NULL THEN
+                EXECUTE format(
+                    'CREATE OR REPLACE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I '
+                    'FOR EACH ROW EXECUTE FUNCTION garage_change_event(%L, %L)',
+                    watched[i][1] || '_change_event', watched[i][1], watched[i][2], watched[i][1]
+                );
+            END IF;
+        END LOOP;
+    END $$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0009_change_event'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=CHANGE_EVENT_FUNCTION + CHANGE_EVENT_TRIGGERS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+# Tables whose changes invalidate cached API responses (the cache_models of
+# the garage views).
+CACHED_TABLES = [
+    'team', 'person', 'garage', 'garage_bay', 'car', 'part', 'part_wear', 'car_part',
+    'session', 'car_session', 'telemetry_session', 'work_order', 'work_assignment',
+]
+
+# One statement-level trigger per table bumps its token in the writing
+# transaction, so every writer counts: other workers, management commands
+# and plain SQL alike. Tokens are nanoseconds since the epoch and only grow.
+BUMP_FUNCTION = """
+    CREATE OR REPLACE FUNCTION garage_bump_generation() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO cache_generation (table_name, token)
+        VALUES (TG_TABLE_NAME, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint * 1000)
+        ON CONFLICT (table_name) DO UPDATE
+            SET token = greatest(cache_generation.token + 1, EXCLUDED.token);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+BUMP_TRIGGERS = """
+    DO $$
+    DECLARE
+        watched text[] := %s;
+        name text;
+    BEGIN
+        FOREACH name IN ARRAY watched LOOP
+            IF to_regclass(name) IS NOT NULL THEN
+                EXECUTE format(
+                    'CREATE OR REPLACE TRIGGER %%I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %%I '
+                    'FOR EACH STATEMENT EXECUTE FUNCTION garage_bump_generation()',
+                    name || '_cache_generation', name
+                );
+                INSERT INTO cache_generation (table_name, token)
+                VALUES (name, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint * 1000)
+                ON CONFLICT (table_name) DO NOTHING;
+            END IF;
+        END LOOP;
+    END $$;
+""" % ("ARRAY[%s]" % ', '.join(f"'{table}'" for table in CACHED_TABLES))
+
+DROP_TRIGGERS = """
+    DO $$
+    DECLARE
+        watched text[] := %s;
+        name text;
+    BEGIN
+        FOREACH name IN ARRAY watched LOOP
+            IF to_regclass(name) IS NOT NULL THEN
+                EXECUTE format('DROP TRIGGER IF EXISTS %%I ON %%I', name || '_cache_generation', name);
+            END IF;
+        END LOOP;
+    END $$;
+    DROP FUNCTION IF EXISTS garage_bump_generation();
+""" % ("ARRAY[%s]" % ', '.join(f"'{table}'" for table in CACHED_TABLES))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0010_change_event_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('table_name', models.CharField(max_length=63, primary_key=True, serialize=False)),
+                ('token', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'cache_generation',
+            },
+        ),
+        migrations.RunSQL(
+            sql=BUMP_FUNCTION + BUMP_TRIGGERS,
+            reverse_sql=DROP_TRIGGERS,
+        ),
+    ]
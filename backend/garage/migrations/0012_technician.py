@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0011_cache_generation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Technician',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='technician', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('person', models.OneToOneField(db_column='person_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='technician', to='garage.person')),
+            ],
+            options={
+                'db_table': 'technician',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0012_technician'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MileageRemainder',
+            fields=[
+                ('car_part', models.OneToOneField(db_column='car_part_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mileage_remainder', serialize=False, to='garage.carpart')),
+                ('km', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'mileage_remainder',
+            },
+        ),
+    ]
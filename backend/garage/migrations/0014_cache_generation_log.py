@@ -0,0 +1,90 @@
+# Generated by Django 6.0 on 2026-10-18 14:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# The 0011 trigger upserted one cache_generation row per table, so every
+# writer to a table held that row's lock until it committed and concurrent
+# writers queued behind each other. Writers now only insert into
+# cache_generation_log, which takes no lock another writer waits on. A
+# table's token is its cache_generation.token plus the number of its log
+# rows, which only grows as transactions commit, whatever their order,
+# together with its newest log id.
+BUMP_FUNCTION = """
+    CREATE OR REPLACE FUNCTION garage_bump_generation() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO cache_generation_log (table_name) VALUES (TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+# changed_at becomes the commit time, give or take the commit itself, so a
+# transaction committing after a later-started one still moves
+# Last-Modified forward.
+STAMP_TRIGGER = """
+    ALTER TABLE cache_generation_log ALTER COLUMN changed_at SET DEFAULT clock_timestamp();
+
+    CREATE OR REPLACE FUNCTION garage_stamp_generation() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        UPDATE cache_generation_log SET changed_at = clock_timestamp() WHERE id = NEW.id;
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE CONSTRAINT TRIGGER cache_generation_log_commit_time
+        AFTER INSERT ON cache_generation_log
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION garage_stamp_generation();
+"""
+
+# The 0011 function, for reversing.
+UPSERT_FUNCTION = """
+    DROP TRIGGER IF EXISTS cache_generation_log_commit_time ON cache_generation_log;
+    DROP FUNCTION IF EXISTS garage_stamp_generation();
+
+    CREATE OR REPLACE FUNCTION garage_bump_generation() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO cache_generation (table_name, token)
+        VALUES (TG_TABLE_NAME, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint * 1000)
+        ON CONFLICT (table_name) DO UPDATE
+            SET token = greatest(cache_generation.token + 1, EXCLUDED.token);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0013_mileage_remainder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachegeneration',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='CacheGenerationLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table_name', models.CharField(max_length=63)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'cache_generation_log',
+                'indexes': [models.Index(fields=['table_name', 'id'], name='cache_generation_log_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=BUMP_FUNCTION + STAMP_TRIGGER,
+            reverse_sql=UPSERT_FUNCTION,
+        ),
+    ]
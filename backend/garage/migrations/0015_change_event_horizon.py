@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-18 14:50
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Each event now records its transaction (xact_id) and the oldest
+# transaction still running when it was recorded (horizon). Every
+# transaction older than the horizon had committed or aborted by then, so
+# its events have lower ids and were announced first; those of the rest may
+# still arrive. A client resuming after an event is sent everything from
+# its horizon on (see garage.events).
+CHANGE_EVENT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION garage_change_event() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        source text := coalesce(TG_ARGV[1], TG_TABLE_NAME);
+        changed jsonb;
+        fields jsonb := '[]';
+        event_id bigint;
+        horizon bigint := pg_snapshot_xmin(pg_current_snapshot())::text::bigint;
+    BEGIN
+        IF current_setting('garage.change_feed_paused', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            changed := to_jsonb(OLD);
+        ELSE
+            changed := to_jsonb(NEW);
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            SELECT coalesce(jsonb_agg(n.key ORDER BY n.key), '[]') INTO fields
+            FROM jsonb_each(changed) n
+            JOIN jsonb_each(to_jsonb(OLD)) o ON o.key = n.key
+            WHERE n.value IS DISTINCT FROM o.value;
+            IF fields = '[]' THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+
+        INSERT INTO change_event (table_name, op, row_id, car_id, fields, created_at, xact_id, horizon)
+        VALUES (
+            source, lower(TG_OP), (changed ->> TG_ARGV[0])::integer,
+            (changed ->> 'car_id')::integer, fields, now(),
+            pg_current_xact_id()::text::bigint, horizon
+        )
+        RETURNING id INTO event_id;
+
+        PERFORM pg_notify('garage_changes', json_build_object(
+            'id', event_id,
+            'table', source,
+            'op', lower(TG_OP),
+            'row', (changed ->> TG_ARGV[0])::integer,
+            'car', (changed ->> 'car_id')::integer,
+            'fields', fields,
+            'horizon', horizon
+        )::text);
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0014_cache_generation_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='xact_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='changeevent',
+            name='horizon',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['xact_id'], name='change_event_xact_idx'),
+        ),
+        migrations.RunSQL(
+            sql=CHANGE_EVENT_FUNCTION,
+            reverse_sql=import_module('garage.migrations.0010_change_event_partitions').CHANGE_EVENT_FUNCTION,
+        ),
+    ]
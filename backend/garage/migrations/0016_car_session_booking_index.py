@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-10-18 15:30
+
+from django.db import migrations
+
+# A booking's interval depends on its session's date, which lives on
+# session, so the bay conflict check used to join both sides through
+# session before it could compare intervals. car_session now carries a copy
+# of session_date, kept by triggers on both tables, so the check can look up
+# overlapping bookings of a bay with && against a GiST (btree_gist, 0007)
+# index on (bay_id, the session day). The column is left out of the
+# CarSession model; nothing but the conflict check reads it.
+BOOKING_INDEX = """
+    DO $$
+    BEGIN
+        IF to_regclass('car_session') IS NOT NULL AND to_regclass('session') IS NOT NULL THEN
+            ALTER TABLE car_session ADD COLUMN IF NOT EXISTS session_date date;
+
+            CREATE OR REPLACE FUNCTION garage_car_session_date() RETURNS trigger
+            LANGUAGE plpgsql AS $fn$
+            BEGIN
+                SELECT session_date INTO NEW.session_date FROM session WHERE session_id = NEW.session_id;
+                RETURN NEW;
+            END
+            $fn$;
+
+            CREATE OR REPLACE FUNCTION garage_session_date_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $fn$
+            BEGIN
+                UPDATE car_session SET session_date = NEW.session_date
+                WHERE session_id = NEW.session_id AND session_date IS DISTINCT FROM NEW.session_date;
+                RETURN NULL;
+            END
+            $fn$;
+
+            DROP TRIGGER IF EXISTS car_session_session_date ON car_session;
+            CREATE TRIGGER car_session_session_date
+                BEFORE INSERT OR UPDATE OF session_id, session_date ON car_session
+                FOR EACH ROW EXECUTE FUNCTION garage_car_session_date();
+
+            DROP TRIGGER IF EXISTS session_date_changed ON session;
+            CREATE TRIGGER session_date_changed
+                AFTER UPDATE OF session_date ON session
+                FOR EACH ROW EXECUTE FUNCTION garage_session_date_changed();
+
+            PERFORM set_config('garage.change_feed_paused', 'on', true);
+            UPDATE car_session cs SET session_date = s.session_date
+            FROM session s
+            WHERE s.session_id = cs.session_id AND cs.session_date IS DISTINCT FROM s.session_date;
+            PERFORM set_config('garage.change_feed_paused', 'off', true);
+
+            CREATE INDEX IF NOT EXISTS car_session_bay_booking_idx
+                ON car_session USING gist (bay_id, daterange(session_date, session_date, '[]'))
+                WHERE bay_id IS NOT NULL;
+        END IF;
+    END $$;
+"""
+
+DROP_BOOKING_INDEX = """
+    DROP INDEX IF EXISTS car_session_bay_booking_idx;
+    DO $$
+    BEGIN
+        IF to_regclass('session') IS NOT NULL THEN
+            DROP TRIGGER IF EXISTS session_date_changed ON session;
+        END IF;
+        IF to_regclass('car_session') IS NOT NULL THEN
+            DROP TRIGGER IF EXISTS car_session_session_date ON car_session;
+            ALTER TABLE car_session DROP COLUMN IF EXISTS session_date;
+        END IF;
+    END $$;
+    DROP FUNCTION IF EXISTS garage_session_date_changed();
+    DROP FUNCTION IF EXISTS garage_car_session_date();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0015_change_event_horizon'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=BOOKING_INDEX, reverse_sql=DROP_BOOKING_INDEX),
+    ]
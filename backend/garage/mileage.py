@@ -0,0 +1,195 @@
+from collections import defaultdict
+from datetime import timedelta
+from itertools import takewhile
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CarPart, JobCheckpoint, MileageRemainder, PartWear, TelemetrySession
+from .serializers import MileageDeltaSerializer
+from .telemetry import TelemetryError, integrate
+
+ACCRUAL_JOB = 'telemetry_mileage'
+
+
+def apply_mileage_deltas(rows):
+    """
+    Add mileage deltas to active car parts keyed by (car, serial_number).
+
+    All valid rows are applied in one transaction with a single bulk_update;
+    rows that fail validation or match no active install are reported and
+    skipped. Returns one outcome dict per input row, in input order.
+    """
+    outcomes = []
+    pending = []
+    for index, row in enumerate(rows):
+        serializer = MileageDeltaSerializer(data=row)
+        if not serializer.is_valid():
+            outcomes.append({'row': index, 'status': 'invalid', 'errors': serializer.errors})
+            continue
+        outcomes.append({'row': index, 'status': 'pending', **serializer.validated_data})
+        pending.append(outcomes[-1])
+
+    if not pending:
+        return outcomes
+
+    with transaction.atomic():
+        active = CarPart.objects.select_for_update().filter(
+            removed_at__isnull=True,
+            car_id__in={outcome['car'] for outcome in pending},
+            part__serial_number__in={outcome['serial_number'] for outcome in pending},
+        ).select_related('part')
+        by_key = {(car_part.car_id, car_part.part.serial_number): car_part for car_part in active}
+
+        changed = {}
+        for outcome in pending:
+            car_part = by_key.get((outcome['car'], outcome['serial_number']))
+            if car_part is None:
+                outcome['status'] = 'not_found'
+                continue
+
+            mileage = (car_part.mileage or 0) + outcome['delta']
+            if mileage < 0:
+                outcome['status'] = 'invalid'
+                outcome['errors'] = {'delta': ['Resulting mileage would be negative.']}
+                continue
+
+            car_part.mileage = mileage
+            changed[car_part.pk] = car_part
+            outcome.update(status='updated', car_part_id=car_part.pk, mileage=mileage)
+
+        if changed:
+            CarPart.objects.bulk_update(changed.values(), ['mileage'], batch_size=500)
+            PartWear.objects.refresh({car_part.part_id for car_part in changed.values()})
+
+    return outcomes
+
+
+def summarize_outcomes(outcomes):
+    summary = {'updated': 0, 'not_found': 0, 'invalid': 0}
+    for outcome in outcomes:
+        summary[outcome['status']] += 1
+    return summary
+
+
+def session_distances(telemetry, car_parts):
+    """
+    Kilometres covered during ``telemetry`` while each of ``car_parts`` was
+    installed, integrated from the speed channel (km/h) in one pass over the
+    session's samples.
+    """
+    data = telemetry.open_data()
+    data.check_channels([settings.TELEMETRY_SPEED_CHANNEL])
+    start, end = telemetry.start_time, telemetry.end_time
+    bounds = [
+        (
+            (max(car_part.installed_at, start) - start).total_seconds(),
+            (min(car_part.removed_at or end, end) - start).total_seconds(),
+        )
+        for car_part in car_parts
+    ]
+    covered = integrate(data, settings.TELEMETRY_SPEED_CHANNEL, np.ravel(bounds)).reshape(-1, 2)
+    return (covered[:, 1] - covered[:, 0]) / 3600
+
+
+def accrue_telemetry_mileage(batch_size=50):
+    """
+    Add the distance from every finished telemetry session past the
+    ``telemetry_mileage`` checkpoint to the car parts installed during it.
+
+    Sessions are taken in id order, ``batch_size`` at a time, stopping at the
+    first one still running so none is passed over. A session still open
+    ``TELEMETRY_OPEN_SESSION_HOURS`` after it started is taken as abandoned,
+    reported and passed over, so it cannot hold back the ones after it.
+    Each batch's mileage
+    goes out in one bulk_update in the same transaction that moves the
+    checkpoint, so an interrupted run resumes where it stopped and a session
+    is never counted twice. Mileage is whole kilometres; the fraction left
+    over is kept in MileageRemainder and carried into the next batch.
+    Sessions whose telemetry cannot be read are reported and passed over.
+    """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=ACCRUAL_JOB)
+    position = checkpoint.position
+    summary = {'sessions': 0, 'car_parts': 0, 'distance': 0.0, 'skipped': [], 'position': position}
+
+    while True:
+        batch = list(
+            TelemetrySession.objects.select_related('car_session').filter(pk__gt=position).order_by('pk')[:batch_size]
+        )
+        abandoned_before = timezone.now() - timedelta(hours=settings.TELEMETRY_OPEN_SESSION_HOURS)
+        ready = list(takewhile(
+            lambda telemetry: telemetry.end_time is not None or telemetry.start_time < abandoned_before, batch,
+        ))
+        if not ready:
+            break
+        finished = [telemetry for telemetry in ready if telemetry.end_time is not None]
+        for telemetry in ready:
+            if telemetry.end_time is None:
+                summary['skipped'].append({
+                    'telemetry_id': telemetry.pk,
+                    'error': f'still open {settings.TELEMETRY_OPEN_SESSION_HOURS:g} hours after it started.',
+                })
+
+        installs = defaultdict(list)
+        if finished:
+            for car_part in CarPart.objects.filter(
+                Q(removed_at__isnull=True) | Q(removed_at__gt=min(telemetry.start_time for telemetry in finished)),
+                car_id__in={telemetry.car_session.car_id for telemetry in finished},
+                installed_at__lt=max(telemetry.end_time for telemetry in finished),
+            ).only('car_part_id', 'car_id', 'installed_at', 'removed_at'):
+                installs[car_part.car_id].append(car_part)
+
+        deltas = defaultdict(float)
+        for telemetry in finished:
+            car_parts = [
+                car_part for car_part in installs[telemetry.car_session.car_id]
+                if car_part.installed_at < telemetry.end_time
+                and (car_part.removed_at is None or car_part.removed_at > telemetry.start_time)
+            ]
+            if not car_parts:
+                continue
+            try:
+                distances = session_distances(telemetry, car_parts)
+            except TelemetryError as exc:
+                summary['skipped'].append({'telemetry_id': telemetry.pk, 'error': str(exc)})
+                continue
+            for car_part, distance in zip(car_parts, distances):
+                deltas[car_part.pk] += distance
+
+        with transaction.atomic():
+            checkpoint = JobCheckpoint.objects.select_for_update().get(name=ACCRUAL_JOB)
+            if checkpoint.position != position:
+                # Another run applied this batch first.
+                break
+            carried = dict(
+                MileageRemainder.objects.select_for_update().filter(pk__in=list(deltas)).values_list('pk', 'km')
+            )
+            changed, remainders = [], []
+            for car_part in CarPart.objects.select_for_update().filter(pk__in=list(deltas)).only(
+                'car_part_id', 'part_id', 'mileage',
+            ):
+                distance = deltas[car_part.pk] + carried.get(car_part.pk, 0.0)
+                remainders.append(MileageRemainder(car_part=car_part, km=distance - round(distance)))
+                if round(distance):
+                    car_part.mileage = (car_part.mileage or 0) + round(distance)
+                    changed.append(car_part)
+            MileageRemainder.objects.bulk_create(
+                remainders, update_conflicts=True, unique_fields=['car_part'], update_fields=['km'],
+            )
+            if changed:
+                CarPart.objects.bulk_update(changed, ['mileage'], batch_size=500)
+                PartWear.objects.refresh({car_part.part_id for car_part in changed})
+            position = checkpoint.position = ready[-1].pk
+            checkpoint.save(update_fields=['position', 'updated_at'])
+
+        summary['sessions'] += len(finished)
+        summary['car_parts'] += len(changed)
+        summary['distance'] += sum(deltas.values())
+        summary['position'] = position
+        if len(ready) < batch_size:
+            break
+
+    return summary
@@ -1,4 +1,14 @@
-from django.db import models
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db import connection, models
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+
+from .telemetry import TelemetryFile, resolve_location
+from .telemetry_store import TelemetryStore
 
 
 class Team(models.Model):
@@ -94,6 +104,13 @@ class Car(models.Model):
         return f"Car #{self.car_number} - {self.chassis_number}"
 
 
+class PartQuerySet(models.QuerySet):
+    def lifecycle_warnings(self, threshold):
+        return self.select_related('wear').filter(
+            wear__lifecycle_percentage__gte=threshold,
+        ).order_by('-wear__lifecycle_percentage', 'part_id')
+
+
 class Part(models.Model):
     part_id = models.AutoField(primary_key=True)
     part_type = models.CharField(max_length=100)
@@ -101,6 +118,8 @@ class Part(models.Model):
     fia_lifecycle_limit = models.IntegerField(blank=True, null=True)
     manufacturer = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = PartQuerySet.as_manager()
+
     class Meta:
         db_table = 'part'
         managed = False
@@ -109,6 +128,48 @@ class Part(models.Model):
         return f"{self.part_type} - {self.serial_number}"
 
 
+class Period(models.Func):
+    """
+    ``tstzrange(installed_at, removed_at)``: the half-open ``[installed,
+    removed)`` interval a part was fitted, unbounded while it still is. The
+    GiST indexes from migration 0007 are built on exactly this expression.
+    """
+    function = 'tstzrange'
+    output_field = DateTimeRangeField()
+
+    def __init__(self, lower='installed_at', upper='removed_at', **extra):
+        super().__init__(lower, upper, **extra)
+
+
+def season_bounds(season):
+    """``[start, end)`` of a season: the calendar year, in UTC."""
+    return datetime(season, 1, 1, tzinfo=dt_timezone.utc), datetime(season + 1, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def removed_after(at):
+    """
+    Rows not removed by ``at``. The period lookups imply it, but spelled out
+    on removed_at it lets the season partitions of car_part be pruned (see
+    garage.partitioning).
+    """
+    return models.Q(removed_at__isnull=True) | models.Q(removed_at__gt=at)
+
+
+class CarPartQuerySet(models.QuerySet):
+    def as_of(self, at):
+        """Installations in place at instant ``at``."""
+        return self.alias(period=Period()).filter(period__contains=at).filter(removed_after(at))
+
+    def during(self, start, end):
+        """Installations in place at any point of ``[start, end)``."""
+        return self.alias(period=Period()).filter(
+            period__overlap=DateTimeTZRange(start, end),
+        ).filter(removed_after(start))
+
+    def in_season(self, season):
+        return self.during(*season_bounds(season))
+
+
 class CarPart(models.Model):
     car_part_id = models.AutoField(primary_key=True)
     car = models.ForeignKey(
@@ -127,6 +188,8 @@ class CarPart(models.Model):
     removed_at = models.DateTimeField(blank=True, null=True)
     mileage = models.IntegerField(blank=True, null=True)
 
+    objects = CarPartQuerySet.as_manager()
+
     class Meta:
         db_table = 'car_part'
         managed = False
@@ -135,6 +198,162 @@ class CarPart(models.Model):
         return f"{self.part.part_type} on {self.car}"
 
 
+class PartWearManager(models.Manager):
+    SUMMARY_SQL = """
+        SELECT
+            p.part_id, a.car_part_id AS current_car_part_id, a.car_id AS current_car_id,
+            a.installed_at, a.mileage AS current_mileage,
+            COALESCE(t.total, 0) AS cumulative_mileage,
+            CASE WHEN p.fia_lifecycle_limit > 0
+                THEN round(COALESCE(t.total, 0) * 100.0 / p.fia_lifecycle_limit, 1)
+            END AS lifecycle_percentage,
+            COALESCE(p.fia_lifecycle_limit > 0
+                AND COALESCE(t.total, 0) * 100.0 / p.fia_lifecycle_limit >= %(threshold)s, false)
+                AS needs_replacement,
+            now() AS refreshed_at
+        FROM part p
+        LEFT JOIN LATERAL (
+            SELECT cp.car_part_id, cp.car_id, cp.installed_at, cp.mileage
+            FROM car_part cp
+            WHERE cp.part_id = p.part_id AND cp.removed_at IS NULL
+            ORDER BY cp.car_part_id
+            LIMIT 1
+        ) a ON true
+        LEFT JOIN (
+            SELECT part_id, SUM(mileage) AS total
+            FROM car_part
+            {car_part_filter}
+            GROUP BY part_id
+        ) t ON t.part_id = p.part_id
+        {part_filter}
+    """
+
+    REFRESH_SQL = """
+        INSERT INTO part_wear (
+            part_id, current_car_part_id, current_car_id, installed_at,
+            current_mileage, cumulative_mileage, lifecycle_percentage,
+            needs_replacement, refreshed_at
+        )
+        {summary}
+        ON CONFLICT (part_id) DO UPDATE SET
+            current_car_part_id = EXCLUDED.current_car_part_id,
+            current_car_id = EXCLUDED.current_car_id,
+            installed_at = EXCLUDED.installed_at,
+            current_mileage = EXCLUDED.current_mileage,
+            cumulative_mileage = EXCLUDED.cumulative_mileage,
+            lifecycle_percentage = EXCLUDED.lifecycle_percentage,
+            needs_replacement = EXCLUDED.needs_replacement,
+            refreshed_at = EXCLUDED.refreshed_at
+    """
+
+    def _summary(self, part_ids):
+        if part_ids is None:
+            return self.SUMMARY_SQL.format(car_part_filter='', part_filter='')
+        return self.SUMMARY_SQL.format(
+            car_part_filter='WHERE part_id = ANY(%(part_ids)s)',
+            part_filter='WHERE p.part_id = ANY(%(part_ids)s)',
+        )
+
+    def refresh(self, part_ids=None):
+        """
+        Recompute wear rows in one set-based upsert. With ``part_ids`` only
+        those parts are touched; without, every part is rebuilt and rows for
+        deleted parts are dropped. Returns the number of rows written.
+        """
+        params = {'threshold': settings.LIFECYCLE_WARNING_THRESHOLD}
+        if part_ids is None:
+            cleanup = 'DELETE FROM part_wear w WHERE NOT EXISTS (SELECT 1 FROM part p WHERE p.part_id = w.part_id)'
+        else:
+            params['part_ids'] = list(part_ids)
+            cleanup = (
+                'DELETE FROM part_wear w WHERE w.part_id = ANY(%(part_ids)s) '
+                'AND NOT EXISTS (SELECT 1 FROM part p WHERE p.part_id = w.part_id)'
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.REFRESH_SQL.format(summary=self._summary(part_ids)), params)
+            written = cursor.rowcount
+            cursor.execute(cleanup, params)
+        return written
+
+    def summarize(self, part_ids):
+        """
+        Unsaved wear rows for ``part_ids``, computed from car_part in one
+        read: the fallback for parts whose row has not been built yet.
+        Signals and rebuild_part_wear keep the rows; reads never write them.
+        """
+        return list(self.raw(self._summary(part_ids), {
+            'threshold': settings.LIFECYCLE_WARNING_THRESHOLD, 'part_ids': list(part_ids),
+        }))
+
+    def attach(self, parts):
+        """
+        Give parts fetched with select_related('wear') that have no row yet
+        a summarized one, so serializing them afterwards runs no queries.
+        """
+        missing = {
+            part.pk: part for part in parts
+            if Part.wear.is_cached(part) and Part.wear.related.get_cached_value(part) is None
+        }
+        if missing:
+            for wear in self.summarize(missing):
+                missing[wear.pk].wear = wear
+
+    async def aattach(self, parts):
+        await sync_to_async(self.attach)(parts)
+
+
+class PartWear(models.Model):
+    part = models.OneToOneField(
+        Part,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='part_id',
+        db_constraint=False,
+        related_name='wear'
+    )
+    current_car_part = models.ForeignKey(
+        CarPart,
+        on_delete=models.DO_NOTHING,
+        db_column='current_car_part_id',
+        db_constraint=False,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    current_car = models.ForeignKey(
+        Car,
+        on_delete=models.DO_NOTHING,
+        db_column='current_car_id',
+        db_constraint=False,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    installed_at = models.DateTimeField(blank=True, null=True)
+    current_mileage = models.IntegerField(blank=True, null=True)
+    cumulative_mileage = models.BigIntegerField(default=0)
+    lifecycle_percentage = models.FloatField(blank=True, null=True, db_index=True)
+    # Against the threshold of the last refresh; readers use
+    # due_for_replacement(), which follows LIFECYCLE_WARNING_THRESHOLD.
+    needs_replacement = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField()
+
+    objects = PartWearManager()
+
+    class Meta:
+        db_table = 'part_wear'
+
+    def __str__(self):
+        return f"Wear for {self.part}"
+
+    def due_for_replacement(self):
+        """Whether the part has used LIFECYCLE_WARNING_THRESHOLD percent of its lifecycle."""
+        return self.lifecycle_percentage is not None and (
+            self.lifecycle_percentage >= settings.LIFECYCLE_WARNING_THRESHOLD
+        )
+
+
 class Session(models.Model):
     session_id = models.AutoField(primary_key=True)
     race_name = models.CharField(max_length=100)
@@ -200,6 +419,164 @@ class TelemetrySession(models.Model):
     def __str__(self):
         return f"Telemetry for {self.car_session}"
 
+    def open_data(self):
+        """
+        The ingested store when there is one for the current raw file (or
+        the raw file is gone), otherwise the raw file itself. Raises
+        ``TelemetryError`` when neither can be read.
+        """
+        source = resolve_location(self.data_location)
+        artifact = TelemetryArtifact.objects.filter(telemetry=self, source_location=self.data_location).first()
+        if artifact is not None:
+            try:
+                stat = source.stat()
+                current = (stat.st_size, stat.st_mtime_ns) == (artifact.source_size, artifact.source_mtime_ns)
+            except FileNotFoundError:
+                current = True
+            if current:
+                return TelemetryStore(Path(settings.TELEMETRY_STORE_ROOT) / artifact.path)
+        return TelemetryFile(source)
+
+
+class TelemetryArtifact(models.Model):
+    """
+    The columnar store built from a session's raw file by
+    ``ingest_telemetry`` (see ``garage.telemetry_store``). The source
+    location, size and mtime and the store layout it was built with decide
+    whether a re-run has anything to do.
+    """
+    telemetry = models.OneToOneField(
+        TelemetrySession,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='telemetry_id',
+        db_constraint=False,
+        related_name='artifact'
+    )
+    path = models.TextField()
+    source_location = models.TextField()
+    source_size = models.BigIntegerField()
+    source_mtime_ns = models.BigIntegerField()
+    format_version = models.PositiveSmallIntegerField()
+    chunk_samples = models.IntegerField()
+    pyramid_factor = models.PositiveSmallIntegerField()
+    pyramid_levels = models.PositiveSmallIntegerField()
+    samples = models.BigIntegerField()
+    channels = models.JSONField(default=list)
+    size_bytes = models.BigIntegerField()
+    ingested_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'telemetry_artifact'
+
+    def __str__(self):
+        return f"Artifact for {self.telemetry}"
+
+
+class JobCheckpoint(models.Model):
+    """
+    High-water mark of an incremental batch job: the last source row id the
+    job named ``name`` has fully applied.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'job_checkpoint'
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class MileageRemainder(models.Model):
+    """
+    Distance accrued to a car part from telemetry that its integer mileage
+    does not show yet, within half a kilometre either way; garage.mileage
+    carries it into the next batch rather than rounding it away.
+    """
+    car_part = models.OneToOneField(
+        CarPart,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='car_part_id',
+        db_constraint=False,
+        related_name='mileage_remainder'
+    )
+    km = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'mileage_remainder'
+
+    def __str__(self):
+        return f"{self.km:+.3f} km for {self.car_part_id}"
+
+
+class ChangeEvent(models.Model):
+    """
+    A row of car_part, car_session or work_order that was inserted, updated
+    or deleted. Rows are written, and announced with NOTIFY, by the
+    ``garage_change_event`` trigger (see garage.events); updates that change
+    nothing are not recorded. ``fields`` lists the columns an update changed.
+    ``xact_id`` is the writing transaction and ``horizon`` the oldest one
+    still running when the event was recorded.
+    """
+    id = models.BigAutoField(primary_key=True)
+    table_name = models.CharField(max_length=50)
+    op = models.CharField(max_length=6)
+    row_id = models.IntegerField()
+    car_id = models.IntegerField(blank=True, null=True)
+    fields = models.JSONField(default=list)
+    created_at = models.DateTimeField(db_index=True)
+    xact_id = models.BigIntegerField(blank=True, null=True)
+    horizon = models.BigIntegerField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'change_event'
+        indexes = [
+            models.Index(fields=['car_id', 'id'], name='change_event_car_idx'),
+            models.Index(fields=['xact_id'], name='change_event_xact_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.op} {self.table_name} {self.row_id}"
+
+
+class CacheGeneration(models.Model):
+    """
+    Version token of a table for the API's conditional GETs (see
+    garage.cache): ``token`` plus the table's pending ``CacheGenerationLog``
+    rows, which ``compact_cache_generations`` folds in here.
+    """
+    table_name = models.CharField(max_length=63, primary_key=True)
+    token = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'cache_generation'
+
+    def __str__(self):
+        return f"{self.table_name} @ {self.token}"
+
+
+class CacheGenerationLog(models.Model):
+    """
+    One write statement on a cached table, inserted by the
+    ``garage_bump_generation`` statement trigger (migration 0014) from any
+    process. Writers only ever insert here, so they never wait on each other;
+    ``changed_at`` is stamped when the writing transaction commits.
+    """
+    id = models.BigAutoField(primary_key=True)
+    table_name = models.CharField(max_length=63)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'cache_generation_log'
+        indexes = [models.Index(fields=['table_name', 'id'], name='cache_generation_log_idx')]
+
+    def __str__(self):
+        return f"#{self.id} {self.table_name}"
+
 
 class WorkOrder(models.Model):
     work_order_id = models.AutoField(primary_key=True)
@@ -251,3 +628,29 @@ class WorkAssignment(models.Model):
 
     def __str__(self):
         return f"{self.person} - {self.work_order}"
+
+
+class Technician(models.Model):
+    """
+    The login a person uses the work queue with: without staff rights, a
+    user claims and completes work orders only as their own person.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='technician'
+    )
+    person = models.OneToOneField(
+        Person,
+        on_delete=models.CASCADE,
+        db_column='person_id',
+        db_constraint=False,
+        related_name='technician'
+    )
+
+    class Meta:
+        db_table = 'technician'
+
+    def __str__(self):
+        return f"{self.user} as {self.person}"
@@ -0,0 +1,179 @@
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Cheap row estimate for a queryset: pg_class.reltuples for an unfiltered
+    table, summed over the leaf partitions of a partitioned one since
+    autovacuum never analyzes the parent; otherwise, or when a table has not
+    been analyzed yet, the planner's row estimate. Never a COUNT(*).
+    """
+    if not queryset.query.where:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT sum(c.reltuples)::bigint, bool_and(c.reltuples >= 0) '
+                'FROM pg_partition_tree(to_regclass(%s)) t JOIN pg_class c ON c.oid = t.relid '
+                'WHERE t.isleaf',
+                [queryset.model._meta.db_table],
+            )
+            estimate, analyzed = cursor.fetchone()
+        if analyzed:
+            return estimate
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class HistoryPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode for large history tables.
+
+    ``?pagination=cursor`` switches to keyset paging over the view's
+    ``cursor_ordering`` (falling back to ``-pk``), so every page is an index
+    range scan instead of an OFFSET. ``next`` and ``previous`` cursors page
+    forwards from a page's last row and backwards from its first. Keyset
+    pages skip the COUNT(*) unless ``?count=approximate`` asks for an
+    estimate.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = request.query_params.get(self.mode_query_param) == 'cursor'
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.ordering = self.get_ordering(queryset, view)
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approximate':
+            self.approximate_count = estimate_count(queryset)
+
+        position, backwards = self.decode_cursor(request)
+        queryset = queryset.order_by(*[
+            f'-{field.attname}' if descending != backwards else field.attname
+            for field, descending in self.ordering
+        ])
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position, backwards))
+
+        results = list(queryset[:page_size + 1])
+        more = len(results) > page_size
+        self.page_results = results[:page_size]
+        if backwards:
+            self.page_results.reverse()
+            self.has_next, self.has_previous = bool(self.page_results), more
+        else:
+            self.has_next, self.has_previous = more, position is not None
+        return self.page_results
+
+    def get_ordering(self, queryset, view):
+        opts = queryset.model._meta
+        ordering = getattr(view, 'cursor_ordering', None) or ('-pk',)
+        fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            fields.append((field, descending))
+        return fields
+
+    def get_keyset_filter(self, position, backwards=False):
+        # (a, b) < (x, y) expanded as a <= x AND (a < x OR (a = x AND b < y)),
+        # so the leading column stays a plain range predicate for the index.
+        condition = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != backwards else 'gt'
+            clause = Q(**{f'{field.attname}__{lookup}': position[index]})
+            for prior_index, (prior, _) in enumerate(self.ordering[:index]):
+                clause &= Q(**{prior.attname: position[prior_index]})
+            condition |= clause
+
+        lead, descending = self.ordering[0]
+        bound = Q(**{f"{lead.attname}__{'lte' if descending != backwards else 'gte'}": position[0]})
+        return bound & condition
+
+    def decode_cursor(self, request):
+        """
+        ``(position, backwards)`` of the cursor: a list of ordering values,
+        wrapped as ``{"before": [...]}`` for a page ending before them.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            backwards = isinstance(raw, dict)
+            if backwards:
+                raw = raw['before']
+            if len(raw) != len(self.ordering):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for (field, _), value in zip(self.ordering, raw)
+            ], backwards
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, backwards=False):
+        raw = [field.value_to_string(obj) for field, _ in self.ordering]
+        if backwards:
+            raw = {'before': raw}
+        return base64.urlsafe_b64encode(json.dumps(raw).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page_results[-1])
+        )
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page_results[0], backwards=True)
+        )
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        }
+        if self.approximate_count is not None:
+            payload = {'count': self.approximate_count, **payload}
+        return Response(payload)
+
+    def get_html_context(self):
+        if not self.keyset:
+            return super().get_html_context()
+        return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link()}
@@ -0,0 +1,289 @@
+"""
+Season partitioning for the unbounded garage tables.
+
+Each table becomes ``PARTITION BY RANGE`` on its season column, with the
+existing table kept, data and all, as the DEFAULT partition
+``<table>_default``. The default holds the current season and anything not
+yet closed; closing a season moves its rows into ``<table>_<season>``, and
+archiving detaches that partition, which only changes the catalog. The
+Django models keep working unchanged: the ORM sees the same table names and
+columns.
+
+A season is a calendar year (UTC), as for garage bays. Partition keys:
+
+- ``car_part.removed_at``: parts still installed (NULL) always stay in the
+  default partition, so ``is_active`` and point-in-time reads of the
+  current season only scan the default and the seasons they reach back to;
+  a closed season holds the parts removed during it;
+- ``car_session.session_id``, bounded by the ids of the season's sessions,
+  so a ``session`` filter reads exactly one partition;
+- ``telemetry_session.start_time``.
+
+PostgreSQL requires a partitioned table's primary key to contain the
+partition key. car_session and telemetry_session get ``(id, key)``;
+car_part, whose key is nullable, has none on the parent and one on ``id``
+in each partition. Foreign keys that reference a partitioned table
+(telemetry_session.car_session_id) are dropped, leaving that relationship
+to the ORM; foreign keys out of the tables stay on the default partition
+and are copied, NOT VALID, to each closed season until it is archived.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from .models import season_bounds
+
+# Set for the moving transaction so the change feed does not announce rows
+# that only changed partition (see migration 0010).
+PAUSE_CHANGE_FEED = "SET LOCAL garage.change_feed_paused = 'on'"
+
+
+class PartitionError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Spec:
+    pk: str
+    key: str
+    by_session: bool = False
+
+
+TABLES = {
+    'car_part': Spec(pk='car_part_id', key='removed_at'),
+    'car_session': Spec(pk='car_session_id', key='session_id', by_session=True),
+    'telemetry_session': Spec(pk='telemetry_id', key='start_time'),
+}
+
+
+def season_range(season):
+    """``season_bounds`` as SQL literals."""
+    return tuple(f"'{bound.isoformat()}'" for bound in season_bounds(season))
+
+
+def _q(name):
+    return connection.ops.quote_name(name)
+
+
+def _fetch(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def is_partitioned(cursor, table):
+    rows = _fetch(cursor, 'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [table])
+    return bool(rows) and rows[0][0] == 'p'
+
+
+def partitions(table):
+    """``[(name, bound, estimated rows, bytes)]`` of a partitioned table."""
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return []
+        return _fetch(cursor, """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), greatest(c.reltuples, 0)::bigint,
+                   pg_total_relation_size(c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, [table])
+
+
+def _bounds(cursor, table, season):
+    """SQL literals ``(lower, upper)`` for the season's partition of ``table``."""
+    if not TABLES[table].by_session:
+        return season_range(season)
+    start, end = season_range(season)
+    (first, last), = _fetch(cursor, f"""
+        SELECT min(session_id), max(session_id) FROM session
+        WHERE session_date >= {start}::date AND session_date < {end}::date
+    """)
+    if first is None:
+        raise PartitionError(f'Season {season} has no sessions.')
+    (strays,), = _fetch(cursor, f"""
+        SELECT count(*) FROM session
+        WHERE session_id BETWEEN %s AND %s
+          AND NOT (session_date >= {start}::date AND session_date < {end}::date)
+    """, [first, last])
+    if strays:
+        raise PartitionError(
+            f'Session ids {first}-{last} of season {season} include {strays} session(s) of other seasons.'
+        )
+    return str(first), str(last + 1)
+
+
+def partition_table(table):
+    """
+    Turn ``table`` into a partitioned table whose DEFAULT partition is the
+    existing table, renamed ``<table>_default``. No rows are copied; the
+    new parent primary key of car_session and telemetry_session is the one
+    index that has to be built. Returns what was done, for reporting.
+    """
+    spec = TABLES[table]
+    default = f'{table}_default'
+    done = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return done
+        if _fetch(cursor, 'SELECT to_regclass(%s)', [table])[0][0] is None:
+            raise PartitionError(f'Table {table} does not exist.')
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(f'LOCK TABLE {_q(table)} IN ACCESS EXCLUSIVE MODE')
+
+        for name, referencing in _fetch(cursor, """
+            SELECT conname, conrelid::regclass::text FROM pg_constraint
+            WHERE confrelid = to_regclass(%s) AND contype = 'f'
+        """, [table]):
+            cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {_q(name)}')
+            done.append(f'dropped foreign key {name} on {referencing}')
+
+        triggers = _fetch(cursor, """
+            SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal
+        """, [table])
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {_q(name)} ON {_q(table)}')
+
+        indexes = _fetch(cursor, """
+            SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = to_regclass(%s)
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+        """, [table])
+
+        # Identity columns cannot be attached as a partition; keep the
+        # numbering in a plain sequence the parent's default draws from.
+        (identity, sequence), = _fetch(cursor, """
+            SELECT a.attidentity <> '', pg_get_serial_sequence(%s, %s)
+            FROM pg_attribute a WHERE a.attrelid = to_regclass(%s) AND a.attname = %s
+        """, [table, spec.pk, table, spec.pk])
+        if identity:
+            (last,), = _fetch(cursor, f'SELECT coalesce(max({_q(spec.pk)}), 0) FROM {_q(table)}')
+            cursor.execute(f'SELECT last_value, is_called FROM {sequence}')
+            last_value, is_called = cursor.fetchone()
+            last = max(last, last_value if is_called else last_value - 1)
+            cursor.execute(f'ALTER TABLE {_q(table)} ALTER {_q(spec.pk)} DROP IDENTITY')
+            sequence = _q(f'{table}_{spec.pk}_seq')
+            cursor.execute(f'CREATE SEQUENCE {sequence}')
+            cursor.execute('SELECT setval(%s, %s, %s)', [sequence, max(last, 1), last > 0])
+            cursor.execute(f"ALTER TABLE {_q(table)} ALTER {_q(spec.pk)} SET DEFAULT nextval('{sequence}')")
+            done.append(f'replaced the identity of {table}.{spec.pk} with sequence {sequence}')
+
+        pkey = _fetch(cursor, """
+            SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'
+        """, [table])
+        (nullable,), = _fetch(cursor, """
+            SELECT NOT attnotnull FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = %s
+        """, [table, spec.key])
+        cursor.execute(f'ALTER TABLE {_q(table)} RENAME TO {_q(default)}')
+        cursor.execute(f"""
+            CREATE TABLE {_q(table)} (
+                LIKE {_q(default)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+            ) PARTITION BY RANGE ({_q(spec.key)})
+        """)
+        if nullable:
+            if pkey:
+                cursor.execute(
+                    f'ALTER TABLE {_q(default)} RENAME CONSTRAINT {_q(pkey[0][0])} TO {_q(f"{default}_pkey")}'
+                )
+        else:
+            # The parent's key replaces the default's, which a partition
+            # cannot keep alongside it.
+            cursor.execute(f'ALTER TABLE {_q(default)} ALTER {_q(spec.pk)} SET NOT NULL')
+            if pkey:
+                cursor.execute(f'ALTER TABLE {_q(default)} DROP CONSTRAINT {_q(pkey[0][0])}')
+            cursor.execute(f'ALTER TABLE {_q(table)} ADD PRIMARY KEY ({_q(spec.pk)}, {_q(spec.key)})')
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {_q(table)}.{_q(spec.pk)}')
+        cursor.execute(f'ALTER TABLE {_q(table)} ATTACH PARTITION {_q(default)} DEFAULT')
+        done.append(f'partitioned {table} by {spec.key}; the existing rows are in {default}')
+
+        # Indexes on the parent cascade to every partition; the default's
+        # own copies are adopted rather than rebuilt.
+        for name, definition, unique in indexes:
+            if unique:
+                done.append(f'kept unique index {name} on {default} only')
+                continue
+            cursor.execute(f'ALTER INDEX {_q(name)} RENAME TO {_q(f"{name}_default"[:63])}')
+            cursor.execute(_on_parent(definition, table))
+        for _, definition in triggers:
+            cursor.execute(_on_parent(definition, table))
+    return done
+
+
+def _on_parent(definition, table):
+    """Point an index or trigger definition read from ``table`` at its new parent."""
+    return re.sub(rf' ON (ONLY )?(\w+\.)?"?{table}"? ', f' ON {_q(table)} ', definition, count=1)
+
+
+def close_season(table, season):
+    """
+    Move the season's rows out of the default partition into a new
+    ``<table>_<season>`` partition and attach it. Returns the rows moved.
+    """
+    spec = TABLES[table]
+    default, name = f'{table}_default', f'{table}_{season}'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            raise PartitionError(f'{table} is not partitioned; run setup first.')
+        if _fetch(cursor, 'SELECT to_regclass(%s)', [name])[0][0] is not None:
+            raise PartitionError(f'{name} already exists.')
+        lower, upper = _bounds(cursor, table, season)
+        key = _q(spec.key)
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(PAUSE_CHANGE_FEED)
+
+        cursor.execute(f'CREATE TABLE {_q(name)} (LIKE {_q(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        if not _fetch(cursor, "SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [table]):
+            # Without a parent key (car_part), each partition keys its ids.
+            cursor.execute(f'ALTER TABLE {_q(name)} ADD PRIMARY KEY ({_q(spec.pk)})')
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {_q(default)} WHERE {key} >= {lower} AND {key} < {upper} RETURNING *
+            )
+            INSERT INTO {_q(name)} SELECT * FROM moved
+        """)
+        moved = cursor.rowcount
+
+        for constraint, definition in _fetch(cursor, """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+        """, [default]):
+            cursor.execute(
+                f'ALTER TABLE {_q(name)} ADD CONSTRAINT {_q(f"{name}_{constraint}"[:63])} {definition} NOT VALID'
+            )
+        # A matching CHECK lets ATTACH skip scanning the new partition.
+        bounds = _q(f'{name}_bounds')
+        cursor.execute(
+            f'ALTER TABLE {_q(name)} ADD CONSTRAINT {bounds} '
+            f'CHECK ({key} IS NOT NULL AND {key} >= {lower} AND {key} < {upper})'
+        )
+        cursor.execute(f'ALTER TABLE {_q(table)} ATTACH PARTITION {_q(name)} FOR VALUES FROM ({lower}) TO ({upper})')
+        cursor.execute(f'ALTER TABLE {_q(name)} DROP CONSTRAINT {bounds}')
+    return moved
+
+
+def archive_season(table, season, schema='archive', drop=False):
+    """
+    Detach ``<table>_<season>`` and move it to ``schema``, or drop it.
+    Detaching only touches the catalog; its foreign keys are dropped so the
+    archive never constrains live rows.
+    """
+    name = f'{table}_{season}'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not _fetch(cursor, """
+            SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)
+        """, [name, table]):
+            raise PartitionError(f'{name} is not a partition of {table}.')
+        cursor.execute(f'ALTER TABLE {_q(table)} DETACH PARTITION {_q(name)}')
+        if drop:
+            cursor.execute(f'DROP TABLE {_q(name)}')
+            return f'dropped {name}'
+        for (constraint,) in _fetch(cursor, """
+            SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'
+        """, [name]):
+            cursor.execute(f'ALTER TABLE {_q(name)} DROP CONSTRAINT {_q(constraint)}')
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_q(schema)}')
+        cursor.execute(f'ALTER TABLE {_q(name)} SET SCHEMA {_q(schema)}')
+    return f'moved {name} to {schema}.{name}'
@@ -0,0 +1,162 @@
+import random
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_records = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_records_lock = threading.Lock()
+
+
+class _QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.templates[sql] += 1
+            self.slowest.append((elapsed, sql))
+            if len(self.slowest) > settings.PROFILING_SLOWEST_QUERIES:
+                self.slowest.sort(reverse=True)
+                self.slowest.pop()
+
+
+class ProfilingMiddleware:
+    """
+    Samples ``PROFILING_SAMPLE_RATE`` of requests and records, per resolved
+    route: total latency, SQL count and time, the slowest statements, repeated
+    statements (N+1 candidates) and the split between view work (mostly DRF
+    serialization once SQL is subtracted) and response rendering.
+
+    Records go into a per-process ring buffer read by ``profile_summary`` and
+    each sampled response gets a ``Server-Timing`` header. With the rate at 0
+    the middleware removes itself from the stack.
+    """
+
+    def __init__(self, get_response):
+        if settings.PROFILING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = _QueryRecorder()
+        request._profile = {'view_started': None, 'view_finished': None}
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        self.record(request, response, recorder, started, finished)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_profile'):
+            request._profile['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and before the response is rendered.
+        if hasattr(request, '_profile'):
+            request._profile['view_finished'] = time.perf_counter()
+        return response
+
+    def record(self, request, response, recorder, started, finished):
+        total = finished - started
+        view_started = request._profile['view_started'] or started
+        view_finished = request._profile['view_finished'] or finished
+        view = view_finished - view_started
+        render = finished - view_finished
+        serialize = max(view - recorder.duration, 0.0)
+
+        match = request.resolver_match
+        route = match.view_name if match and match.view_name else request.path
+        duplicates = {sql: count for sql, count in recorder.templates.items() if count > 1}
+
+        with _records_lock:
+            _records.append({
+                'route': route,
+                'method': request.method,
+                'status': response.status_code,
+                'total_ms': total * 1000,
+                'sql_count': recorder.count,
+                'sql_ms': recorder.duration * 1000,
+                'serialize_ms': serialize * 1000,
+                'render_ms': render * 1000,
+                'slowest': [(elapsed * 1000, sql) for elapsed, sql in sorted(recorder.slowest, reverse=True)],
+                'duplicates': duplicates,
+            })
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'serialize;dur={serialize * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def profile_summary(route=None):
+    """
+    Aggregate the ring buffer per route, slowest p95 first.
+    """
+    with _records_lock:
+        records = [record for record in _records if route is None or record['route'] == route]
+
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record['route'], []).append(record)
+
+    summary = []
+    for name, group in grouped.items():
+        slowest = sorted(
+            (statement for record in group for statement in record['slowest']),
+            reverse=True,
+        )[:settings.PROFILING_SLOWEST_QUERIES]
+        duplicates = Counter()
+        for record in group:
+            for sql, count in record['duplicates'].items():
+                duplicates[sql] = max(duplicates[sql], count)
+
+        totals = [record['total_ms'] for record in group]
+        summary.append({
+            'route': name,
+            'samples': len(group),
+            'p50_ms': round(statistics.median(totals), 2),
+            'p95_ms': round(_percentile(totals, 0.95), 2),
+            'avg_sql_count': round(statistics.fmean(record['sql_count'] for record in group), 1),
+            'avg_sql_ms': round(statistics.fmean(record['sql_ms'] for record in group), 2),
+            'avg_serialize_ms': round(statistics.fmean(record['serialize_ms'] for record in group), 2),
+            'avg_render_ms': round(statistics.fmean(record['render_ms'] for record in group), 2),
+            'slowest_queries': [{'ms': round(ms, 2), 'sql': sql} for ms, sql in slowest],
+            'repeated_queries': [
+                {'count': count, 'sql': sql} for sql, count in duplicates.most_common(5)
+            ],
+        })
+    return sorted(summary, key=lambda item: item['p95_ms'], reverse=True)
+
+
+def clear_profiles():
+    with _records_lock:
+        _records.clear()
@@ -0,0 +1,190 @@
+"""
+Garage bay allocation for car sessions.
+
+A car session books its bay for ``BAY_BOOKING_DAYS`` days from the session
+date, i.e. the half-open interval ``[session_date, session_date + days)``.
+Bays come from the garages of the car's team for the season (the session
+date's year); only active bays are handed out.
+
+All bookings last the same number of days, so two of them overlap exactly
+when their session dates are less than ``days`` apart. The conflict check
+relies on that: car_session keeps a copy of its session's date (migration
+0016) and the GiST index ``car_session_bay_booking_idx`` on
+``(bay_id, daterange(session_date, session_date, '[]'))`` finds each
+booking's rivals in its bay with ``&&`` against the window
+``(session_date - days, session_date + days)``.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import CarSession, GarageBay
+
+DOUBLE_BOOKINGS_SQL = """
+    SELECT a.bay_id, a.car_session_id, b.car_session_id
+    FROM car_session a
+    JOIN car_session b
+      ON b.bay_id = a.bay_id
+     AND daterange(b.session_date, b.session_date, '[]')
+         && daterange(a.session_date - %(days)s, a.session_date + %(days)s, '()')
+     AND b.car_session_id > a.car_session_id
+    WHERE a.bay_id IS NOT NULL AND b.bay_id IS NOT NULL
+    ORDER BY a.bay_id, a.car_session_id, b.car_session_id
+"""
+
+INACTIVE_BOOKINGS_SQL = """
+    SELECT cs.bay_id, cs.car_session_id
+    FROM car_session cs
+    JOIN garage_bay gb ON gb.bay_id = cs.bay_id
+    WHERE NOT gb.is_active
+    ORDER BY cs.bay_id, cs.car_session_id
+"""
+
+
+def booking(session_date):
+    return session_date, session_date + timedelta(days=settings.BAY_BOOKING_DAYS)
+
+
+def find_bay_conflicts():
+    """
+    Bookings that break the rules: pairs of car sessions whose intervals
+    overlap in the same bay, each pair found by probing the GiST index
+    ``car_session_bay_booking_idx`` with ``bay_id =`` and ``&&`` for the
+    first booking's window, and bookings of inactive bays.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(DOUBLE_BOOKINGS_SQL, {'days': settings.BAY_BOOKING_DAYS})
+        double = [
+            {'bay': bay, 'car_sessions': [first, second]}
+            for bay, first, second in cursor.fetchall()
+        ]
+        cursor.execute(INACTIVE_BOOKINGS_SQL)
+        inactive = [{'bay': bay, 'car_session': car_session} for bay, car_session in cursor.fetchall()]
+    return {'double_bookings': double, 'inactive_bays': inactive}
+
+
+class _Bay:
+    """
+    One bay during a sweep: bookings made by this run end at ``busy_until``;
+    bookings kept from before are sorted intervals checked by bisection.
+    """
+
+    def __init__(self, bay, kept):
+        self.bay = bay
+        self.busy_until = None
+        kept.sort()
+        self.kept_starts = [start for start, _ in kept]
+        self.kept_reach = []
+        reach = None
+        for _, end in kept:
+            reach = end if reach is None else max(reach, end)
+            self.kept_reach.append(reach)
+
+    def is_free(self, start, end):
+        if self.busy_until is not None and self.busy_until > start:
+            return False
+        before = bisect_left(self.kept_starts, end)
+        return before == 0 or self.kept_reach[before - 1] <= start
+
+
+def _sweep(entries, bays, previous_bay):
+    """
+    Interval partitioning: take the entries in start order and give each a
+    free bay, preferring the one its car had last. Without earlier bookings
+    this greedy order needs no more bays than the busiest day does. Each step
+    scans the pool's bays, a handful per team. Returns ``{entry: bay}``; an
+    entry missing from it found no free bay.
+    """
+    assigned = {}
+    for entry in entries:
+        start, end = booking(entry.session.session_date)
+        preferred = previous_bay.get(entry.car_id)
+        candidates = ([bays[preferred]] if preferred in bays else []) + list(bays.values())
+        for candidate in candidates:
+            if candidate.is_free(start, end):
+                candidate.busy_until = end
+                assigned[entry] = candidate.bay
+                previous_bay[entry.car_id] = candidate.bay.pk
+                break
+    return assigned
+
+
+def allocate_bays(sessions, reassign=False):
+    """
+    Assign bays to the car sessions of ``sessions`` (a Session queryset),
+    a whole season in one batch if need be.
+
+    Entries are grouped into one pool per team and season and swept in
+    session-date order; existing bookings outside the batch stay put and
+    block their bays. With ``reassign`` every entry of the batch is
+    reallocated, otherwise only those without a bay. The pools' bay rows are
+    locked for the duration, so concurrent runs cannot hand out the same
+    bay, and all assignments are written with one bulk_update.
+
+    Returns ``{'assigned': n, 'unassigned': [...]}``.
+    """
+    with transaction.atomic():
+        entries = CarSession.objects.select_related('car', 'session').filter(session__in=sessions).order_by(
+            'session__session_date', 'car_session_id',
+        )
+        if not reassign:
+            entries = entries.filter(bay__isnull=True)
+        entries = list(entries)
+        if not entries:
+            return {'assigned': 0, 'unassigned': []}
+
+        pools = defaultdict(list)
+        for entry in entries:
+            pools[entry.car.team_id, entry.session.session_date.year].append(entry)
+
+        bays = list(
+            GarageBay.objects.select_for_update().select_related('garage').filter(
+                is_active=True,
+                garage__team__in={team for team, _ in pools},
+                garage__season_year__in={season for _, season in pools},
+            ).order_by('garage_id', 'bay_number', 'bay_id')
+        )
+        first, _ = booking(entries[0].session.session_date)
+        _, last = booking(max(entry.session.session_date for entry in entries))
+        kept = defaultdict(list)
+        previous_bay = {}
+        for car_id, bay_id, session_date in CarSession.objects.filter(
+            bay__in=bays,
+            session__session_date__gt=first - timedelta(days=settings.BAY_BOOKING_DAYS),
+            session__session_date__lt=last,
+        ).exclude(pk__in=[entry.pk for entry in entries]).order_by('session__session_date').values_list(
+            'car_id', 'bay_id', 'session__session_date',
+        ):
+            kept[bay_id].append(booking(session_date))
+            previous_bay[car_id] = bay_id
+
+        by_pool = defaultdict(dict)
+        for bay in bays:
+            by_pool[bay.garage.team_id, bay.garage.season_year][bay.pk] = _Bay(bay, kept[bay.pk])
+
+        changed, unassigned = [], []
+        for key, pool_entries in pools.items():
+            assigned = _sweep(pool_entries, by_pool.get(key, {}), previous_bay)
+            for entry in pool_entries:
+                bay = assigned.get(entry)
+                if bay is None:
+                    unassigned.append({
+                        'car_session': entry.pk,
+                        'car': entry.car_id,
+                        'session': entry.session_id,
+                        'reason': 'No free bay.' if key in by_pool else 'No active bays for the team this season.',
+                    })
+                    if reassign and entry.bay_id is not None:
+                        entry.bay = None
+                        changed.append(entry)
+                elif bay.pk != entry.bay_id:
+                    entry.bay = bay
+                    changed.append(entry)
+
+        if changed:
+            CarSession.objects.bulk_update(changed, ['bay'], batch_size=500)
+
+    return {'assigned': len(entries) - len(unassigned), 'unassigned': unassigned}
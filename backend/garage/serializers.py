@@ -1,14 +1,18 @@
 from rest_framework import serializers
-from .models import Team, Car, Part, CarPart, Person, Garage, GarageBay, Session, CarSession
+from .fieldsets import SparseFieldsetSerializerMixin
+from .models import (
+    Team, Car, Part, CarPart, PartWear, Person, Garage, GarageBay, Session, CarSession,
+    TelemetrySession, WorkOrder, WorkAssignment
+)
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Team
         fields = ['team_id', 'name', 'country', 'principal_name']
 
 
-class CarSerializer(serializers.ModelSerializer):
+class CarSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     team_name = serializers.CharField(source='team.name', read_only=True)
 
     class Meta:
@@ -16,10 +20,13 @@ class CarSerializer(serializers.ModelSerializer):
         fields = ['car_id', 'car_number', 'chassis_number', 'status', 'team', 'team_name']
 
 
-class PartSerializer(serializers.ModelSerializer):
+class PartSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     lifecycle_percentage = serializers.SerializerMethodField()
     needs_replacement = serializers.SerializerMethodField()
     current_mileage = serializers.SerializerMethodField()
+    cumulative_mileage = serializers.SerializerMethodField()
+    current_car = serializers.SerializerMethodField()
+    installed_at = serializers.SerializerMethodField()
     is_installed = serializers.SerializerMethodField()
 
     class Meta:
@@ -27,32 +34,54 @@ class PartSerializer(serializers.ModelSerializer):
         fields = [
             'part_id', 'part_type', 'serial_number', 'fia_lifecycle_limit',
             'manufacturer', 'lifecycle_percentage', 'needs_replacement',
-            'current_mileage', 'is_installed'
+            'current_mileage', 'cumulative_mileage', 'current_car',
+            'installed_at', 'is_installed'
         ]
+        field_dependencies = {
+            'lifecycle_percentage': ('fia_lifecycle_limit', 'wear'),
+            'needs_replacement': ('wear',),
+            'current_mileage': ('wear',),
+            'cumulative_mileage': ('wear',),
+            'current_car': ('wear',),
+            'installed_at': ('wear',),
+            'is_installed': ('wear',),
+        }
+
+    def _wear(self, obj):
+        # Querysets select_related('wear'); a part whose row has not been
+        # built yet is summarised on the fly, without writing it.
+        try:
+            return obj.wear
+        except PartWear.DoesNotExist:
+            obj.wear, = PartWear.objects.summarize([obj.pk])
+            return obj.wear
 
     def get_lifecycle_percentage(self, obj):
         if not obj.fia_lifecycle_limit:
             return None
-
-        active_part = obj.car_parts.filter(removed_at__isnull=True).first()
-        if not active_part or not active_part.mileage:
-            return 0
-
-        return round((active_part.mileage / obj.fia_lifecycle_limit) * 100, 1)
+        return self._wear(obj).lifecycle_percentage
 
     def get_needs_replacement(self, obj):
-        percentage = self.get_lifecycle_percentage(obj)
-        return percentage is not None and percentage >= 80
+        return self._wear(obj).due_for_replacement()
 
     def get_current_mileage(self, obj):
-        active_part = obj.car_parts.filter(removed_at__isnull=True).first()
-        return active_part.mileage if active_part else None
+        return self._wear(obj).current_mileage
+
+    def get_cumulative_mileage(self, obj):
+        return self._wear(obj).cumulative_mileage
+
+    def get_current_car(self, obj):
+        return self._wear(obj).current_car_id
+
+    def get_installed_at(self, obj):
+        installed_at = self._wear(obj).installed_at
+        return serializers.DateTimeField().to_representation(installed_at) if installed_at else None
 
     def get_is_installed(self, obj):
-        return obj.car_parts.filter(removed_at__isnull=True).exists()
+        return self._wear(obj).current_car_part_id is not None
 
 
-class CarPartSerializer(serializers.ModelSerializer):
+class CarPartSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     car_number = serializers.IntegerField(source='car.car_number', read_only=True)
     chassis_number = serializers.CharField(source='car.chassis_number', read_only=True)
     part_type = serializers.CharField(source='part.part_type', read_only=True)
@@ -70,6 +99,10 @@ class CarPartSerializer(serializers.ModelSerializer):
             'installed_at', 'removed_at', 'mileage', 'lifecycle_percentage',
             'is_active'
         ]
+        field_dependencies = {
+            'lifecycle_percentage': ('part__fia_lifecycle_limit', 'mileage'),
+            'is_active': ('removed_at',),
+        }
 
     def get_lifecycle_percentage(self, obj):
         if not obj.part.fia_lifecycle_limit or not obj.mileage:
@@ -88,7 +121,24 @@ class CarPartDetailSerializer(CarPartSerializer):
         fields = CarPartSerializer.Meta.fields + ['car_details', 'part_details']
 
 
-class PersonSerializer(serializers.ModelSerializer):
+class MileageDeltaSerializer(serializers.Serializer):
+    car = serializers.IntegerField()
+    serial_number = serializers.CharField(max_length=100)
+    delta = serializers.IntegerField()
+
+
+class BayAllocationSerializer(serializers.Serializer):
+    sessions = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    season = serializers.IntegerField(required=False)
+    reassign = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ('sessions' in attrs) == ('season' in attrs):
+            raise serializers.ValidationError('Give either sessions or season.')
+        return attrs
+
+
+class PersonSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     team_name = serializers.CharField(source='team.name', read_only=True)
     full_name = serializers.SerializerMethodField()
 
@@ -98,12 +148,15 @@ class PersonSerializer(serializers.ModelSerializer):
             'person_id', 'first_name', 'last_name', 'full_name',
             'role', 'certification_level', 'team', 'team_name'
         ]
+        field_dependencies = {
+            'full_name': ('first_name', 'last_name'),
+        }
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
 
 
-class GarageBaySerializer(serializers.ModelSerializer):
+class GarageBaySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     garage_location = serializers.CharField(source='garage.location', read_only=True)
 
     class Meta:
@@ -111,7 +164,7 @@ class GarageBaySerializer(serializers.ModelSerializer):
         fields = ['bay_id', 'garage', 'garage_location', 'bay_number', 'is_active']
 
 
-class GarageSerializer(serializers.ModelSerializer):
+class GarageSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     team_name = serializers.CharField(source='team.name', read_only=True)
     bays = GarageBaySerializer(many=True, read_only=True)
 
@@ -120,13 +173,13 @@ class GarageSerializer(serializers.ModelSerializer):
         fields = ['garage_id', 'team', 'team_name', 'location', 'season_year', 'bays']
 
 
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Session
         fields = ['session_id', 'race_name', 'session_type', 'session_date']
 
 
-class CarSessionSerializer(serializers.ModelSerializer):
+class CarSessionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     car_number = serializers.IntegerField(source='car.car_number', read_only=True)
     race_name = serializers.CharField(source='session.race_name', read_only=True)
     session_type = serializers.CharField(source='session.session_type', read_only=True)
@@ -138,3 +191,57 @@ class CarSessionSerializer(serializers.ModelSerializer):
             'car_session_id', 'car', 'session', 'bay', 'status',
             'car_number', 'race_name', 'session_type', 'bay_number'
         ]
+
+
+class TelemetrySessionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    car = serializers.PrimaryKeyRelatedField(source='car_session.car', read_only=True)
+    session = serializers.PrimaryKeyRelatedField(source='car_session.session', read_only=True)
+
+    class Meta:
+        model = TelemetrySession
+        fields = [
+            'telemetry_id', 'car_session', 'car', 'session',
+            'data_location', 'start_time', 'end_time'
+        ]
+
+
+class WorkAssignmentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = WorkAssignment
+        fields = ['work_assignment_id', 'work_order', 'person', 'role']
+
+
+class WorkOrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    car_number = serializers.IntegerField(source='car.car_number', read_only=True)
+    race_name = serializers.CharField(source='session.race_name', read_only=True, default=None)
+    is_open = serializers.SerializerMethodField()
+    assignments = WorkAssignmentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = WorkOrder
+        fields = [
+            'work_order_id', 'car', 'car_number', 'session', 'race_name',
+            'description', 'created_at', 'completed_at', 'is_open', 'assignments'
+        ]
+        expandable_fields = ['assignments']
+        field_dependencies = {
+            'is_open': ('completed_at',),
+        }
+
+    def get_is_open(self, obj):
+        return obj.completed_at is None
+
+
+class WorkClaimSerializer(serializers.Serializer):
+    # Staff only; everyone else claims as their own technician.
+    person = serializers.PrimaryKeyRelatedField(queryset=Person.objects.all(), required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=1)
+
+
+class WorkDispatchSerializer(serializers.Serializer):
+    team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all(), required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+
+
+class WorkCompletionSerializer(serializers.Serializer):
+    work_orders = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
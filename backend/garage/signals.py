@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import CarPart, Part, PartWear
+
+
+def _refresh_wear(*part_ids):
+    part_ids = sorted({part_id for part_id in part_ids if part_id is not None})
+    transaction.on_commit(lambda: PartWear.objects.refresh(part_ids))
+
+
+@receiver(pre_save, sender=CarPart)
+def remember_part_of_car_part(sender, instance, **kwargs):
+    # A reassigned install also leaves the wear of the part it came from.
+    instance._previous_part_id = None if instance._state.adding else (
+        CarPart.objects.filter(pk=instance.pk).values_list('part_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=CarPart)
+@receiver(post_delete, sender=CarPart)
+def refresh_wear_for_car_part(sender, instance, **kwargs):
+    _refresh_wear(instance.part_id, getattr(instance, '_previous_part_id', None))
+
+
+@receiver(post_save, sender=Part)
+def refresh_wear_for_part(sender, instance, **kwargs):
+    _refresh_wear(instance.pk)
@@ -0,0 +1,200 @@
+"""
+Raw telemetry files and memory-mapped access to them.
+
+A raw file is ``MAGIC``, a little-endian uint32 header length, a UTF-8 JSON
+header (``{"version": 1, "channels": [...]}``) and then fixed-width records:
+a float64 ``t`` (seconds from the session start, non-decreasing) followed by
+one float32 per channel. Records are read through ``numpy.memmap``, so only
+the pages a request touches are ever loaded.
+"""
+import bisect
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b'F1TM'
+VERSION = 1
+TIME = 't'
+
+
+class TelemetryError(Exception):
+    pass
+
+
+def resolve_location(data_location):
+    """
+    Map ``TelemetrySession.data_location`` to a path under
+    ``settings.TELEMETRY_ROOT``, refusing anything that escapes it.
+    """
+    root = Path(settings.TELEMETRY_ROOT).resolve()
+    path = (root / data_location.lstrip('/')).resolve()
+    if not path.is_relative_to(root):
+        raise TelemetryError(f'{data_location} is outside the telemetry root.')
+    return path
+
+
+def record_dtype(channels):
+    return np.dtype([(TIME, '<f8')] + [(name, '<f4') for name in channels])
+
+
+def write_telemetry(path, t, channels):
+    """
+    Write a raw telemetry file from a time array and ``{name: values}``.
+    """
+    names = list(channels)
+    records = np.empty(len(t), dtype=record_dtype(names))
+    records[TIME] = t
+    for name in names:
+        records[name] = channels[name]
+    header = json.dumps({'version': VERSION, 'channels': names}).encode('utf-8')
+    with open(path, 'wb') as handle:
+        handle.write(MAGIC + struct.pack('<I', len(header)) + header)
+        records.tofile(handle)
+
+
+class TelemetryFile:
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'rb') as handle:
+                prefix = handle.read(len(MAGIC) + 4)
+                if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+                    raise TelemetryError(f'{self.path.name} is not a telemetry file.')
+                (length,) = struct.unpack('<I', prefix[len(MAGIC):])
+                header = json.loads(handle.read(length))
+            self.channels = header['channels']
+            if not isinstance(self.channels, list) or not all(
+                isinstance(name, str) and name and name != TIME for name in self.channels
+            ):
+                raise TelemetryError(f'{self.path.name} has invalid channel names.')
+            self.dtype = record_dtype(self.channels)
+        except FileNotFoundError:
+            raise TelemetryError(f'{self.path.name} does not exist.')
+        except (ValueError, KeyError, TypeError):
+            # Also duplicate channel names, rejected by np.dtype.
+            raise TelemetryError(f'{self.path.name} has a malformed header.')
+
+        offset = len(MAGIC) + 4 + length
+        size = self.path.stat().st_size - offset
+        self.records = np.memmap(
+            self.path, dtype=self.dtype, mode='r', offset=offset, shape=(size // self.dtype.itemsize,),
+        ) if size >= self.dtype.itemsize else np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def time(self):
+        return self.records[TIME]
+
+    def describe(self):
+        return {
+            'channels': self.channels,
+            'samples': len(self),
+            'start': float(self.time[0]) if len(self) else None,
+            'end': float(self.time[-1]) if len(self) else None,
+        }
+
+    def window(self, start=None, end=None):
+        """
+        Record index range ``[lo, hi)`` with ``start <= t <= end``, found by
+        binary search on the time column. ``bisect`` probes single records;
+        ``np.searchsorted`` would first copy the strided column into memory.
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.time, start)
+        hi = len(self) if end is None else bisect.bisect_right(self.time, end)
+        return lo, max(lo, hi)
+
+    def check_channels(self, names):
+        unknown = [name for name in names if name not in self.channels]
+        if unknown:
+            raise TelemetryError(f"Unknown channel(s): {', '.join(unknown)}.")
+
+    def downsample(self, names, start=None, end=None, buckets=1000, chunk=None):
+        """
+        Split the window into ``buckets`` equal-count buckets and return the
+        first timestamp of each plus min/max/mean per channel.
+
+        The window is reduced ``chunk`` records at a time: each chunk is cut
+        at the bucket edges it spans and reduced with ``reduceat``, then
+        merged into the running per-bucket results, so memory stays bounded
+        by the chunk size however long the window is.
+        """
+        self.check_channels(names)
+        chunk = chunk or settings.TELEMETRY_CHUNK_SAMPLES
+        lo, hi = self.window(start, end)
+        count = hi - lo
+        buckets = max(0, min(buckets, count))
+        edges = lo + (np.arange(buckets + 1, dtype=np.int64) * count) // max(buckets, 1)
+
+        minimum = {name: np.full(buckets, np.inf) for name in names}
+        maximum = {name: np.full(buckets, -np.inf) for name in names}
+        total = {name: np.zeros(buckets) for name in names}
+
+        for first_record in range(lo, hi, chunk):
+            last_record = min(first_record + chunk, hi)
+            first = int(np.searchsorted(edges, first_record, side='right')) - 1
+            last = int(np.searchsorted(edges, last_record - 1, side='right')) - 1
+            ids = np.arange(first, last + 1)
+            offsets = np.maximum(edges[ids], first_record) - first_record
+            block = self.records[first_record:last_record]
+            for name in names:
+                column = np.asarray(block[name])
+                minimum[name][ids] = np.fmin(minimum[name][ids], np.fmin.reduceat(column, offsets))
+                maximum[name][ids] = np.fmax(maximum[name][ids], np.fmax.reduceat(column, offsets))
+                total[name][ids] += np.add.reduceat(column, offsets, dtype=np.float64)
+
+        sizes = np.diff(edges)
+        return {
+            'samples': count,
+            'buckets': buckets,
+            'resolution': 1,
+            TIME: self.time[edges[:-1]] if buckets else np.empty(0),
+            'series': {
+                name: {
+                    'min': minimum[name],
+                    'max': maximum[name],
+                    'mean': total[name] / sizes if buckets else np.empty(0),
+                }
+                for name in names
+            },
+        }
+
+    def iter_chunks(self, names, start=None, end=None, chunk=None):
+        """
+        Yield the window's raw samples ``chunk`` records at a time as
+        ``{"t": [...], <channel>: [...]}`` column blocks.
+        """
+        self.check_channels(names)
+        chunk = chunk or settings.TELEMETRY_CHUNK_SAMPLES
+        lo, hi = self.window(start, end)
+        for first_record in range(lo, hi, chunk):
+            block = self.records[first_record:min(first_record + chunk, hi)]
+            yield {name: np.ascontiguousarray(block[name]) for name in (TIME, *names)}
+
+
+def integrate(source, name, points):
+    """
+    Running trapezoidal integral of channel ``name`` over ``t``, evaluated
+    at each of ``points`` (seconds into the session). Points before the first
+    sample get 0 and points after the last get the whole integral.
+
+    ``source`` is a ``TelemetryFile`` or ``TelemetryStore``; it is read one
+    chunk at a time, carrying the last sample over so no interval is lost at
+    a chunk edge.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    result = np.zeros(len(points))
+    total, previous = 0.0, None
+    for block in source.iter_chunks([name]):
+        t, values = block[TIME].astype(np.float64), block[name].astype(np.float64)
+        if previous is not None:
+            t, values = np.append(previous[0], t), np.append(previous[1], values)
+        cumulative = total + np.concatenate(([0.0], np.cumsum((values[1:] + values[:-1]) / 2 * np.diff(t))))
+        reached = points >= t[0]
+        result[reached] = np.interp(points[reached], t, cumulative)
+        total, previous = cumulative[-1], (t[-1], values[-1])
+    return result
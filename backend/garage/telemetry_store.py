@@ -0,0 +1,272 @@
+"""
+Ingested telemetry: a compressed columnar copy of a raw telemetry file.
+
+An artifact is one zip of ``.npy`` members (the ``np.load`` npz layout):
+
+- ``meta``: channels, sample count, chunk size and pyramid shape, as JSON
+  bytes;
+- ``index``: the first timestamp of every chunk of ``chunk`` samples;
+- ``t/<i>`` and ``<channel>/<i>``: chunk ``i`` of the time column and of
+  each channel, deflated separately so a window only inflates the chunks
+  it overlaps;
+- ``L<k>/t``, ``L<k>/count`` and ``L<k>/<channel>/{min,max,sum}``: pyramid
+  level ``k``, which summarises blocks of ``factor ** k`` samples. Level 1
+  is built from the samples, every further level from the one below, until
+  a level would hold a single block.
+
+Building an artifact only reads the raw file, so ``build_store`` is safe to
+run in worker processes.
+"""
+import json
+import os
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .telemetry import TIME, TelemetryError, TelemetryFile
+
+STORE_VERSION = 1
+
+
+def store_path(telemetry_id):
+    return Path(settings.TELEMETRY_STORE_ROOT) / f'{telemetry_id}.npz'
+
+
+def _write_member(archive, key, array):
+    with archive.open(f'{key}.npy', 'w', force_zip64=True) as member:
+        np.lib.format.write_array(member, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _level_one(raw, names, chunk, factor):
+    """
+    Reduce the raw samples to blocks of ``factor``, ``chunk`` samples at a
+    time. ``chunk`` is a multiple of ``factor``, so blocks never straddle two
+    chunks.
+    """
+    parts = {'t': [], 'count': []}
+    for name in names:
+        parts.update({(name, 'min'): [], (name, 'max'): [], (name, 'sum'): []})
+
+    for first in range(0, len(raw), chunk):
+        block = raw.records[first:first + chunk]
+        offsets = np.arange(0, len(block), factor)
+        parts['t'].append(np.asarray(block[TIME])[offsets])
+        parts['count'].append(np.diff(np.append(offsets, len(block))))
+        for name in names:
+            column = np.asarray(block[name])
+            parts[name, 'min'].append(np.fmin.reduceat(column, offsets))
+            parts[name, 'max'].append(np.fmax.reduceat(column, offsets))
+            parts[name, 'sum'].append(np.add.reduceat(column, offsets, dtype=np.float64))
+    return {key: np.concatenate(values) for key, values in parts.items()}
+
+
+def _coarsen(level, names, factor):
+    offsets = np.arange(0, len(level['t']), factor)
+    coarser = {'t': level['t'][offsets], 'count': np.add.reduceat(level['count'], offsets)}
+    for name in names:
+        coarser[name, 'min'] = np.fmin.reduceat(level[name, 'min'], offsets)
+        coarser[name, 'max'] = np.fmax.reduceat(level[name, 'max'], offsets)
+        coarser[name, 'sum'] = np.add.reduceat(level[name, 'sum'], offsets)
+    return coarser
+
+
+def build_store(source, target, chunk, factor):
+    """
+    Convert the raw file at ``source`` into an artifact at ``target`` and
+    return its metadata. The artifact is written next to ``target`` and
+    renamed into place, so readers never see a partial file.
+    """
+    raw = TelemetryFile(source)
+    names = raw.channels
+    chunk = max(factor, chunk // factor * factor)
+    samples = len(raw)
+    meta = {
+        'version': STORE_VERSION,
+        'channels': names,
+        'samples': samples,
+        'chunk': chunk,
+        'factor': factor,
+        'levels': 0,
+        'start': float(raw.time[0]) if samples else None,
+        'end': float(raw.time[-1]) if samples else None,
+    }
+
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    try:
+        with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            starts = np.arange(0, samples, chunk)
+            _write_member(archive, 'index', np.asarray(raw.time[starts]) if samples else np.empty(0))
+            for number, first in enumerate(starts):
+                block = raw.records[first:first + chunk]
+                for name in (TIME, *names):
+                    _write_member(archive, f'{name}/{number}', block[name])
+
+            level = _level_one(raw, names, chunk, factor) if samples else None
+            while level is not None and len(level['t']) > 1:
+                meta['levels'] += 1
+                prefix = f"L{meta['levels']}"
+                _write_member(archive, f'{prefix}/t', level['t'])
+                _write_member(archive, f'{prefix}/count', level['count'])
+                for name in names:
+                    for stat in ('min', 'max', 'sum'):
+                        _write_member(archive, f'{prefix}/{name}/{stat}', level[name, stat])
+                level = _coarsen(level, names, factor)
+
+            _write_member(archive, 'meta', np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    meta['size_bytes'] = target.stat().st_size
+    return meta
+
+
+class TelemetryStore:
+    """
+    Read side of an artifact, with the same ``describe`` / ``check_channels``
+    / ``downsample`` / ``iter_chunks`` interface as ``TelemetryFile``.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            self.archive = np.load(self.path, allow_pickle=False)
+            meta = json.loads(self.archive['meta'].tobytes())
+        except FileNotFoundError:
+            raise TelemetryError(f'{self.path.name} does not exist.')
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            raise TelemetryError(f'{self.path.name} is not a telemetry artifact.')
+        if meta.get('version') != STORE_VERSION:
+            raise TelemetryError(f'{self.path.name} has an unsupported store version.')
+
+        self.channels = meta['channels']
+        self.samples = meta['samples']
+        self.chunk = meta['chunk']
+        self.factor = meta['factor']
+        self.levels = meta['levels']
+        self.meta = meta
+        self.index = self.archive['index']
+
+    def __len__(self):
+        return self.samples
+
+    def describe(self):
+        return {
+            'channels': self.channels,
+            'samples': self.samples,
+            'start': self.meta['start'],
+            'end': self.meta['end'],
+        }
+
+    def check_channels(self, names):
+        unknown = [name for name in names if name not in self.channels]
+        if unknown:
+            raise TelemetryError(f"Unknown channel(s): {', '.join(unknown)}.")
+
+    def _chunk(self, name, number):
+        return self.archive[f'{name}/{number}']
+
+    def window(self, start=None, end=None):
+        """
+        Sample index range ``[lo, hi)`` with ``start <= t <= end``. The
+        chunk index narrows each bound to one chunk, which is the only time
+        chunk inflated for it.
+        """
+        lo, hi = 0, self.samples
+        if start is not None and self.samples:
+            number = max(int(np.searchsorted(self.index, start, side='left')) - 1, 0)
+            lo = number * self.chunk + int(np.searchsorted(self._chunk(TIME, number), start, side='left'))
+        if end is not None and self.samples:
+            number = int(np.searchsorted(self.index, end, side='right')) - 1
+            if number < 0:
+                hi = 0
+            else:
+                hi = number * self.chunk + int(np.searchsorted(self._chunk(TIME, number), end, side='right'))
+        return lo, max(lo, hi)
+
+    def read(self, name, lo, hi):
+        if lo >= hi:
+            return np.empty(0, dtype=np.float64 if name == TIME else np.float32)
+        first, last = lo // self.chunk, (hi - 1) // self.chunk
+        column = np.concatenate([self._chunk(name, number) for number in range(first, last + 1)])
+        return column[lo - first * self.chunk:hi - first * self.chunk]
+
+    def pick_level(self, width):
+        """
+        The coarsest level whose blocks are at most ``1 / factor`` of a
+        bucket ``width`` samples wide, or 0 when no level is fine enough.
+        """
+        level = 0
+        while level < self.levels and self.factor ** (level + 2) <= width:
+            level += 1
+        return level
+
+    def downsample(self, names, start=None, end=None, buckets=1000, chunk=None):
+        """
+        Same buckets as ``TelemetryFile.downsample``, answered from the
+        coarsest pyramid level that keeps each bucket at least ``factor``
+        blocks wide. Bucket edges are rounded down to that level's block
+        boundaries, so they can move by up to one block; ``resolution`` is
+        the block size used, 1 when the samples themselves were read.
+        """
+        self.check_channels(names)
+        lo, hi = self.window(start, end)
+        count = hi - lo
+        buckets = max(0, min(buckets, count))
+        edges = lo + (np.arange(buckets + 1, dtype=np.int64) * count) // max(buckets, 1)
+        level = self.pick_level(count // buckets) if buckets else 0
+
+        if level:
+            block = self.factor ** level
+            offsets = edges[:-1] // block
+            first, last = offsets[0], (hi - 1) // block + 1
+            starts = offsets - first
+            times = self.archive[f'L{level}/t'][offsets]
+            sizes = np.add.reduceat(self.archive[f'L{level}/count'][first:last], starts)
+            series = {}
+            for name in names:
+                prefix = f'L{level}/{name}'
+                series[name] = {
+                    'min': np.fmin.reduceat(self.archive[f'{prefix}/min'][first:last], starts),
+                    'max': np.fmax.reduceat(self.archive[f'{prefix}/max'][first:last], starts),
+                    'mean': np.add.reduceat(self.archive[f'{prefix}/sum'][first:last], starts) / sizes,
+                }
+        else:
+            block = 1
+            starts = edges[:-1] - lo
+            times = self.read(TIME, lo, hi)[starts] if buckets else np.empty(0)
+            series = {}
+            for name in names:
+                column = self.read(name, lo, hi)
+                series[name] = {
+                    'min': np.fmin.reduceat(column, starts) if buckets else np.empty(0),
+                    'max': np.fmax.reduceat(column, starts) if buckets else np.empty(0),
+                    'mean': (
+                        np.add.reduceat(column, starts, dtype=np.float64) / np.diff(edges)
+                        if buckets else np.empty(0)
+                    ),
+                }
+
+        return {
+            'samples': count,
+            'buckets': buckets,
+            'resolution': block,
+            TIME: times,
+            'series': series,
+        }
+
+    def iter_chunks(self, names, start=None, end=None, chunk=None):
+        """
+        Yield the window's samples one stored chunk at a time as
+        ``{"t": [...], <channel>: [...]}`` column blocks.
+        """
+        self.check_channels(names)
+        first, hi = self.window(start, end)
+        while first < hi:
+            last = min((first // self.chunk + 1) * self.chunk, hi)
+            yield {name: self.read(name, first, last) for name in (TIME, *names)}
+            first = last
@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+
+def create_unmanaged_tables(using, **kwargs):
+    """
+    Build the externally managed garage tables in a fresh database before
+    migrations run, so the index migrations find them as they would in
+    production.
+    """
+    connection = connections[using]
+    existing = set(connection.introspection.table_names())
+    models = [
+        model for model in apps.get_app_config('garage').get_models()
+        if not model._meta.managed and model._meta.db_table not in existing
+    ]
+    if not models:
+        return
+    with connection.schema_editor() as editor:
+        for model in models:
+            editor.create_model(model)
+
+
+class GarageTestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        pre_migrate.connect(create_unmanaged_tables, dispatch_uid='garage-unmanaged-tables')
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid='garage-unmanaged-tables')
@@ -1,3 +1,1354 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import psycopg
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, router as db_router
+from django.db.models import Max
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework import viewsets
+from rest_framework.permissions import BasePermission, IsAdminUser
+
+from DBFinal.asgi import application
+
+from .async_views import AsyncReadView, gather_reads
+from .benchmark import discover_routes, generate_dataset, measure_route
+from .cache import compact_cache_generations, get_cache
+from .db_router import STICKY_COOKIE, ReplicaMiddleware
+from .export import ExportMixin
+from . import events
+from .events import change_feed
+from .mileage import apply_mileage_deltas
+from .models import (
+    CacheGenerationLog, Car, CarPart, CarSession, ChangeEvent, Garage, GarageBay, JobCheckpoint, Part, PartWear, Person,
+    Session, Team, TelemetryArtifact, TelemetrySession, Technician, WorkAssignment, WorkOrder
+)
+from .pagination import HistoryPagination
+from .profiling import ProfilingMiddleware, clear_profiles, profile_summary
+from .renderers import dumps
+from .scheduling import DOUBLE_BOOKINGS_SQL, find_bay_conflicts
+from .telemetry import write_telemetry
+from .urls import router
+from .views import TeamViewSet
+
+
+class LifecycleWarningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(name='Warn')
+        cls.car = Car.objects.create(team=team, car_number=3, chassis_number='CH-WA', status='active')
+        cls.add_parts(950, 850, 500)
+
+    @classmethod
+    def add_parts(cls, *mileages):
+        start = Part.objects.count()
+        for number, mileage in enumerate(mileages, start=start):
+            part = Part.objects.create(part_type='Brake', serial_number=f'WA-{number}', fia_lifecycle_limit=1000)
+            CarPart.objects.create(car=cls.car, part=part, installed_at=timezone.now(), mileage=mileage)
+        PartWear.objects.refresh()
+
+    def warnings(self, **params):
+        get_cache().clear()
+        return self.client.get(reverse('part-lifecycle-warnings'), params).json()
+
+    def test_one_annotated_query_for_the_page(self):
+        # The generation lookup, the COUNT and the page, whatever the page holds.
+        with self.assertNumQueries(3):
+            data = self.warnings()
+        self.assertEqual([part['lifecycle_percentage'] for part in data['results']], [95.0, 85.0])
+        self.assertTrue(all(part['needs_replacement'] for part in data['results']))
+
+        self.add_parts(990, 900, 810, 800)
+        with self.assertNumQueries(3):
+            data = self.warnings()
+        self.assertEqual(
+            [part['lifecycle_percentage'] for part in data['results']], [99.0, 95.0, 90.0, 85.0, 81.0, 80.0],
+        )
+
+        self.assertEqual(self.warnings(threshold=90)['count'], 3)
+        self.assertEqual(self.client.get(reverse('part-lifecycle-warnings'), {'threshold': 'x'}).status_code, 400)
+
+
+class ActiveInstallFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(name='Installs')
+        cls.cars = [
+            Car.objects.create(team=team, car_number=n, chassis_number=f'CH-IN{n}', status='active') for n in (1, 2)
+        ]
+        cls.add_part('IN-0', [(cls.cars[0], 300, True), (cls.cars[1], 120, False)])
+        cls.add_part('IN-1', [(cls.cars[0], 80, True)])
+        cls.add_part('IN-2', [])
+
+    @classmethod
+    def add_part(cls, serial_number, installs):
+        part = Part.objects.create(part_type='Wing', serial_number=serial_number, fia_lifecycle_limit=1000)
+        now = timezone.now()
+        for index, (car, mileage, removed) in enumerate(installs):
+            CarPart.objects.create(
+                car=car, part=part, mileage=mileage,
+                installed_at=now - timedelta(days=10 - index), removed_at=now - timedelta(days=5) if removed else None,
+            )
+        PartWear.objects.refresh([part.pk])
+        return part
+
+    def parts(self):
+        get_cache().clear()
+        return {part['serial_number']: part for part in self.client.get(reverse('part-list')).json()['results']}
+
+    def test_fields_come_from_the_active_install(self):
+        with self.assertNumQueries(3):
+            parts = self.parts()
+        fields = ('current_car', 'current_mileage', 'cumulative_mileage', 'is_installed', 'lifecycle_percentage')
+        self.assertEqual(
+            {serial: tuple(part[field] for field in fields) for serial, part in parts.items()},
+            {
+                'IN-0': (self.cars[1].pk, 120, 420, True, 42.0),
+                'IN-1': (None, None, 80, False, 8.0),
+                'IN-2': (None, None, 0, False, 0.0),
+            },
+        )
+        self.assertIsNotNone(parts['IN-0']['installed_at'])
+        self.assertIsNone(parts['IN-2']['installed_at'])
+
+        for number in range(3, 8):
+            self.add_part(f'IN-{number}', [(self.cars[0], number, False)])
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.parts()), 8)
+
+
+class HistoryPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def ids(self, page):
+        return [row['car_part_id'] for row in page['results']]
+
+    @mock.patch.object(HistoryPagination, 'page_size', 5)
+    def test_cursor_pages_forwards_and_backwards(self):
+        first = self.client.get(reverse('car-part-list'), {'pagination': 'cursor'}).json()
+        self.assertNotIn('count', first)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        third = self.client.get(second['next']).json()
+        expected = CarPart.objects.order_by('-installed_at', '-car_part_id').values_list('pk', flat=True)[:15]
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), list(expected))
+
+        back = self.client.get(third['previous']).json()
+        self.assertEqual(self.ids(back), self.ids(second))
+        back = self.client.get(back['previous']).json()
+        self.assertEqual(self.ids(back), self.ids(first))
+        self.assertIsNone(back['previous'])
+        self.assertEqual(self.ids(self.client.get(back['next']).json()), self.ids(second))
+
+        invalid = self.client.get(reverse('car-part-list'), {'pagination': 'cursor', 'cursor': 'x'})
+        self.assertEqual(invalid.status_code, 404)
+
+    def test_approximate_count_of_a_partitioned_table(self):
+        call_command('partition_seasons', 'setup', stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            # Autovacuum analyzes the partitions, never the parent.
+            cursor.execute("SELECT relid::regclass::text FROM pg_partition_tree('car_part') WHERE isleaf")
+            for partition, in cursor.fetchall():
+                cursor.execute(f'ANALYZE {partition}')
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('car-part-list'), {'pagination': 'cursor', 'count': 'approximate'}).json()
+        self.assertEqual(data['count'], CarPart.objects.count())
+        self.assertFalse([query for query in queries if 'COUNT(*)' in query['sql']])
+
+
+class PartWearTests(TestCase):
+    def test_needs_replacement_follows_the_current_threshold(self):
+        part = Part.objects.create(part_type='Engine', serial_number='WEAR-1', fia_lifecycle_limit=1000)
+        car = Car.objects.create(team=Team.objects.create(name='Wear'), car_number=8, chassis_number='CH-W1', status='active')
+        CarPart.objects.create(car=car, part=part, installed_at=timezone.now(), mileage=500)
+        PartWear.objects.refresh([part.pk])
+        url = reverse('part-detail', kwargs={'pk': part.pk})
+        for threshold, expected in ((40, True), (60, False)):
+            with self.subTest(threshold=threshold), self.settings(LIFECYCLE_WARNING_THRESHOLD=threshold):
+                self.assertIs(self.client.get(url).json()['needs_replacement'], expected)
+
+    def test_reassigned_install_refreshes_both_parts(self):
+        car = Car.objects.create(team=Team.objects.create(name='Wear'), car_number=9, chassis_number='CH-W2', status='active')
+        old, new = (
+            Part.objects.create(part_type='Gearbox', serial_number=f'WEAR-{n}', fia_lifecycle_limit=1000) for n in (2, 3)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            install = CarPart.objects.create(car=car, part=old, installed_at=timezone.now(), mileage=300)
+        with self.captureOnCommitCallbacks(execute=True):
+            install.part = new
+            install.save()
+
+        wear = {row.pk: row.cumulative_mileage for row in PartWear.objects.filter(pk__in=[old.pk, new.pk])}
+        self.assertEqual(wear, {old.pk: 0, new.pk: 300})
+
+
+class BulkMileageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(name='Miles')
+        cls.car = Car.objects.create(team=team, car_number=5, chassis_number='CH-MI', status='active')
+        cls.parts = [
+            Part.objects.create(part_type='Engine', serial_number=f'MI-{n}', fia_lifecycle_limit=1000) for n in range(3)
+        ]
+        cls.installs = [
+            CarPart.objects.create(car=cls.car, part=part, installed_at=timezone.now(), mileage=100)
+            for part in cls.parts
+        ]
+        PartWear.objects.refresh([part.pk for part in cls.parts])
+        cls.staff = User.objects.create_superuser('miles', 'miles@example.com', 'pw')
+
+    def post(self, data, **kwargs):
+        return self.client.post(reverse('car-part-bulk-mileage'), data, **kwargs)
+
+    def mileage(self):
+        installs = CarPart.objects.filter(car=self.car).order_by('part__serial_number')
+        return list(installs.values_list('mileage', flat=True))
+
+    def test_staff_only(self):
+        rows = [{'car': self.car.pk, 'serial_number': 'MI-0', 'delta': 5}]
+        self.assertEqual(self.post(rows, content_type='application/json').status_code, 403)
+        self.client.force_login(User.objects.create_user('mechanic', password='pw'))
+        self.assertEqual(self.post(rows, content_type='application/json').status_code, 403)
+        self.assertEqual(self.mileage(), [100, 100, 100])
+
+    def test_json_payload(self):
+        self.client.force_login(self.staff)
+        data = self.post([
+            {'car': self.car.pk, 'serial_number': 'MI-0', 'delta': 25},
+            {'car': self.car.pk, 'serial_number': 'MI-1', 'delta': -40},
+            {'car': self.car.pk, 'serial_number': 'MI-2', 'delta': -101},
+            {'car': self.car.pk + 1, 'serial_number': 'MI-0', 'delta': 5},
+            {'car': self.car.pk, 'serial_number': 'MI-9', 'delta': 5},
+            {'car': self.car.pk, 'serial_number': 'MI-0', 'delta': 'x'},
+        ], content_type='application/json').json()
+
+        self.assertEqual((data['updated'], data['not_found'], data['invalid']), (2, 2, 2))
+        self.assertEqual(
+            [row['status'] for row in data['results']],
+            ['updated', 'updated', 'invalid', 'not_found', 'not_found', 'invalid'],
+        )
+        self.assertEqual(self.mileage(), [125, 60, 100])
+        # The wear summary follows in the same transaction.
+        wear = PartWear.objects.filter(pk__in=[part.pk for part in self.parts]).order_by('part__serial_number')
+        self.assertEqual([row.cumulative_mileage for row in wear], [125, 60, 100])
+
+        self.assertEqual(self.post({'car': self.car.pk}, content_type='application/json').status_code, 400)
+
+    def test_csv_payload(self):
+        self.client.force_login(self.staff)
+        body = f'car,serial_number,delta\n{self.car.pk},MI-0,7\n{self.car.pk},MI-1,3\n'
+        data = self.post(body, content_type='text/csv').json()
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual(self.mileage(), [107, 103, 100])
+
+    def test_rows_are_applied_in_one_update(self):
+        rows = [{'car': self.car.pk, 'serial_number': f'MI-{n}', 'delta': 1} for n in range(3)]
+        # Savepoint, locking read, one UPDATE, the part_wear refresh and its
+        # cleanup, release; the same for one row or many.
+        with self.assertNumQueries(6), CaptureQueriesContext(connection) as queries:
+            apply_mileage_deltas(rows)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "car_part"')]), 1)
+        self.assertEqual(self.mileage(), [101, 101, 101])
+
+
+class ExportTests(TestCase):
+    """
+    Every exporting viewset streams the same rows as its list endpoint, as
+    NDJSON by default and as CSV on request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def export(self, basename, **params):
+        response = self.client.get(reverse(f'{basename}-export'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def cell(self, value):
+        if value is None:
+            return ''
+        return dumps(value).decode() if isinstance(value, (list, dict)) else str(value)
+
+    def test_ndjson_and_csv_per_viewset(self):
+        for prefix, viewset, basename in router.registry:
+            if not issubclass(viewset, ExportMixin):
+                continue
+            with self.subTest(route=basename):
+                pk = viewset.queryset.model._meta.pk.name
+                listed = self.client.get(reverse(f'{basename}-list')).json()
+
+                response, body = self.export(basename)
+                self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+                self.assertEqual(response['Content-Disposition'], f'attachment; filename="{basename}.ndjson"')
+                rows = {row[pk]: row for row in map(json.loads, body.splitlines())}
+                self.assertEqual(len(rows), listed['count'])
+                self.assertEqual([rows[row[pk]] for row in listed['results']], listed['results'])
+
+                response, body = self.export(basename, output='csv')
+                self.assertEqual(response['Content-Type'], 'text/csv')
+                self.assertEqual(response['Content-Disposition'], f'attachment; filename="{basename}.csv"')
+                table = {row[pk]: row for row in csv.DictReader(io.StringIO(body))}
+                self.assertEqual(len(table), listed['count'])
+                row = listed['results'][0]
+                cells = table[str(row[pk])]
+                # Fields a row leaves out are blank; nested values are JSON.
+                self.assertEqual(cells, {**dict.fromkeys(cells, ''), **{key: self.cell(value) for key, value in row.items()}})
+
+        self.assertEqual(self.client.get(reverse('team-export'), {'output': 'xml'}).status_code, 400)
+
+
+class SearchTests(TestCase):
+    def test_limit_must_be_positive(self):
+        for limit, status in (('-1', 400), ('0', 400), ('x', 400), ('500', 200)):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.client.get('/api/search/', {'q': 'engine', 'limit': limit}).status_code, status)
+
+
+class CacheStatsTests(TestCase):
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+        self.client.force_login(User.objects.create_superuser('stats', 'stats@example.com', 'pw'))
+        self.assertIn('hit_ratio', self.client.get('/api/cache-stats/').json())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.team = Team.objects.create(name='Validators')
+
+    def test_write_from_plain_sql_invalidates(self):
+        url = f'/api/teams/{self.team.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # As if written by another worker or a management command.
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE team SET name = %s WHERE team_id = %s', ['Renamed', self.team.pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+
+    def test_compaction_keeps_the_token(self):
+        url = f'/api/teams/{self.team.pk}/'
+        Team.objects.filter(pk=self.team.pk).update(name='Logged')
+        Team.objects.filter(pk=self.team.pk).update(name='Logged twice')
+        etag = self.client.get(url)['ETag']
+        self.assertGreater(compact_cache_generations(), 0)
+        self.assertEqual(CacheGenerationLog.objects.filter(table_name='team').count(), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Team.objects.filter(pk=self.team.pk).update(name='Logged again')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CacheGenerationConcurrencyTests(TransactionTestCase):
+    def test_writers_to_a_table_do_not_wait_on_each_other(self):
+        team = Team.objects.create(name='Queue')
+        person = Person.objects.create(team=team, first_name='Ana', last_name='Lock', role='Mechanic')
+        car = Car.objects.create(team=team, car_number=11, chassis_number='CH-LOCK', status='active')
+        first_order, second_order = WorkOrder.objects.bulk_create(
+            [WorkOrder(car=car, description='Left'), WorkOrder(car=car, description='Right')]
+        )
+        insert = 'INSERT INTO work_assignment (work_order_id, person_id, role) VALUES (%s, %s, %s)'
+        try:
+            with psycopg.connect(**change_feed.conninfo()) as first, psycopg.connect(**change_feed.conninfo()) as second:
+                first.execute(insert, [first_order.pk, person.pk, 'mechanic'])
+                # Both transactions stay open; the second would time out if
+                # it queued behind the first one's lock.
+                second.execute("SET lock_timeout = '2s'")
+                second.execute(insert, [second_order.pk, person.pk, 'mechanic'])
+                first.commit()
+                second.commit()
+            self.assertEqual(WorkAssignment.objects.filter(person=person).count(), 2)
+        finally:
+            WorkAssignment.objects.filter(person=person).delete()
+            WorkOrder.objects.filter(car=car).delete()
+            car.delete()
+            person.delete()
+            team.delete()
+
+
+class RouteQueryCountTests(TestCase):
+    """
+    Every GET route must answer with a fixed number of queries: the count at
+    page size 5 and page size 25 has to match, otherwise something in the
+    serializer or view is querying per row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_every_route_responds(self):
+        for name, path in discover_routes():
+            with self.subTest(route=name):
+                result = measure_route(self.client, name, path, repeat=1)
+                self.assertEqual(result['status'], 200, path)
+
+    def test_query_count_does_not_scale_with_page_size(self):
+        for name, path in discover_routes():
+            with self.subTest(route=name):
+                small = measure_route(self.client, name, path, repeat=1, page_size=5)
+                large = measure_route(self.client, name, path, repeat=1, page_size=25)
+                self.assertEqual(small['queries'], large['queries'], path)
+
+
+@override_settings(PROFILING_SAMPLE_RATE=0.5)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        clear_profiles()
+        self.addCleanup(clear_profiles)
+
+    def profile(self, view, path='/probe/'):
+        return ProfilingMiddleware(view)(RequestFactory().get(path))
+
+    def test_sampling_decision(self):
+        url = reverse('team-list')
+        with mock.patch('garage.profiling.random.random', return_value=0.7):
+            self.assertNotIn('Server-Timing', self.client.get(url))
+        with mock.patch('garage.profiling.random.random', return_value=0.2):
+            timing = self.client.get(url)['Server-Timing']
+        self.assertRegex(
+            timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        self.assertEqual([route['route'] for route in profile_summary()], ['team-list'])
+
+        with self.settings(PROFILING_SAMPLE_RATE=0), self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+
+    @mock.patch('garage.profiling.random.random', new=lambda: 0.0)
+    def test_repeated_statements_are_reported(self):
+        def view(request):
+            for _ in range(3):
+                Team.objects.filter(pk=1).exists()
+            Team.objects.count()
+            return HttpResponse()
+
+        self.profile(view)
+        route, = profile_summary('/probe/')
+        self.assertEqual(route['avg_sql_count'], 4)
+        repeated, = route['repeated_queries']
+        self.assertEqual(repeated['count'], 3)
+        self.assertIn('LIMIT 1', repeated['sql'])
+        self.assertLessEqual(len(route['slowest_queries']), settings.PROFILING_SLOWEST_QUERIES)
+
+    @mock.patch('garage.profiling.random.random', new=lambda: 0.0)
+    def test_ring_buffer_keeps_the_latest_records(self):
+        with mock.patch('garage.profiling._records', deque(maxlen=3)):
+            for number in range(5):
+                self.profile(lambda request: HttpResponse(), f'/probe/{number}/')
+            routes = sorted(route['route'] for route in profile_summary())
+        self.assertEqual(routes, ['/probe/2/', '/probe/3/', '/probe/4/'])
+
+    @mock.patch('garage.profiling.random.random', new=lambda: 0.0)
+    def test_profiling_view_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/profiling/').status_code, 403)
+        self.assertEqual(self.client.delete('/api/profiling/').status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('profiler', 'profiler@example.com', 'pw'))
+        data = self.client.get('/api/profiling/').json()
+        self.assertEqual(data['sample_rate'], 0.5)
+        self.assertIn('profiling', [route['route'] for route in data['routes']])
+        self.assertEqual(self.client.delete('/api/profiling/').status_code, 204)
+        # Only the DELETE itself, sampled once the view had cleared the rest.
+        self.assertEqual([route['samples'] for route in profile_summary()], [1])
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_asgi_export_is_not_buffered(self):
+        async def export():
+            response = await self.async_client.get(reverse('car-part-export'))
+            return response, [chunk async for chunk in response.streaming_content]
+
+        response, chunks = async_to_sync(export)()
+        # An async iterator: Django would read a sync one into a list first.
+        self.assertTrue(response.is_async)
+        self.assertEqual(len(chunks), CarPart.objects.count())
+        self.assertEqual(chunks, list(self.client.get(reverse('car-part-export')).streaming_content))
+
+
+class AsyncReadTests(TestCase):
+    """
+    The async twins under /api/async/ must serve the same data as the
+    synchronous viewsets.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_async_routes_match_sync_routes(self):
+        for prefix, viewset, basename in router.registry:
+            if not issubclass(viewset, viewsets.ReadOnlyModelViewSet):
+                continue
+            with self.subTest(route=basename):
+                sync = self.client.get(reverse(f'{basename}-list')).json()
+                async_ = self.client.get(reverse(f'async-{basename}-list')).json()
+                self.assertEqual(sync['count'], async_['count'])
+
+                pk = viewset.queryset.model._default_manager.values_list('pk', flat=True).first()
+                sync = self.client.get(reverse(f'{basename}-detail', kwargs={'pk': pk}))
+                async_ = self.client.get(reverse(f'async-{basename}-detail', kwargs={'pk': pk}))
+                self.assertEqual(async_.status_code, 200)
+                self.assertEqual(sync.json(), async_.json())
+
+    def test_viewset_permissions_apply(self):
+        class HiddenRows(BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return False
+
+        class StaffTeamViewSet(TeamViewSet):
+            permission_classes = [IsAdminUser, HiddenRows]
+
+        view = AsyncReadView.as_view(viewset=StaffTeamViewSet)
+        team = Team.objects.first()
+        staff = User.objects.create_superuser('async', 'async@example.com', 'pw')
+        for user, pk, status in (
+            (AnonymousUser(), None, 403), (AnonymousUser(), team.pk, 403), (staff, None, 200), (staff, team.pk, 403),
+        ):
+            with self.subTest(user=user, pk=pk):
+                request = RequestFactory().get('/api/async/teams/')
+                request.user = user
+                self.assertEqual(async_to_sync(view)(request, pk=pk).status_code, status)
+
+
+class GatherReadsTests(TransactionTestCase):
+    def read(self, barrier=None):
+        if barrier is not None:
+            barrier.wait()
+        return threading.current_thread().name, Team.objects.count()
+
+    @override_settings(ASYNC_READ_WORKERS=2)
+    def test_reads_run_concurrently_on_the_read_workers(self):
+        # Each read waits for the other, so they only finish side by side.
+        barrier = threading.Barrier(2, timeout=5)
+        data = async_to_sync(gather_reads)(first=partial(self.read, barrier), second=partial(self.read, barrier))
+        threads = {name for name, _ in data.values()}
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('gather-reads') for name in threads))
+
+    @override_settings(ASYNC_READ_WORKERS=0)
+    def test_reads_run_in_turn_without_the_pool(self):
+        data = async_to_sync(gather_reads)(first=self.read, second=self.read)
+        self.assertEqual(len({name for name, _ in data.values()}), 1)
+
+
+class CompositeEndpointTests(TestCase):
+    """
+    /api/dashboard/ and /api/cars/<id>/overview/ replace several round trips
+    and must cost a fixed number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_dashboard(self):
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            set(data),
+            {'teams', 'lifecycle_warnings', 'active_car_parts', 'recent_sessions', 'open_work_orders'},
+        )
+        self.assertEqual(
+            data['lifecycle_warnings']['count'],
+            Part.objects.lifecycle_warnings(settings.LIFECYCLE_WARNING_THRESHOLD).count(),
+        )
+
+    def test_dashboard_counts_removed_parts_outside_the_teams(self):
+        car = Car.objects.first()
+        part = Part.objects.create(part_type='Engine', serial_number='DASH-0', fia_lifecycle_limit=100)
+        CarPart.objects.create(car=car, part=part, installed_at=timezone.now(), removed_at=timezone.now(), mileage=100)
+        PartWear.objects.refresh([part.pk])
+
+        warnings = self.client.get(reverse('dashboard')).json()['lifecycle_warnings']
+        self.assertNotIn('null', warnings['by_team'])
+        installed = Part.objects.lifecycle_warnings(settings.LIFECYCLE_WARNING_THRESHOLD).filter(
+            wear__current_car__isnull=False,
+        )
+        self.assertEqual(sum(warnings['by_team'].values()), installed.count())
+        self.assertEqual(warnings['not_installed'], warnings['count'] - installed.count())
+        self.assertGreaterEqual(warnings['not_installed'], 1)
+
+    def test_car_overview(self):
+        car = Car.objects.first()
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('car-overview', kwargs={'pk': car.pk}))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['car']['car_id'], car.pk)
+        self.assertEqual(
+            {part['part_id'] for part in data['installed_parts']},
+            set(car.car_parts.filter(removed_at__isnull=True).values_list('part_id', flat=True)),
+        )
+
+    def test_car_overview_unknown_car(self):
+        response = self.client.get(reverse('car-overview', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    """
+    ?fields= and ?expand= shape both the response and the SQL behind it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_fields_limit_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('car-part-list'), {'fields': 'car_part_id,serial_number'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'car_part_id', 'serial_number'})
+        select = queries[-1]['sql']
+        self.assertIn('"part"."serial_number"', select)
+        self.assertNotIn('"car"', select)
+        self.assertNotIn('mileage', select)
+
+    def test_nested_fields(self):
+        garage = Garage.objects.first()
+        url = reverse('garage-detail', kwargs={'pk': garage.pk})
+        # Nested fields the API always returned stay on by default.
+        self.assertEqual(len(self.client.get(url).json()['bays']), garage.bays.count())
+        self.assertNotIn('bays', self.client.get(url, {'fields': 'garage_id'}).json())
+        self.assertEqual(set(self.client.get(url, {'fields': 'garage_id', 'expand': 'bays'}).json()), {'garage_id', 'bays'})
+
+        order = WorkOrder.objects.first()
+        url = reverse('work-order-detail', kwargs={'pk': order.pk})
+        self.assertNotIn('assignments', self.client.get(url).json())
+        self.assertIn('assignments', self.client.get(url, {'expand': 'assignments'}).json())
+
+        car_part = CarPart.objects.first()
+        # The cache generations, then the row.
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('car-part-detail', kwargs={'pk': car_part.pk}),
+                {'expand': 'part_details', 'fields': 'car_part_id'},
+            )
+        self.assertEqual(set(response.json()), {'car_part_id', 'part_details'})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('part-list'), {'fields': 'part_id,nope'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('garage-list'), {'expand': 'team'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ColumnarFormatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def test_columns_carry_the_same_rows(self):
+        rows = self.client.get(reverse('car-part-list')).json()
+        columnar = self.client.get(reverse('car-part-list'), {'format': 'columns'}).json()
+        self.assertEqual(columnar['count'], rows['count'])
+        self.assertNotIn('results', columnar)
+        rebuilt = [
+            dict(zip(columnar['columns'], values))
+            for values in zip(*columnar['columns'].values())
+        ]
+        self.assertEqual(rebuilt, rows['results'])
+
+
+class TelemetryChannelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(
+            TELEMETRY_ROOT=directory.name, TELEMETRY_STORE_ROOT=f'{directory.name}/store',
+            TELEMETRY_STORE_CHUNK_SAMPLES=1000,
+        ))
+        self.t = np.arange(10_000) / 100.0
+        self.speed = np.sin(self.t).astype(np.float32)
+        write_telemetry(f'{directory.name}/lap.bin', self.t, {'speed': self.speed, 'rpm': self.t})
+        self.telemetry = TelemetrySession.objects.create(
+            car_session=CarSession.objects.first(), data_location='/lap.bin', start_time=timezone.now(),
+        )
+        self.url = reverse('telemetry-channels', kwargs={'pk': self.telemetry.pk})
+
+    def test_downsample_matches_numpy(self):
+        with self.settings(TELEMETRY_CHUNK_SAMPLES=777):
+            data = self.client.get(self.url, {'channels': 'speed', 'start': 10, 'end': 60, 'buckets': 7}).json()
+        window = self.speed[(self.t >= 10) & (self.t <= 60)]
+        edges = (np.arange(8) * len(window)) // 7
+        self.assertEqual(data['samples'], len(window))
+        np.testing.assert_allclose(data['series']['speed']['min'], np.minimum.reduceat(window, edges[:-1]))
+        np.testing.assert_allclose(data['series']['speed']['max'], np.maximum.reduceat(window, edges[:-1]))
+        np.testing.assert_allclose(
+            data['series']['speed']['mean'],
+            np.add.reduceat(window.astype(np.float64), edges[:-1]) / np.diff(edges),
+        )
+
+    def test_raw_stream_and_errors(self):
+        response = self.client.get(self.url, {'channels': 'rpm', 'start': 1, 'end': 1.02, 'resolution': 'raw'})
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body.count(b'\n'), 1)
+        self.assertIn(b'"rpm":[1.0,1.01,1.02]', body)
+
+        self.assertEqual(self.client.get(self.url, {'channels': 'nope'}).status_code, 400)
+        self.telemetry.data_location = '/missing.bin'
+        self.telemetry.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        for channels in (['t'], ['speed', 'speed'], [1], 'speed'):
+            with self.subTest(channels=channels):
+                header = json.dumps({'version': 1, 'channels': channels}).encode()
+                with open(f'{settings.TELEMETRY_ROOT}/bad.bin', 'wb') as handle:
+                    handle.write(b'F1TM' + struct.pack('<I', len(header)) + header)
+                self.telemetry.data_location = '/bad.bin'
+                self.telemetry.save()
+                self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def ingest(self, **options):
+        stdout = io.StringIO()
+        call_command('ingest_telemetry', workers=2, stdout=stdout, stderr=io.StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_ingest_is_incremental_and_serves_pyramids(self):
+        self.assertIn('Ingested 1, unchanged 0', self.ingest())
+        artifact = TelemetryArtifact.objects.get(telemetry=self.telemetry)
+        self.assertEqual((artifact.samples, artifact.channels, artifact.pyramid_levels), (10_000, ['speed', 'rpm'], 3))
+        self.assertIn('Ingested 0, unchanged 1', self.ingest())
+
+        # 2000-sample buckets line up with level-1 blocks, so the pyramid
+        # answer is exact.
+        data = self.client.get(self.url, {'channels': 'speed', 'buckets': 5}).json()
+        edges = np.arange(0, 10_000, 2000)
+        self.assertEqual(data['resolution'], 16)
+        np.testing.assert_allclose(data['series']['speed']['min'], np.minimum.reduceat(self.speed, edges))
+        np.testing.assert_allclose(data['series']['speed']['max'], np.maximum.reduceat(self.speed, edges))
+        np.testing.assert_allclose(
+            data['series']['speed']['mean'], np.add.reduceat(self.speed.astype(np.float64), edges) / 2000,
+        )
+
+        # Narrow windows are read from the stored samples, here across the
+        # chunk boundary at 992 (the chunk size rounded to the factor).
+        data = self.client.get(self.url, {'channels': 'rpm', 'start': 9.9, 'end': 9.94, 'buckets': 5}).json()
+        self.assertEqual((data['resolution'], data['samples']), (1, 5))
+        np.testing.assert_allclose(data['series']['rpm']['min'], [9.9, 9.91, 9.92, 9.93, 9.94], rtol=1e-6)
+        response = self.client.get(self.url, {'channels': 'rpm', 'start': 9.9, 'end': 9.94, 'resolution': 'raw'})
+        self.assertEqual(b''.join(response.streaming_content).count(b'\n'), 2)
+
+        os.remove(f'{settings.TELEMETRY_ROOT}/lap.bin')
+        self.assertEqual(self.client.get(self.url).json()['samples'], 10_000)
+        write_telemetry(f'{settings.TELEMETRY_ROOT}/lap.bin', self.t[:500], {'speed': self.speed[:500]})
+        self.assertEqual(self.client.get(self.url).json()['samples'], 500)
+        self.assertIn('Ingested 1, unchanged 0', self.ingest(telemetry_ids=[self.telemetry.pk]))
+        self.assertEqual(TelemetryArtifact.objects.get(telemetry=self.telemetry).samples, 500)
+
+
+class MileageAccrualTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(TELEMETRY_ROOT=directory.name))
+        # An hour at a steady 180 km/h, sampled at 10 Hz.
+        t = np.arange(36_001) / 10.0
+        write_telemetry(f'{directory.name}/race.bin', t, {'speed': np.full(len(t), 180, dtype=np.float32)})
+
+        JobCheckpoint.objects.create(name='telemetry_mileage', position=TelemetrySession.objects.order_by('-pk')[0].pk)
+        self.start = datetime(2030, 6, 1, 14, tzinfo=dt_timezone.utc)
+        car_session = CarSession.objects.first()
+        self.whole, self.half, self.later = (
+            CarPart.objects.create(
+                car_id=car_session.car_id, installed_at=installed_at, removed_at=removed_at, mileage=100,
+                part=Part.objects.create(part_type='Gearbox', serial_number=f'ACCRUE-{index}', fia_lifecycle_limit=5000),
+            )
+            for index, (installed_at, removed_at) in enumerate([
+                (self.start - timedelta(days=1), None),
+                (self.start - timedelta(days=1), self.start + timedelta(minutes=30)),
+                (self.start + timedelta(hours=2), None),
+            ])
+        )
+        self.sessions = [
+            TelemetrySession.objects.create(
+                car_session=car_session, data_location=location, start_time=self.start, end_time=end_time,
+            )
+            for location, end_time in [
+                ('/race.bin', self.start + timedelta(hours=1)),
+                ('/missing.bin', self.start + timedelta(hours=1)),
+                ('/race.bin', None),
+            ]
+        ]
+
+    def accrue(self):
+        stderr = io.StringIO()
+        call_command('accrue_mileage', batch_size=1, stdout=io.StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def mileages(self):
+        return [CarPart.objects.get(pk=car_part.pk).mileage for car_part in (self.whole, self.half, self.later)]
+
+    def test_accrues_once_per_session_up_to_the_first_unfinished(self):
+        self.assertIn(f'telemetry {self.sessions[1].pk}: missing.bin does not exist.', self.accrue())
+        self.assertEqual(self.mileages(), [280, 190, 100])
+        self.assertEqual(JobCheckpoint.objects.get(name='telemetry_mileage').position, self.sessions[1].pk)
+        self.assertEqual(Part.objects.get(serial_number='ACCRUE-0').wear.cumulative_mileage, 280)
+
+        self.accrue()
+        self.assertEqual(self.mileages(), [280, 190, 100])
+
+        self.sessions[2].end_time = self.start + timedelta(minutes=20)
+        self.sessions[2].save()
+        self.accrue()
+        self.assertEqual(self.mileages(), [340, 250, 100])
+
+    def test_abandoned_session_does_not_block_later_ones(self):
+        self.sessions[2].start_time = timezone.now() - timedelta(days=3)
+        self.sessions[2].save()
+        later = TelemetrySession.objects.create(
+            car_session=self.sessions[0].car_session, data_location='/race.bin',
+            start_time=self.start, end_time=self.start + timedelta(hours=1),
+        )
+        self.assertIn(f'telemetry {self.sessions[2].pk}: still open 24 hours', self.accrue())
+        self.assertEqual(self.mileages(), [460, 280, 100])
+        self.assertEqual(JobCheckpoint.objects.get(name='telemetry_mileage').position, later.pk)
+
+    def test_fractions_carry_across_batches(self):
+        # Six seconds at 180 km/h: 0.3 km, which rounds to nothing alone.
+        t = np.arange(61) / 10.0
+        write_telemetry(f'{settings.TELEMETRY_ROOT}/short.bin', t, {'speed': np.full(len(t), 180, dtype=np.float32)})
+        TelemetrySession.objects.filter(pk__in=[session.pk for session in self.sessions]).delete()
+        for _ in range(10):
+            TelemetrySession.objects.create(
+                car_session=CarSession.objects.first(), data_location='/short.bin',
+                start_time=self.start, end_time=self.start + timedelta(seconds=6),
+            )
+        self.accrue()
+        self.assertEqual(self.mileages(), [103, 103, 100])
+
+
+class PointInTimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+        cls.car = Car.objects.create(team=Car.objects.first().team, car_number=16, chassis_number='CH-PIT', status='active')
+        cls.race = datetime(2030, 6, 1, 14, tzinfo=dt_timezone.utc)
+        cls.old, cls.new, cls.spare = (
+            CarPart.objects.create(
+                car=cls.car, installed_at=installed_at, removed_at=removed_at, mileage=0,
+                part=Part.objects.create(part_type=part_type, serial_number=f'PIT-{index}'),
+            )
+            for index, (part_type, installed_at, removed_at) in enumerate([
+                ('Engine', cls.race - timedelta(days=5), cls.race + timedelta(minutes=30)),
+                ('Engine', cls.race + timedelta(minutes=30), None),
+                ('Gearbox', cls.race + timedelta(days=1), None),
+            ])
+        )
+        car_session = CarSession.objects.create(car=cls.car, session=CarSession.objects.first().session, status='done')
+        TelemetrySession.objects.create(
+            car_session=car_session, data_location='/pit.bin', start_time=cls.race, end_time=cls.race + timedelta(hours=1),
+        )
+        cls.session_id = car_session.session_id
+
+    def car_part_ids(self, **params):
+        results = self.client.get('/api/car-parts/', {'car': self.car.pk, **params}).json()['results']
+        return {row['car_part_id'] for row in results}
+
+    def test_as_of_and_session_filters(self):
+        self.assertEqual(self.car_part_ids(as_of=(self.race + timedelta(minutes=29)).isoformat()), {self.old.pk})
+        # Intervals are half-open: the swap instant belongs to the new part.
+        self.assertEqual(self.car_part_ids(as_of=(self.race + timedelta(minutes=30)).isoformat()), {self.new.pk})
+        self.assertEqual(self.car_part_ids(session=self.session_id), {self.old.pk, self.new.pk})
+
+    def test_configuration_endpoint(self):
+        url = f'/api/cars/{self.car.pk}/configuration/'
+        data = self.client.get(url, {'at': (self.race + timedelta(days=2)).isoformat()}).json()
+        self.assertEqual(data['car']['chassis_number'], 'CH-PIT')
+        self.assertEqual([row['car_part_id'] for row in data['parts']], [self.new.pk, self.spare.pk])
+        self.assertEqual(self.client.get(url, {'at': 'race day'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/cars/0/configuration/').status_code, 404)
+
+    def test_as_of_uses_period_index(self):
+        sql, params = CarPart.objects.as_of(self.race).filter(car=self.car).values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('car_part_car_period_gist', plan)
+
+
+@override_settings(BAY_BOOKING_DAYS=2)
+class BayAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+        team = Team.objects.create(name='Bay Team')
+        garage = Garage.objects.create(team=team, location='Pit Lane', season_year=2031)
+        cls.bay1, cls.bay2, cls.closed = (
+            GarageBay.objects.create(garage=garage, bay_number=number, is_active=number < 3) for number in (1, 2, 3)
+        )
+        cls.a, cls.b, cls.c = (
+            Car.objects.create(team=team, car_number=number, chassis_number=f'BAY-{number}', status='active')
+            for number in (1, 2, 3)
+        )
+        cls.s1, cls.s2, cls.s3 = (
+            Session.objects.create(race_name='Bay GP', session_type='FP1', session_date=date(2031, 3, day))
+            for day in (1, 2, 4)
+        )
+        cls.entries = {
+            (car, session): CarSession.objects.create(car=car, session=session, status='scheduled', bay=bay)
+            for car, session, bay in [
+                (cls.a, cls.s1, None), (cls.b, cls.s1, None), (cls.c, cls.s1, cls.closed),
+                (cls.a, cls.s2, None), (cls.b, cls.s2, None),
+                (cls.a, cls.s3, None), (cls.b, cls.s3, cls.bay1),
+            ]
+        }
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+    def bay(self, car, session):
+        return CarSession.objects.get(pk=self.entries[car, session].pk).bay_id
+
+    def test_allocates_a_season_around_existing_bookings(self):
+        url = reverse('car-session-allocate-bays')
+        self.assertEqual(self.client.post(url, {'season': 2031}, content_type='application/json').status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.post(url, {'season': 2031, 'sessions': [1]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        data = self.client.post(url, {'season': 2031}, content_type='application/json').json()
+        self.assertEqual(data['assigned'], 3)
+        self.assertEqual(
+            sorted(row['car_session'] for row in data['unassigned']),
+            sorted(self.entries[car, self.s2].pk for car in (self.a, self.b)),
+        )
+        self.assertEqual((self.bay(self.a, self.s1), self.bay(self.b, self.s1)), (self.bay1.pk, self.bay2.pk))
+        self.assertEqual((self.bay(self.a, self.s3), self.bay(self.b, self.s3)), (self.bay2.pk, self.bay1.pk))
+        self.assertEqual(data['conflicts']['double_bookings'], [])
+        self.assertEqual(
+            data['conflicts']['inactive_bays'],
+            [{'bay': self.closed.pk, 'car_session': self.entries[self.c, self.s1].pk}],
+        )
+
+        CarSession.objects.filter(pk=self.entries[self.b, self.s2].pk).update(bay=self.bay2)
+        conflicts = self.client.get(reverse('car-session-bay-conflicts')).json()
+        self.assertEqual(conflicts['double_bookings'], [{
+            'bay': self.bay2.pk,
+            'car_sessions': [self.entries[self.b, self.s1].pk, self.entries[self.b, self.s2].pk],
+        }])
+
+    def test_conflicts_probe_the_booking_index(self):
+        CarSession.objects.filter(pk=self.entries[self.a, self.s3].pk).update(bay=self.bay1)
+        self.assertEqual(find_bay_conflicts()['double_bookings'], [{
+            'bay': self.bay1.pk,
+            'car_sessions': sorted(self.entries[car, self.s3].pk for car in (self.a, self.b)),
+        }])
+
+        # Moving the session moves its bookings' copy of the date.
+        Session.objects.filter(pk=self.s3.pk).update(session_date=date(2031, 3, 1))
+        CarSession.objects.filter(pk=self.entries[self.b, self.s3].pk).update(bay=self.bay2)
+        self.assertEqual(find_bay_conflicts()['double_bookings'], [])
+        CarSession.objects.filter(pk=self.entries[self.a, self.s1].pk).update(bay=self.bay1)
+        self.assertEqual(find_bay_conflicts()['double_bookings'], [{
+            'bay': self.bay1.pk,
+            'car_sessions': sorted(self.entries[self.a, session].pk for session in (self.s1, self.s3)),
+        }])
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_hashjoin = off')
+            cursor.execute('SET LOCAL enable_mergejoin = off')
+            cursor.execute('EXPLAIN ' + DOUBLE_BOOKINGS_SQL, {'days': settings.BAY_BOOKING_DAYS})
+            plan = '\n'.join(row for row, in cursor.fetchall())
+        self.assertIn('car_session_bay_booking_idx', plan)
+        self.assertNotRegex(plan, r' on session\b')
+
+
+class WorkQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+        team = Team.objects.create(name='Queue Team')
+        car = Car.objects.create(team=team, car_number=77, chassis_number='CH-QUEUE', status='active')
+        cls.senior, cls.middle, cls.junior = (
+            Person.objects.create(team=team, first_name=level, last_name='Tech', role='Mechanic', certification_level=level)
+            for level in 'ABC'
+        )
+        now = timezone.now()
+        cls.orders = [
+            WorkOrder.objects.create(car=car, description=f'Job {index}') for index in range(4)
+        ]
+        for index, order in enumerate(cls.orders):
+            WorkOrder.objects.filter(pk=order.pk).update(created_at=now - timedelta(hours=10 - index))
+        cls.other_team_order = WorkOrder.objects.create(car=Car.objects.exclude(team=team).first(), description='Not ours')
+        cls.team = team
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+    def post(self, action, data):
+        return self.client.post(reverse(f'work-order-{action}'), data, content_type='application/json')
+
+    def test_claim_dispatch_and_complete(self):
+        self.assertEqual(self.post('claim', {'person': self.junior.pk}).status_code, 403)
+        self.client.force_login(self.admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            claimed = self.post('claim', {'person': self.junior.pk, 'limit': 5}).json()['claimed']
+        self.assertTrue(any('SKIP LOCKED' in query['sql'] for query in queries))
+        # Capacity C:2, oldest first, own team only.
+        self.assertEqual([row['work_order_id'] for row in claimed], [order.pk for order in self.orders[:2]])
+        self.assertEqual(self.post('claim', {'person': self.junior.pk}).json()['claimed'], [])
+
+        queue = self.client.get(reverse('work-order-queue'), {'team': self.team.pk}).json()['results']
+        self.assertEqual([row['work_order_id'] for row in queue], [order.pk for order in self.orders[2:]])
+
+        dispatched = self.post('dispatch', {'team': self.team.pk}).json()
+        # Both idle: the higher certification wins the tie, then the idler one.
+        self.assertEqual(
+            [(row['work_order'], row['person']) for row in dispatched['assigned']],
+            [(self.orders[2].pk, self.senior.pk), (self.orders[3].pk, self.middle.pk)],
+        )
+        self.assertEqual(self.client.get(reverse('work-order-queue'), {'team': self.team.pk}).json()['count'], 0)
+
+        ids = [self.orders[0].pk, self.orders[1].pk, self.orders[0].pk, 0]
+        self.assertEqual(self.post('complete', {'work_orders': ids}).json(), {'completed': 2, 'skipped': 1})
+        self.assertEqual(self.post('complete', {'work_orders': ids}).json(), {'completed': 0, 'skipped': 3})
+        data = self.client.get(reverse('work-order-list'), {'person': self.junior.pk, 'expand': 'assignments'}).json()
+        self.assertEqual([row['is_open'] for row in data['results']], [False, False])
+        self.assertEqual(data['results'][0]['assignments'][0]['person'], self.junior.pk)
+
+    def test_technicians_act_only_as_themselves(self):
+        user = User.objects.create_user('junior', password='pw')
+        self.client.force_login(user)
+        self.assertEqual(self.post('claim', {}).status_code, 403)
+
+        Technician.objects.create(user=user, person=self.junior)
+        self.assertEqual(self.post('claim', {'person': self.senior.pk}).status_code, 403)
+        claimed = self.post('claim', {'limit': 1}).json()['claimed']
+        self.assertEqual([row['work_order_id'] for row in claimed], [self.orders[0].pk])
+
+        # Someone else's order is skipped, not completed.
+        WorkAssignment.objects.create(work_order=self.orders[1], person=self.senior, role='Mechanic')
+        ids = [self.orders[0].pk, self.orders[1].pk]
+        self.assertEqual(self.post('complete', {'work_orders': ids}).json(), {'completed': 1, 'skipped': 1})
+        self.assertIsNone(WorkOrder.objects.get(pk=self.orders[1].pk).completed_at)
+
+
+class ChangeFeedTests(TestCase):
+    """
+    Writes to car_part, car_session and work_order are recorded by the
+    change_event trigger and streamed, per car, by /api/events/.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+        cls.car_part = CarPart.objects.order_by('pk').first()
+        cls.other = CarPart.objects.exclude(car=cls.car_part.car_id).order_by('pk').first()
+
+    def last_event_id(self):
+        return ChangeEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def bump_mileage(self, car_part, by=10):
+        CarPart.objects.filter(pk=car_part.pk).update(mileage=Coalesce('mileage', 0) + by)
+
+    def test_triggers_record_changes(self):
+        start = self.last_event_id()
+        self.bump_mileage(self.car_part)
+        CarPart.objects.filter(pk=self.car_part.pk).update(car=self.car_part.car_id)
+        order = WorkOrder.objects.create(car_id=self.car_part.car_id, description='Feed')
+        order_id = order.pk
+        order.delete()
+
+        events = ChangeEvent.objects.filter(id__gt=start).order_by('id')
+        # The no-op update is not recorded.
+        self.assertEqual(
+            [(event.table_name, event.op, event.row_id, event.car_id, event.fields) for event in events],
+            [
+                ('car_part', 'update', self.car_part.pk, self.car_part.car_id, ['mileage']),
+                ('work_order', 'insert', order_id, self.car_part.car_id, []),
+                ('work_order', 'delete', order_id, self.car_part.car_id, []),
+            ],
+        )
+
+    def test_stream_replays_then_follows_live_events(self):
+        start = self.last_event_id()
+        self.bump_mileage(self.car_part)
+        self.bump_mileage(self.other)
+        replayed = self.last_event_id() - 1
+        live = [
+            {'id': replayed, 'table': 'car_part', 'op': 'update', 'row': self.car_part.pk,
+             'car': self.car_part.car_id, 'fields': ['mileage']},
+            {'id': replayed + 5, 'table': 'car_part', 'op': 'update', 'row': self.other.pk,
+             'car': self.other.car_id, 'fields': ['mileage']},
+            {'id': replayed + 6, 'table': 'work_order', 'op': 'insert', 'row': 1,
+             'car': self.car_part.car_id, 'fields': []},
+        ]
+        messages, body = async_to_sync(self.stream)(
+            f'car={self.car_part.car_id}', [(b'last-event-id', str(start).encode())], live,
+        )
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        # Replayed from the table, the duplicate and the other car's event
+        # dropped from the live ones.
+        self.assertEqual(re.findall(r'^id: (\d+)(?::\d+)?$', body, re.M), [str(replayed), str(replayed + 6)])
+
+        messages, _ = async_to_sync(self.stream)('car=x', [], [])
+        self.assertEqual(messages[0]['status'], 400)
+
+    def test_replay_waits_for_listen(self):
+        replays = []
+
+        async def scenario():
+            connected = asyncio.Event()
+
+            async def listen():
+                await connected.wait()
+                change_feed.listening.set()
+                await asyncio.Event().wait()
+
+            async def send(message):
+                pass
+
+            with mock.patch.object(change_feed, 'listen', listen), \
+                    mock.patch('garage.events._replay', side_effect=lambda *args: replays.append(args) or []):
+                task = asyncio.ensure_future(events._stream({'headers': []}, send, set(), set(), (0, None)))
+                try:
+                    await asyncio.sleep(0.1)
+                    self.assertEqual(replays, [])
+                    connected.set()
+                    for _ in range(500):
+                        if replays:
+                            break
+                        await asyncio.sleep(0.01)
+                finally:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    await change_feed.stop()
+
+        async_to_sync(scenario)()
+        self.assertEqual(len(replays), 1)
+
+    async def stream(self, query, headers, live):
+        messages = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        def body():
+            return b''.join(message.get('body', b'') for message in messages).decode()
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/events/',
+            'query_string': query.encode(), 'headers': headers,
+        }
+        task = asyncio.ensure_future(application(scope, receive, send))
+        try:
+            for _ in range(500):
+                if task.done() or change_feed.subscribers:
+                    break
+                await asyncio.sleep(0.01)
+            for event in live:
+                change_feed.publish(event)
+            for _ in range(500):
+                if task.done() or (live and f"id: {live[-1]['id']}\n" in body()):
+                    break
+                await asyncio.sleep(0.01)
+            disconnect.set()
+            await task
+        finally:
+            await change_feed.stop()
+        return messages, body()
+
+
+class ChangeFeedResumeTests(TransactionTestCase):
+    def test_resume_replays_events_committed_out_of_id_order(self):
+        team = Team.objects.create(name='Resume')
+        car = Car.objects.create(team=team, car_number=12, chassis_number='CH-RESUME', status='active')
+        insert = 'INSERT INTO work_order (car_id, description, created_at) VALUES (%s, %s, now())'
+        try:
+            with psycopg.connect(**change_feed.conninfo()) as slow, psycopg.connect(**change_feed.conninfo()) as fast:
+                slow.execute(insert, [car.pk, 'Slow'])
+                fast.execute(insert, [car.pk, 'Fast'])
+                fast.commit()
+                # The client sees the fast event live and leaves before the
+                # slow one, with the lower id, commits.
+                seen = events._event(ChangeEvent.objects.values_list(*events.EVENT_FIELDS).get())
+                last_event_id = re.search(rb'^id: (\S+)$', events._message(seen), re.M).group(1)
+                slow.commit()
+
+            missed = ChangeEvent.objects.exclude(pk=seen['id']).get()
+            self.assertLess(missed.pk, seen['id'])
+            self.assertEqual(events._replay(seen['id'], None, set(), set(), 10), [])
+            _, _, resume, error = events._parse({'headers': [(b'last-event-id', last_event_id)]})
+            self.assertIsNone(error)
+            replayed = [event['id'] for event in events._replay(*resume, set(), set(), 10)]
+            self.assertEqual(replayed, [missed.pk, seen['id']])
+        finally:
+            WorkOrder.objects.filter(car=car).delete()
+            car.delete()
+            team.delete()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(TestCase):
+    """
+    With a replica configured, safe API reads go to it, while writes, the
+    admin and clients that just wrote stay on the primary; pinned actions
+    read from the replica regardless.
+    """
+
+    def route(self, path, method='get', cookies=None, write=False):
+        seen = {}
+
+        def view(request):
+            match = resolve(request.path_info)
+            request.resolver_match = match
+            middleware.process_view(request, match.func, match.args, match.kwargs)
+            seen['garage'] = db_router.db_for_read(CarPart)
+            seen['auth'] = db_router.db_for_read(User)
+            if write:
+                seen['write'] = db_router.db_for_write(CarPart)
+                seen['after_write'] = db_router.db_for_read(CarPart)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        response = middleware(request)
+        return seen, response
+
+    def test_routing(self):
+        seen, response = self.route(reverse('car-part-list'))
+        self.assertEqual(seen, {'garage': 'replica_1', 'auth': 'default'})
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        seen, response = self.route(reverse('work-order-claim'), method='post', write=True)
+        self.assertEqual(seen, {'garage': 'default', 'auth': 'default', 'write': 'default', 'after_write': 'default'})
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], settings.DB_REPLICA_STICKY_SECONDS)
+
+        # A GET that writes reads its own write back from the primary.
+        seen, response = self.route(reverse('car-list'), write=True)
+        self.assertEqual((seen['garage'], seen['after_write']), ('replica_1', 'default'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        sticky = {STICKY_COOKIE: '1'}
+        self.assertEqual(self.route(reverse('car-part-list'), cookies=sticky)[0]['garage'], 'default')
+        self.assertEqual(self.route(reverse('part-lifecycle-warnings'), cookies=sticky)[0]['garage'], 'replica_1')
+        self.assertEqual(self.route(reverse('car-part-export'), cookies=sticky)[0]['garage'], 'replica_1')
+        self.assertEqual(self.route(reverse('async-part-lifecycle-warnings'), cookies=sticky)[0]['garage'], 'replica_1')
+        self.assertEqual(self.route(reverse('admin:garage_carpart_changelist'))[0]['garage'], 'default')
+
+        # Outside a request everything uses the primary.
+        self.assertEqual(db_router.db_for_read(CarPart), 'default')
+        self.assertEqual(db_router.db_for_write(CarPart), 'default')
+
+
+class PartWearFallbackTests(TestCase):
+    def test_missing_row_is_summarized_without_writing(self):
+        team = Team.objects.create(name='Wear')
+        car = Car.objects.create(team=team, car_number=7, chassis_number='CH-WEAR', status='active')
+        part = Part.objects.create(part_type='Engine', serial_number='WEAR-0', fia_lifecycle_limit=1000)
+        CarPart.objects.create(car=car, part=part, installed_at=timezone.now(), mileage=250)
+        PartWear.objects.filter(pk=part.pk).delete()
+
+        data = self.client.get(reverse('part-detail', kwargs={'pk': part.pk})).json()
+        self.assertEqual((data['cumulative_mileage'], data['current_car']), (250, car.pk))
+        self.assertEqual(data['lifecycle_percentage'], 25.0)
+        self.assertFalse(PartWear.objects.filter(pk=part.pk).exists())
+
+
+class SeasonPartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset('small')
+        cls.season = Session.objects.earliest('session_date').session_date.year
+
+    def plan(self, queryset):
+        sql, params = queryset.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF, SUMMARY OFF) {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def counts(self):
+        return {
+            'car_parts': CarPart.objects.count(),
+            'active': CarPart.objects.filter(removed_at__isnull=True).count(),
+            'season_parts': CarPart.objects.in_season(self.season).count(),
+            'car_sessions': CarSession.objects.count(),
+            'telemetry': TelemetrySession.objects.count(),
+            'api_season_parts': self.client.get('/api/car-parts/', {'season': self.season}).json()['count'],
+            'api_season_sessions': self.client.get('/api/car-sessions/', {'season': self.season}).json()['count'],
+        }
+
+    def test_setup_close_and_archive(self):
+        before, events = self.counts(), ChangeEvent.objects.count()
+        self.assertGreater(before['api_season_sessions'], 0)
+        call_command('partition_seasons', 'setup', stdout=io.StringIO())
+        call_command('partition_seasons', 'close', season=self.season, stdout=io.StringIO())
+        self.assertEqual(self.counts(), before)
+        # Rows that only moved partition are not announced.
+        self.assertEqual(ChangeEvent.objects.count(), events)
+
+        moved = {}
+        with connection.cursor() as cursor:
+            for table in ('car_part', 'car_session', 'telemetry_session'):
+                cursor.execute(f'SELECT count(*) FROM {table}_{self.season}')
+                moved[table] = cursor.fetchone()[0]
+                self.assertGreater(moved[table], 0, table)
+
+        self.assertNotIn(f'car_part_{self.season}', self.plan(CarPart.objects.filter(removed_at__isnull=True)))
+        session = CarSession.objects.filter(session__session_date__year=self.season).first()
+        self.assertNotIn('car_session_default', self.plan(CarSession.objects.filter(session=session.session_id)))
+
+        # The parent's trigger reports changes under the table's own name.
+        part = CarPart.objects.filter(removed_at__isnull=True).first()
+        part.mileage = (part.mileage or 0) + 1
+        part.save()
+        self.assertTrue(ChangeEvent.objects.filter(table_name='car_part', row_id=part.pk).exists())
+
+        call_command('partition_seasons', 'archive', season=self.season, stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [f'archive.car_part_{self.season}'])
+            self.assertIsNotNone(cursor.fetchone()[0])
+        self.assertEqual(CarPart.objects.count(), before['car_parts'] - moved['car_part'])
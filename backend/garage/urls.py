@@ -1,9 +1,13 @@
 from django.urls import path, include
+from rest_framework import viewsets
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncReadView, AsyncLifecycleWarningsView
+from .dashboard import DashboardView, CarOverviewView
 from .views import (
     TeamViewSet, CarViewSet, PartViewSet, CarPartViewSet,
     PersonViewSet, GarageViewSet, GarageBayViewSet,
-    SessionViewSet, CarSessionViewSet
+    SessionViewSet, CarSessionViewSet, TelemetrySessionViewSet, WorkOrderViewSet, SearchViewSet,
+    CacheStatsViewSet, ProfilingView
 )
 
 router = DefaultRouter()
@@ -16,7 +20,28 @@ router.register(r'garages', GarageViewSet, basename='garage')
 router.register(r'garage-bays', GarageBayViewSet, basename='garage-bay')
 router.register(r'sessions', SessionViewSet, basename='session')
 router.register(r'car-sessions', CarSessionViewSet, basename='car-session')
+router.register(r'telemetry', TelemetrySessionViewSet, basename='telemetry')
+router.register(r'work-orders', WorkOrderViewSet, basename='work-order')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'cache-stats', CacheStatsViewSet, basename='cache-stats')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('profiling/', ProfilingView.as_view(), name='profiling'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('cars/<int:pk>/overview/', CarOverviewView.as_view(), name='car-overview'),
+    path(
+        'async/parts/lifecycle-warnings/',
+        AsyncLifecycleWarningsView.as_view(),
+        name='async-part-lifecycle-warnings',
+    ),
 ]
+
+# Async list/retrieve twins of the read-only viewsets, for ASGI workers.
+for prefix, viewset, basename in router.registry:
+    if issubclass(viewset, viewsets.ReadOnlyModelViewSet):
+        urlpatterns += [
+            path(f'async/{prefix}/', AsyncReadView.as_view(viewset=viewset), name=f'async-{basename}-list'),
+            path(f'async/{prefix}/<pk>/', AsyncReadView.as_view(viewset=viewset), name=f'async-{basename}-detail'),
+        ]
+
+urlpatterns.append(path('', include(router.urls)))
@@ -1,13 +1,41 @@
-from rest_framework import viewsets, filters
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Exists, OuterRef, Q, Subquery, TextField
+from django.db.models.functions import Cast, Greatest, Upper
+from django.utils import timezone
+from rest_framework import viewsets, filters, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, NumberFilter, CharFilter, BooleanFilter
-from .models import Team, Car, Part, CarPart, Person, Garage, GarageBay, Session, CarSession
+from rest_framework.views import APIView
+from django_filters.rest_framework import (
+    DjangoFilterBackend, FilterSet, NumberFilter, CharFilter, BooleanFilter, IsoDateTimeFilter
+)
+from .models import (
+    Team, Car, Part, CarPart, PartWear, Person, Garage, GarageBay, Session, CarSession, TelemetrySession,
+    WorkOrder, WorkAssignment, Technician, Period, removed_after, season_bounds
+)
 from .serializers import (
     TeamSerializer, CarSerializer, PartSerializer, CarPartSerializer,
     CarPartDetailSerializer, PersonSerializer, GarageSerializer,
-    GarageBaySerializer, SessionSerializer, CarSessionSerializer
+    GarageBaySerializer, SessionSerializer, CarSessionSerializer, TelemetrySessionSerializer,
+    BayAllocationSerializer, WorkOrderSerializer, WorkAssignmentSerializer, WorkClaimSerializer,
+    WorkDispatchSerializer, WorkCompletionSerializer
 )
+from .cache import CachedResponseMixin, cache_stats
+from .export import ExportMixin, streaming_response
+from .fieldsets import SparseFieldsetMixin
+from .mileage import apply_mileage_deltas, summarize_outcomes
+from .pagination import HistoryPagination
+from .profiling import clear_profiles, profile_summary
+from .parsers import CSVParser
+from .renderers import dumps
+from .scheduling import allocate_bays, find_bay_conflicts
+from .work_queue import claim_work_orders, claimable, complete_work_orders, dispatch_work_orders
+from .telemetry import TelemetryError
 
 
 class PartFilter(FilterSet):
@@ -25,65 +53,158 @@ class CarPartFilter(FilterSet):
     part = NumberFilter(field_name='part__part_id')
     is_active = BooleanFilter(method='filter_is_active')
     part_type = CharFilter(field_name='part__part_type', lookup_expr='icontains')
+    as_of = IsoDateTimeFilter(method='filter_as_of')
+    session = NumberFilter(method='filter_session')
+    season = NumberFilter(method='filter_season')
 
     class Meta:
         model = CarPart
-        fields = ['car', 'part', 'is_active', 'part_type']
+        fields = ['car', 'part', 'is_active', 'part_type', 'as_of', 'session', 'season']
 
     def filter_is_active(self, queryset, name, value):
         if value:
             return queryset.filter(removed_at__isnull=True)
         return queryset.filter(removed_at__isnull=False)
 
+    def filter_as_of(self, queryset, name, value):
+        return queryset.as_of(value)
+
+    def filter_session(self, queryset, name, value):
+        # Installations that overlap one of the car's telemetry windows in
+        # the session.
+        windows = TelemetrySession.objects.filter(
+            car_session__session=value, car_session__car=OuterRef('car'),
+        ).alias(window=Period('start_time', 'end_time')).filter(window__overlap=OuterRef('period'))
+        first_start = TelemetrySession.objects.filter(car_session__session=value).order_by('start_time')
+        return queryset.alias(period=Period()).filter(
+            Exists(windows), removed_after(Subquery(first_start.values('start_time')[:1])),
+        )
+
+    def filter_season(self, queryset, name, value):
+        # In service at any time of the season.
+        return queryset.in_season(int(value))
+
+
+class CarSessionFilter(FilterSet):
+    season = NumberFilter(method='filter_season')
+
+    class Meta:
+        model = CarSession
+        fields = ['car', 'session', 'status', 'season']
+
+    def filter_season(self, queryset, name, value):
+        # car_session is partitioned on session_id, so bound it by the
+        # season's session ids as well.
+        sessions = Session.objects.filter(session_date__year=int(value))
+        return queryset.filter(
+            session__session_date__year=int(value),
+            session_id__gte=Subquery(sessions.order_by('session_id').values('session_id')[:1]),
+            session_id__lte=Subquery(sessions.order_by('-session_id').values('session_id')[:1]),
+        )
+
+
+class TelemetrySessionFilter(FilterSet):
+    car = NumberFilter(field_name='car_session__car')
+    session = NumberFilter(field_name='car_session__session')
+    season = NumberFilter(method='filter_season')
 
-class TeamViewSet(viewsets.ReadOnlyModelViewSet):
+    class Meta:
+        model = TelemetrySession
+        fields = ['car_session', 'car', 'session', 'season']
+
+    def filter_season(self, queryset, name, value):
+        start, end = season_bounds(int(value))
+        return queryset.filter(start_time__gte=start, start_time__lt=end)
+
+
+class WorkOrderFilter(FilterSet):
+    team = NumberFilter(field_name='car__team')
+    person = NumberFilter(field_name='assignments__person', distinct=True)
+    is_open = BooleanFilter(field_name='completed_at', lookup_expr='isnull')
+
+    class Meta:
+        model = WorkOrder
+        fields = ['car', 'session', 'team', 'person', 'is_open']
+
+
+class TeamViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    cache_models = (Team,)
     search_fields = ['name', 'country']
     ordering_fields = ['name', 'country']
 
 
-class CarViewSet(viewsets.ReadOnlyModelViewSet):
+class CarViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Car.objects.select_related('team').all()
     serializer_class = CarSerializer
+    cache_models = (Car, Team)
     filterset_fields = ['team', 'status']
     search_fields = ['chassis_number', 'car_number']
     ordering_fields = ['car_number', 'status']
 
-
-class PartViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Part.objects.prefetch_related('car_parts').all()
+    @action(detail=True, methods=['get'])
+    def configuration(self, request, pk=None):
+        """
+        The parts fitted to the car at ``?at=`` (ISO 8601, default now),
+        looked up through the car_part period index.
+        """
+        car = self.get_object()
+        try:
+            at = serializers.DateTimeField().run_validation(request.query_params.get('at') or timezone.now())
+        except ValidationError as exc:
+            raise ValidationError({'at': exc.detail})
+        car_parts = CarPart.objects.as_of(at).filter(car=car).select_related('car', 'part').order_by(
+            'part__part_type', 'car_part_id',
+        )
+        return Response({
+            'car': self.get_serializer(car).data,
+            'at': at,
+            'parts': CarPartSerializer(car_parts, many=True).data,
+        })
+
+
+class PartViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Part.objects.select_related('wear').all()
     serializer_class = PartSerializer
+    cache_models = (Part, PartWear)
+    cache_settings = ('LIFECYCLE_WARNING_THRESHOLD',)
+    replica_actions = ('export', 'lifecycle_warnings')
     filterset_class = PartFilter
     search_fields = ['serial_number', 'part_type', 'manufacturer']
     ordering_fields = ['part_type', 'manufacturer', 'fia_lifecycle_limit']
 
     @action(detail=False, methods=['get'])
     def lifecycle_warnings(self, request):
-        parts_with_warnings = []
-        parts = self.get_queryset()
-
-        for part in parts:
-            if not part.fia_lifecycle_limit:
-                continue
-
-            active_part = part.car_parts.filter(removed_at__isnull=True).first()
-            if not active_part or not active_part.mileage:
-                continue
-
-            lifecycle_percentage = (active_part.mileage / part.fia_lifecycle_limit) * 100
-
-            if lifecycle_percentage >= 80:
-                serializer = self.get_serializer(part)
-                parts_with_warnings.append(serializer.data)
-
-        return Response(parts_with_warnings)
+        return self.cached_response(request, lambda: self.get_lifecycle_warnings(request))
+
+    def get_threshold(self, request):
+        threshold = request.query_params.get('threshold', settings.LIFECYCLE_WARNING_THRESHOLD)
+        try:
+            return float(threshold)
+        except (TypeError, ValueError):
+            raise ValidationError({'threshold': 'A valid number is required.'})
+
+    def get_lifecycle_warnings(self, request):
+        threshold = self.get_threshold(request)
+        parts = self.filter_queryset(self.get_queryset().lifecycle_warnings(threshold))
+        page = self.paginate_queryset(parts)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(parts, many=True)
+        return Response(serializer.data)
 
 
-class CarPartViewSet(viewsets.ReadOnlyModelViewSet):
+class CarPartViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = CarPart.objects.select_related('car', 'part', 'car__team').all()
     serializer_class = CarPartSerializer
+    cache_models = (CarPart, Car, Part, PartWear)
+    cache_settings = ('LIFECYCLE_WARNING_THRESHOLD',)
+    cache_responses = False
     filterset_class = CarPartFilter
+    pagination_class = HistoryPagination
+    cursor_ordering = ['-installed_at', '-car_part_id']
     search_fields = ['car__chassis_number', 'part__serial_number', 'part__part_type']
     ordering_fields = ['installed_at', 'removed_at', 'mileage']
 
@@ -94,58 +215,315 @@ class CarPartViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def active(self, request):
-        active_parts = self.get_queryset().filter(removed_at__isnull=True)
-        page = self.paginate_queryset(active_parts)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(active_parts, many=True)
-        return Response(serializer.data)
+        active_parts = self.filter_queryset(self.get_queryset().filter(removed_at__isnull=True))
+        return self.cached_response(request, lambda: self.list_response(active_parts))
 
     @action(detail=False, methods=['get'], url_path='by-car/(?P<car_id>[^/.]+)')
     def by_car(self, request, car_id=None):
-        car_parts = self.get_queryset().filter(car_id=car_id).order_by('-installed_at')
-        page = self.paginate_queryset(car_parts)
+        car_parts = self.filter_queryset(self.get_queryset().filter(car_id=car_id).order_by('-installed_at'))
+        return self.cached_response(request, lambda: self.list_response(car_parts))
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(car_parts, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(
+        detail=False, methods=['post'], url_path='bulk-mileage',
+        permission_classes=[IsAdminUser], parser_classes=[JSONParser, CSVParser],
+    )
+    def bulk_mileage(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError({'detail': 'Expected a list of mileage deltas.'})
+
+        outcomes = apply_mileage_deltas(request.data)
+        return Response({**summarize_outcomes(outcomes), 'results': outcomes})
+
 
-class PersonViewSet(viewsets.ReadOnlyModelViewSet):
+class PersonViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Person.objects.select_related('team').all()
     serializer_class = PersonSerializer
+    cache_models = (Person, Team)
     filterset_fields = ['team', 'role', 'certification_level']
     search_fields = ['first_name', 'last_name', 'role']
     ordering_fields = ['last_name', 'first_name', 'role']
 
 
-class GarageViewSet(viewsets.ReadOnlyModelViewSet):
+class GarageViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Garage.objects.select_related('team').prefetch_related('bays').all()
     serializer_class = GarageSerializer
+    cache_models = (Garage, GarageBay, Team)
     filterset_fields = ['team', 'season_year']
     search_fields = ['location']
     ordering_fields = ['season_year', 'location']
 
 
-class GarageBayViewSet(viewsets.ReadOnlyModelViewSet):
+class GarageBayViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = GarageBay.objects.select_related('garage').all()
     serializer_class = GarageBaySerializer
+    cache_models = (GarageBay, Garage)
     filterset_fields = ['garage', 'is_active']
     ordering_fields = ['bay_number']
 
 
-class SessionViewSet(viewsets.ReadOnlyModelViewSet):
+class SessionViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Session.objects.all()
     serializer_class = SessionSerializer
+    cache_models = (Session,)
     filterset_fields = ['session_type']
     search_fields = ['race_name']
     ordering_fields = ['session_date', 'race_name']
 
 
-class CarSessionViewSet(viewsets.ReadOnlyModelViewSet):
+class CarSessionViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = CarSession.objects.select_related('car', 'session', 'bay').all()
     serializer_class = CarSessionSerializer
-    filterset_fields = ['car', 'session', 'status']
+    cache_models = (CarSession, Car, Session, GarageBay)
+    cache_responses = False
+    pagination_class = HistoryPagination
+    cursor_ordering = ['-session', '-car_session_id']
+    filterset_class = CarSessionFilter
     ordering_fields = ['session', 'car']
+
+    @action(
+        detail=False, methods=['post'], url_path='allocate-bays',
+        permission_classes=[IsAdminUser],
+    )
+    def allocate_bays(self, request):
+        """
+        Assign garage bays to the entries of ``sessions`` (a list of session
+        ids) or of every session in ``season``; ``reassign`` reallocates
+        entries that already have a bay.
+        """
+        serializer = BayAllocationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if 'season' in params:
+            sessions = Session.objects.filter(session_date__year=params['season'])
+        else:
+            sessions = Session.objects.filter(pk__in=params['sessions'])
+        return Response({**allocate_bays(sessions, params['reassign']), 'conflicts': find_bay_conflicts()})
+
+    @action(detail=False, methods=['get'], url_path='bay-conflicts')
+    def bay_conflicts(self, request):
+        return Response(find_bay_conflicts())
+
+
+class TelemetrySessionViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = TelemetrySession.objects.select_related('car_session').all()
+    serializer_class = TelemetrySessionSerializer
+    cache_models = (TelemetrySession, CarSession)
+    filterset_class = TelemetrySessionFilter
+    ordering_fields = ['start_time']
+
+    @action(detail=True, methods=['get'])
+    def channels(self, request, pk=None):
+        """
+        Without ``?channels=`` describe the file. With ``?channels=a,b``
+        return min/max/mean per bucket over ``?start=`` / ``?end=`` (seconds
+        into the session) in ``?buckets=`` buckets, or with
+        ``?resolution=raw`` stream every sample as NDJSON column blocks.
+        Ingested sessions are answered from their pyramids.
+        """
+        telemetry = self.get_object()
+        try:
+            telemetry_file = telemetry.open_data()
+        except TelemetryError as exc:
+            raise NotFound(str(exc))
+
+        names = [name.strip() for name in request.query_params.get('channels', '').split(',') if name.strip()]
+        if not names:
+            return Response({'telemetry_id': telemetry.pk, **telemetry_file.describe()})
+
+        start, end = self.get_bound(request, 'start'), self.get_bound(request, 'end')
+        try:
+            telemetry_file.check_channels(names)
+        except TelemetryError as exc:
+            raise ValidationError({'channels': str(exc)})
+
+        if request.query_params.get('resolution') == 'raw':
+            chunks = telemetry_file.iter_chunks(names, start, end)
+            return streaming_response(
+                request, (dumps(chunk) + b'\n' for chunk in chunks), content_type='application/x-ndjson',
+            )
+
+        try:
+            buckets = int(request.query_params.get('buckets', 1000))
+        except ValueError:
+            raise ValidationError({'buckets': 'A valid integer is required.'})
+        if not 1 <= buckets <= settings.TELEMETRY_MAX_BUCKETS:
+            raise ValidationError({'buckets': f'Must be between 1 and {settings.TELEMETRY_MAX_BUCKETS}.'})
+
+        return Response({
+            'telemetry_id': telemetry.pk,
+            'start': start,
+            'end': end,
+            **telemetry_file.downsample(names, start, end, buckets),
+        })
+
+    def get_bound(self, request, name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: 'A valid number is required.'})
+
+
+class WorkOrderViewSet(CachedResponseMixin, ExportMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Work orders plus the technicians' queue: ``queue`` lists what can be
+    claimed, ``claim`` takes the oldest of it for one technician, ``dispatch``
+    spreads it across each team by load, and ``complete`` closes orders in
+    bulk. Without staff rights, users claim and complete only as their own
+    ``Technician``. See ``garage.work_queue``.
+    """
+    queryset = WorkOrder.objects.select_related('car', 'session').all()
+    serializer_class = WorkOrderSerializer
+    cache_models = (WorkOrder, WorkAssignment, Car, Session)
+    cache_responses = False
+    filterset_class = WorkOrderFilter
+    search_fields = ['description', 'car__chassis_number']
+    ordering_fields = ['created_at', 'completed_at']
+
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        orders = self.filter_queryset(claimable())
+        return self.cached_response(request, lambda: self.list_response(orders))
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def acting_person(self, request, person=None):
+        """
+        The person a queue action runs as: staff may name anyone (or no one,
+        for ``complete``); everyone else acts as their own technician.
+        """
+        if request.user.is_staff:
+            return person
+        technician = Technician.objects.select_related('person').filter(user=request.user).first()
+        if technician is None:
+            raise PermissionDenied('Your account is not linked to a technician.')
+        if person is not None and person != technician.person:
+            raise PermissionDenied('Only staff can act for another technician.')
+        return technician.person
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def claim(self, request):
+        serializer = WorkClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        person = self.acting_person(request, serializer.validated_data.get('person'))
+        if person is None:
+            raise ValidationError({'person': 'This field is required.'})
+        orders = claim_work_orders(person, serializer.validated_data['limit'])
+        return Response({'claimed': WorkOrderSerializer(orders, many=True).data})
+
+    @action(detail=False, methods=['post'], url_path='dispatch', url_name='dispatch', permission_classes=[IsAdminUser])
+    def dispatch_orders(self, request):
+        serializer = WorkDispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        assignments, unassigned = dispatch_work_orders(
+            serializer.validated_data.get('team'), serializer.validated_data['limit'],
+        )
+        return Response({
+            'assigned': WorkAssignmentSerializer(assignments, many=True).data,
+            'unassigned': [order.pk for order in unassigned],
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def complete(self, request):
+        serializer = WorkCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data['work_orders'])
+        completed = complete_work_orders(requested, self.acting_person(request))
+        return Response({'completed': completed, 'skipped': len(requested) - completed})
+
+
+class CacheStatsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        return Response(cache_stats())
+
+
+class ProfilingView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'buffer_size': settings.PROFILING_BUFFER_SIZE,
+            'routes': profile_summary(request.query_params.get('route')),
+        })
+
+    def delete(self, request):
+        clear_profiles()
+        return Response(status=204)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Ranked lookup across parts, cars and people using pg_trgm word
+    similarity. The same trigram GIN indexes serve the icontains filters
+    used by PartFilter and SearchFilter.
+    """
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        try:
+            limit = int(request.query_params.get('limit', settings.SEARCH_RESULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Must be at least 1.'})
+        limit = min(limit, 100)
+
+        parts = self.rank(
+            Part.objects.select_related('wear'), query, limit,
+            ['serial_number', 'part_type', 'manufacturer'],
+        )
+        cars = self.rank(
+            Car.objects.select_related('team'), query, limit,
+            ['chassis_number', 'team__name'],
+        )
+        people = self.rank(
+            Person.objects.select_related('team'), query, limit,
+            ['last_name', 'first_name', 'role'],
+        )
+
+        return Response({
+            'query': query,
+            'parts': self.serialize(PartSerializer, parts),
+            'cars': self.serialize(CarSerializer, cars),
+            'people': self.serialize(PersonSerializer, people),
+        })
+
+    def rank(self, queryset, query, limit, fields):
+        # Compare against UPPER(column::text), the expression that icontains
+        # emits and the trigram indexes are built on.
+        needle = query.upper()
+        columns = [Upper(Cast(field, TextField())) for field in fields]
+        similarities = [TrigramWordSimilarity(needle, column) for column in columns]
+        match = Q()
+        for field, column in zip(fields, columns):
+            match |= Q(TrigramWordSimilar(column, needle))
+            match |= Q(**{f'{field}__icontains': query})
+        return queryset.annotate(
+            rank=Greatest(*similarities) if len(similarities) > 1 else similarities[0],
+        ).filter(match).order_by('-rank', 'pk')[:limit]
+
+    def serialize(self, serializer_class, objects):
+        serializer = serializer_class(context={'request': self.request})
+        return [
+            {**serializer.to_representation(obj), 'rank': round(obj.rank or 0, 3)}
+            for obj in objects
+        ]
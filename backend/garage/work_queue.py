@@ -0,0 +1,132 @@
+"""
+Work-order queue: technicians claim open, unassigned work orders for their
+team's cars, and dispatch hands the backlog out by load.
+
+Claiming locks candidate rows with ``FOR UPDATE SKIP LOCKED``, so concurrent
+claimers never wait on each other: each takes the next rows nobody holds.
+A technician may hold at most ``WORK_QUEUE_CAPACITY[certification_level]``
+open orders.
+"""
+import heapq
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from .models import Person, WorkAssignment, WorkOrder
+
+
+def capacity(person):
+    return settings.WORK_QUEUE_CAPACITY.get(person.certification_level, settings.WORK_QUEUE_DEFAULT_CAPACITY)
+
+
+def certification_rank(person):
+    """Position of the level in WORK_QUEUE_CAPACITY; the first is the highest."""
+    levels = list(settings.WORK_QUEUE_CAPACITY)
+    return levels.index(person.certification_level) if person.certification_level in levels else len(levels)
+
+
+def claimable():
+    """Open work orders nobody is assigned to, oldest first."""
+    return WorkOrder.objects.filter(completed_at__isnull=True).filter(
+        ~Exists(WorkAssignment.objects.filter(work_order=OuterRef('pk'))),
+    ).order_by('created_at', 'work_order_id')
+
+
+def _lock_unassigned(queryset, limit):
+    """
+    Lock up to ``limit`` rows of ``queryset``, skipping rows another claimer
+    holds. A claimer that committed after this statement took its snapshot
+    may already have assigned a row we go on to lock, so assignments are
+    read again, in a fresh snapshot, once the locks are held.
+    """
+    orders = list(queryset.select_for_update(skip_locked=True, of=('self',))[:limit])
+    taken = set(WorkAssignment.objects.filter(work_order__in=orders).values_list('work_order_id', flat=True))
+    return [order for order in orders if order.pk not in taken]
+
+
+def _open_load(person_ids):
+    return Counter(dict(
+        WorkAssignment.objects.filter(person__in=person_ids, work_order__completed_at__isnull=True)
+        .values_list('person').annotate(count=Count('pk')).order_by()
+    ))
+
+
+def claim_work_orders(person, limit=1):
+    """
+    Assign up to ``limit`` of the oldest claimable orders for the person's
+    team to ``person``, within their remaining capacity. The person's row is
+    locked so their own concurrent claims cannot overrun it. Returns the
+    claimed orders.
+    """
+    with transaction.atomic():
+        person = Person.objects.select_for_update().get(pk=person.pk)
+        room = capacity(person) - _open_load([person.pk])[person.pk]
+        if room <= 0:
+            return []
+        orders = _lock_unassigned(
+            claimable().select_related('car', 'session').filter(car__team=person.team_id), min(limit, room),
+        )
+        WorkAssignment.objects.bulk_create([
+            WorkAssignment(work_order=order, person=person, role=person.role[:50]) for order in orders
+        ])
+    return orders
+
+
+def dispatch_work_orders(team=None, limit=100):
+    """
+    Hand up to ``limit`` claimable orders (optionally only ``team``'s) to the
+    technicians of each car's team. Each order goes to the technician with
+    the lowest open load relative to their capacity, the higher
+    certification winning ties; technicians at capacity are passed over.
+    Returns ``(assignments, unassigned_orders)``.
+    """
+    with transaction.atomic():
+        queryset = claimable().select_related('car')
+        if team is not None:
+            queryset = queryset.filter(car__team=team)
+        orders = _lock_unassigned(queryset, limit)
+        people = list(
+            Person.objects.select_for_update().filter(team__in={order.car.team_id for order in orders}).order_by('pk')
+        )
+        load = _open_load([person.pk for person in people])
+
+        heaps = {}
+        for person in people:
+            if load[person.pk] < capacity(person):
+                heaps.setdefault(person.team_id, []).append(
+                    (load[person.pk] / capacity(person), certification_rank(person), person.pk, person)
+                )
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        assignments, unassigned = [], []
+        for order in orders:
+            heap = heaps.get(order.car.team_id)
+            if not heap:
+                unassigned.append(order)
+                continue
+            _, rank, pk, person = heapq.heappop(heap)
+            assignments.append(WorkAssignment(work_order=order, person=person, role=person.role[:50]))
+            load[pk] += 1
+            if load[pk] < capacity(person):
+                heapq.heappush(heap, (load[pk] / capacity(person), rank, pk, person))
+
+        WorkAssignment.objects.bulk_create(assignments)
+    return assignments, unassigned
+
+
+def complete_work_orders(work_order_ids, person=None):
+    """
+    Stamp ``completed_at`` on every still-open order of ``work_order_ids``
+    (only those assigned to ``person``, if given) in one UPDATE. Returns how
+    many were completed.
+    """
+    queryset = WorkOrder.objects.filter(pk__in=work_order_ids, completed_at__isnull=True)
+    if person is not None:
+        queryset = queryset.filter(Exists(WorkAssignment.objects.filter(work_order=OuterRef('pk'), person=person)))
+    with transaction.atomic():
+        completed = queryset.update(completed_at=timezone.now())
+    return completed
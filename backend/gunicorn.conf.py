@@ -0,0 +1,44 @@
+"""
+Gunicorn configuration for serving DBFinal.asgi:application in production.
+
+    gunicorn DBFinal.asgi:application -c gunicorn.conf.py
+
+The master process supervises ``workers`` uvicorn worker processes. Send it
+SIGHUP to reload code and settings gracefully: new workers are started and
+the old ones finish their in-flight requests (up to ``graceful_timeout``)
+before exiting. SIGTERM drains the same way before shutting down.
+
+Each worker opens its own database pool (see DB_POOL in settings), so the
+connections Postgres sees are at most ``workers * DB_POOL_MAX_SIZE``.
+"""
+import os
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', _cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers periodically so slow leaks cannot accumulate; the jitter
+# keeps them from all restarting at once.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '500'))
+
+# Never preload: database pools must be created after the fork, per worker.
+preload_app = False
+reload = os.getenv('GUNICORN_RELOAD', 'False') == 'True'
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
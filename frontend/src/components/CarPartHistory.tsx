@@ -5,20 +5,26 @@ import { Badge, Spinner } from './ui';
 
 interface CarPartHistoryProps {
   carId: number;
+  // Already loaded by the caller (e.g. from the car overview); skips the fetch.
+  history?: CarPart[];
 }
 
 const CarPartHistory: Component<CarPartHistoryProps> = (props) => {
-  const [history, setHistory] = createSignal<CarPart[]>([]);
-  const [loading, setLoading] = createSignal(true);
+  const [fetched, setFetched] = createSignal<CarPart[]>([]);
+  const [fetching, setFetching] = createSignal(props.history === undefined);
+  // Read the prop on every access so reloads by the caller show up here.
+  const history = () => props.history ?? fetched();
+  const loading = () => props.history === undefined && fetching();
 
   onMount(async () => {
+    if (props.history !== undefined) return;
     try {
       const response = await fetchCarPartHistory(props.carId);
-      setHistory(response.results);
+      setFetched(response.results);
     } catch (err) {
       console.error('Failed to load car part history:', err);
     } finally {
-      setLoading(false);
+      setFetching(false);
     }
   });
 
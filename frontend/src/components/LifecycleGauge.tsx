@@ -5,6 +5,7 @@ interface LifecycleGaugeProps {
   percentage?: number;
   mileage?: number;
   limit?: number;
+  needsReplacement?: boolean;
   compact?: boolean;
 }
 
@@ -41,7 +42,7 @@ const LifecycleGauge: Component<LifecycleGaugeProps> = (props) => {
   const getStatus = (): StatusType => {
     if (!props.percentage) return 'unknown';
     if (props.percentage >= 90) return 'critical';
-    if (props.percentage >= 70) return 'warning';
+    if (props.needsReplacement || props.percentage >= 70) return 'warning';
     return 'good';
   };
 
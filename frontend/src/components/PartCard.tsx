@@ -62,8 +62,9 @@ const PartCard: Component<PartCardProps> = (props) => {
         {props.part.fia_lifecycle_limit && (
           <LifecycleGauge
             percentage={props.part.lifecycle_percentage}
-            mileage={props.part.current_mileage}
+            mileage={props.part.cumulative_mileage}
             limit={props.part.fia_lifecycle_limit}
+            needsReplacement={props.part.needs_replacement}
             compact
           />
         )}
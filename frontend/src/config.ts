@@ -1,11 +1,24 @@
 export const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// Last body and validators per GET endpoint, replayed on 304 Not Modified.
+const validatorCache = new Map<string, { etag: string; body: any }>();
+
 export const api = {
   get: async (endpoint: string) => {
+    const cached = validatorCache.get(endpoint);
     const response = await fetch(`${API_URL}${endpoint}`, {
       credentials: 'include',
+      headers: cached ? { 'If-None-Match': cached.etag } : undefined,
     });
-    return response.json();
+    if (response.status === 304 && cached) {
+      return cached.body;
+    }
+    const body = await response.json();
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+      validatorCache.set(endpoint, { etag, body });
+    }
+    return body;
   },
 
   post: async (endpoint: string, data: any) => {
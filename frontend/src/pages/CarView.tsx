@@ -1,27 +1,47 @@
-import { Component, createSignal, Show, onMount } from 'solid-js';
+import { Component, createSignal, Show, onCleanup, onMount } from 'solid-js';
 import { useParams, A } from '@solidjs/router';
-import type { Car } from '../types/models';
-import { fetchCar } from '../services/api';
+import type { Car, CarPart } from '../types/models';
+import { fetchCarOverview, subscribeChanges } from '../services/api';
 import { Badge, Button, Spinner } from '../components/ui';
 import CarPartHistory from '../components/CarPartHistory';
 
 const CarView: Component = () => {
   const params = useParams();
   const [car, setCar] = createSignal<Car | null>(null);
+  const [history, setHistory] = createSignal<CarPart[]>([]);
   const [loading, setLoading] = createSignal(true);
   const [error, setError] = createSignal<string | null>(null);
 
-  onMount(async () => {
+  const load = async () => {
     if (!params.id) return;
     try {
-      const carData = await fetchCar(parseInt(params.id));
-      setCar(carData);
+      const overview = await fetchCarOverview(parseInt(params.id));
+      setHistory(overview.part_history);
+      setCar(overview.car);
     } catch (err) {
       setError('Failed to load car details');
       console.error(err);
     } finally {
       setLoading(false);
     }
+  };
+
+  onMount(() => {
+    load();
+    if (!params.id) return;
+    // Reload once a burst of changes to this car has settled.
+    let pending: number | undefined;
+    const unsubscribe = subscribeChanges(
+      () => {
+        clearTimeout(pending);
+        pending = window.setTimeout(load, 250);
+      },
+      { car: parseInt(params.id) }
+    );
+    onCleanup(() => {
+      clearTimeout(pending);
+      unsubscribe();
+    });
   });
 
   const getStatusVariant = (status?: string): 'success' | 'warning' | 'danger' | 'default' => {
@@ -158,7 +178,7 @@ const CarView: Component = () => {
           {/* Part History */}
           {params.id && (
             <div class="mb-8">
-              <CarPartHistory carId={parseInt(params.id)} />
+              <CarPartHistory carId={parseInt(params.id)} history={history()} />
             </div>
           )}
 
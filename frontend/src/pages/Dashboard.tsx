@@ -1,6 +1,6 @@
-import { Component, createSignal, For, Show, onMount } from 'solid-js';
+import { Component, createSignal, For, Show, onCleanup, onMount } from 'solid-js';
 import type { Part, Team } from '../types/models';
-import { fetchTeams, fetchLifecycleWarnings } from '../services/api';
+import { fetchDashboard, subscribeChanges } from '../services/api';
 import { Select, Spinner, Badge } from '../components/ui';
 import PartList from '../components/PartList';
 import PartCard from '../components/PartCard';
@@ -9,20 +9,38 @@ const Dashboard: Component = () => {
   const [teams, setTeams] = createSignal<Team[]>([]);
   const [selectedTeam, setSelectedTeam] = createSignal<number | null>(null);
   const [warnings, setWarnings] = createSignal<Part[]>([]);
+  const [warningCount, setWarningCount] = createSignal(0);
   const [loading, setLoading] = createSignal(true);
 
-  onMount(async () => {
+  const load = async () => {
     try {
-      const teamsResponse = await fetchTeams();
-      setTeams(teamsResponse.results);
-
-      const warningsResponse = await fetchLifecycleWarnings();
-      setWarnings(warningsResponse);
+      const dashboard = await fetchDashboard();
+      setTeams(dashboard.teams);
+      setWarnings(dashboard.lifecycle_warnings.results);
+      setWarningCount(dashboard.lifecycle_warnings.count);
     } catch (err) {
       console.error('Failed to load dashboard data:', err);
     } finally {
       setLoading(false);
     }
+  };
+
+  onMount(() => {
+    load();
+    // Part swaps and mileage move the lifecycle warnings; reload once a
+    // burst of changes has settled.
+    let pending: number | undefined;
+    const unsubscribe = subscribeChanges(
+      () => {
+        clearTimeout(pending);
+        pending = window.setTimeout(load, 1000);
+      },
+      { table: 'car_part' }
+    );
+    onCleanup(() => {
+      clearTimeout(pending);
+      unsubscribe();
+    });
   });
 
   return (
@@ -66,7 +84,7 @@ const Dashboard: Component = () => {
               </div>
               <div class="w-px h-12 bg-f1-carbon-light" />
               <div class="text-center">
-                <div class="text-3xl font-black text-status-warning">{warnings().length}</div>
+                <div class="text-3xl font-black text-status-warning">{warningCount()}</div>
                 <div class="text-xs text-f1-silver uppercase tracking-wider">Warnings</div>
               </div>
             </div>
@@ -130,7 +148,7 @@ const Dashboard: Component = () => {
                   </h2>
                 </div>
                 <Badge variant="warning" pulse>
-                  {warnings().length} Alert{warnings().length !== 1 ? 's' : ''}
+                  {warningCount()} Alert{warningCount() !== 1 ? 's' : ''}
                 </Badge>
               </div>
 
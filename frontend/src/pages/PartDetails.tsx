@@ -154,8 +154,9 @@ const PartDetails: Component = () => {
                   </div>
                   <LifecycleGauge
                     percentage={part()!.lifecycle_percentage}
-                    mileage={part()!.current_mileage}
+                    mileage={part()!.cumulative_mileage}
                     limit={part()!.fia_lifecycle_limit}
+                    needsReplacement={part()!.needs_replacement}
                   />
                 </div>
               )}
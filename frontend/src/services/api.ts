@@ -1,4 +1,4 @@
-import { api } from '../config';
+import { api, API_URL } from '../config';
 import type {
   Team,
   Car,
@@ -6,9 +6,17 @@ import type {
   CarPart,
   CarPartDetail,
   PaginatedResponse,
+  ColumnarResponse,
   PartFilters,
   CarPartFilters,
   CarFilters,
+  LifecycleWarningFilters,
+  SearchResults,
+  DashboardData,
+  CarOverview,
+  CarConfiguration,
+  WorkOrder,
+  ChangeEvent,
 } from '../types/models';
 
 const buildQueryString = (filters: Record<string, any>): string => {
@@ -39,6 +47,14 @@ export const fetchCar = async (id: number): Promise<Car> => {
   return api.get(`/api/cars/${id}/`);
 };
 
+export const fetchCarOverview = async (id: number): Promise<CarOverview> => {
+  return api.get(`/api/cars/${id}/overview/`);
+};
+
+export const fetchCarConfiguration = async (id: number, at?: string): Promise<CarConfiguration> => {
+  return api.get(`/api/cars/${id}/configuration/${buildQueryString({ at })}`);
+};
+
 export const fetchParts = async (filters?: PartFilters): Promise<PaginatedResponse<Part>> => {
   const queryString = filters ? buildQueryString(filters) : '';
   return api.get(`/api/parts/${queryString}`);
@@ -48,8 +64,9 @@ export const fetchPart = async (id: number): Promise<Part> => {
   return api.get(`/api/parts/${id}/`);
 };
 
-export const fetchLifecycleWarnings = async (): Promise<Part[]> => {
-  return api.get('/api/parts/lifecycle_warnings/');
+export const fetchLifecycleWarnings = async (filters?: LifecycleWarningFilters): Promise<PaginatedResponse<Part>> => {
+  const queryString = filters ? buildQueryString(filters) : '';
+  return api.get(`/api/parts/lifecycle_warnings/${queryString}`);
 };
 
 export const fetchCarParts = async (filters?: CarPartFilters): Promise<PaginatedResponse<CarPart>> => {
@@ -57,6 +74,25 @@ export const fetchCarParts = async (filters?: CarPartFilters): Promise<Paginated
   return api.get(`/api/car-parts/${queryString}`);
 };
 
+// Same rows as fetchCarParts in the smaller columnar encoding; use
+// fromColumns to turn them back into objects.
+export const fetchCarPartColumns = async (filters?: CarPartFilters): Promise<ColumnarResponse<CarPart>> => {
+  const queryString = buildQueryString({ ...filters, format: 'columns' });
+  return api.get(`/api/car-parts/${queryString}`);
+};
+
+export const fromColumns = <T>(columns: ColumnarResponse<T>['columns']): T[] => {
+  const names = Object.keys(columns) as (keyof T)[];
+  const length = names.length ? columns[names[0]].length : 0;
+  return Array.from({ length }, (_, index) => {
+    const row = {} as T;
+    names.forEach((name) => {
+      row[name] = columns[name][index];
+    });
+    return row;
+  });
+};
+
 export const fetchCarPart = async (id: number): Promise<CarPartDetail> => {
   return api.get(`/api/car-parts/${id}/`);
 };
@@ -68,3 +104,51 @@ export const fetchActiveCarParts = async (): Promise<PaginatedResponse<CarPart>>
 export const fetchCarPartHistory = async (carId: number): Promise<PaginatedResponse<CarPart>> => {
   return api.get(`/api/car-parts/by-car/${carId}/`);
 };
+
+export const fetchDashboard = async (): Promise<DashboardData> => {
+  return api.get('/api/dashboard/');
+};
+
+export const searchGarage = async (query: string, limit?: number): Promise<SearchResults> => {
+  return api.get(`/api/search/${buildQueryString({ q: query, limit })}`);
+};
+
+export const fetchWorkQueue = async (team?: number): Promise<PaginatedResponse<WorkOrder>> => {
+  return api.get(`/api/work-orders/queue/${buildQueryString({ team })}`);
+};
+
+// Claims as the signed-in technician; only staff may pass another person.
+export const claimWorkOrders = async (limit = 1, person?: number): Promise<{ claimed: WorkOrder[] }> => {
+  return api.post('/api/work-orders/claim/', { limit, ...(person !== undefined && { person }) });
+};
+
+export const completeWorkOrders = async (
+  workOrders: number[]
+): Promise<{ completed: number; skipped: number }> => {
+  return api.post('/api/work-orders/complete/', { work_orders: workOrders });
+};
+
+// Live change feed over Server-Sent Events. EventSource reconnects on its
+// own and resumes after the last event id it saw; the server replays some
+// events again on resume, so recently seen ids are dropped. Returns the
+// unsubscribe.
+export const subscribeChanges = (
+  onChange: (event: ChangeEvent) => void,
+  filters: { car?: number; table?: ChangeEvent['table'] } = {}
+): (() => void) => {
+  const source = new EventSource(`${API_URL}/api/events/${buildQueryString(filters)}`, {
+    withCredentials: true,
+  });
+  const seen = new Set<number>();
+  const listener = (message: MessageEvent) => {
+    const event: ChangeEvent = JSON.parse(message.data);
+    if (seen.has(event.id)) return;
+    seen.add(event.id);
+    if (seen.size > 1000) seen.delete(seen.values().next().value as number);
+    onChange(event);
+  };
+  for (const table of ['car_part', 'car_session', 'work_order']) {
+    source.addEventListener(table, listener);
+  }
+  return () => source.close();
+};
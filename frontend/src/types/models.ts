@@ -23,6 +23,9 @@ export interface Part {
   lifecycle_percentage?: number;
   needs_replacement?: boolean;
   current_mileage?: number;
+  cumulative_mileage?: number;
+  current_car?: number;
+  installed_at?: string;
   is_installed?: boolean;
 }
 
@@ -95,6 +98,72 @@ export interface CarSession {
   bay_number?: number;
 }
 
+export interface WorkOrder {
+  work_order_id: number;
+  car: number;
+  car_number?: number;
+  session?: number;
+  race_name?: string | null;
+  description: string;
+  created_at: string;
+  completed_at?: string;
+  is_open: boolean;
+  assignments?: WorkAssignment[];
+}
+
+export interface WorkAssignment {
+  work_assignment_id: number;
+  work_order: number;
+  person: number;
+  role: string;
+}
+
+export interface ChangeEvent {
+  id: number;
+  table: 'car_part' | 'car_session' | 'work_order';
+  op: 'insert' | 'update' | 'delete';
+  row: number;
+  car: number | null;
+  fields: string[];
+}
+
+export interface CountedList<T> {
+  count: number;
+  results: T[];
+}
+
+export interface DashboardData {
+  teams: Team[];
+  lifecycle_warnings: CountedList<Part> & { by_team: Record<string, number>; not_installed: number };
+  active_car_parts: CarPart[];
+  recent_sessions: Session[];
+  open_work_orders: CountedList<WorkOrder>;
+}
+
+export interface CarOverview {
+  car: Car;
+  installed_parts: Part[];
+  part_history: CarPart[];
+  recent_sessions: CarSession[];
+  open_work_orders: CountedList<WorkOrder>;
+  warning_count: number;
+}
+
+export interface CarConfiguration {
+  car: Car;
+  at: string;
+  parts: CarPart[];
+}
+
+export type Ranked<T> = T & { rank: number };
+
+export interface SearchResults {
+  query: string;
+  parts: Ranked<Part>[];
+  cars: Ranked<Car>[];
+  people: Ranked<Person>[];
+}
+
 export interface PaginatedResponse<T> {
   count: number;
   next?: string;
@@ -102,7 +171,21 @@ export interface PaginatedResponse<T> {
   results: T[];
 }
 
-export interface PartFilters {
+// ?format=columns: one array per field instead of one object per row.
+export interface ColumnarResponse<T> {
+  count: number;
+  next?: string;
+  previous?: string;
+  columns: { [K in keyof T]: T[K][] };
+}
+
+// Sparse fieldsets: comma-separated field names to return / nested fields to embed.
+export interface FieldsetParams {
+  fields?: string;
+  expand?: string;
+}
+
+export interface PartFilters extends FieldsetParams {
   part_type?: string;
   manufacturer?: string;
   serial_number?: string;
@@ -111,17 +194,27 @@ export interface PartFilters {
   page?: number;
 }
 
-export interface CarPartFilters {
+export interface LifecycleWarningFilters extends FieldsetParams {
+  threshold?: number;
+  part_type?: string;
+  manufacturer?: string;
+  page?: number;
+}
+
+export interface CarPartFilters extends FieldsetParams {
   car?: number;
   part?: number;
   is_active?: boolean;
   part_type?: string;
+  as_of?: string;
+  session?: number;
+  season?: number;
   search?: string;
   ordering?: string;
   page?: number;
 }
 
-export interface CarFilters {
+export interface CarFilters extends FieldsetParams {
   team?: number;
   status?: string;
   search?: string;